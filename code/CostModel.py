@@ -0,0 +1,195 @@
+import json
+import os
+import re
+import shutil
+import subprocess
+import tempfile
+
+# The (estimated) size in bytes of the if-else code of a single node. These are the values we
+# used before calibrating the cost model for the local compiler.
+DEFAULT_SIZES = {
+	"arm" : {
+		"int" : {"split" : 5*4, "leaf" : 2*4},
+		"float" : {"split" : 8*4, "leaf" : 2*4}
+	},
+	"ppc" : {
+		"int" : {"split" : 5*4, "leaf" : 2*4},
+		"float" : {"split" : 8*4, "leaf" : 2*4}
+	},
+	"intel" : {
+		"int" : {"split" : 28, "leaf" : 10},
+		"float" : {"split" : 17, "leaf" : 10}
+	}
+}
+
+class CostModel:
+	""" A CostModel estimates the size of the generated if-else code per node. By default, the fixed
+		per-architecture sizes are used. A calibrated profile (see calibrate) can be loaded via fromJSON
+	"""
+	def __init__(self, architecture = "intel"):
+		if architecture not in DEFAULT_SIZES:
+			raise NotImplementedError("Please use 'arm' or 'intel' or 'ppc' as target architecture - other architectures are not supported")
+
+		self.architecture = architecture
+		self.compiler = None
+		self.flags = None
+		self.sizes = {t : dict(DEFAULT_SIZES[architecture][t]) for t in DEFAULT_SIZES[architecture]}
+
+	def fromJSON(self, jsonFile):
+		""" Load a calibrated profile (see toJSON). The profile has to be calibrated for the architecture of this cost model """
+		with open(jsonFile) as data_file:
+			data = json.load(data_file)
+
+		if data["architecture"] != self.architecture:
+			raise ValueError("The cost model " + jsonFile + " was calibrated for " + data["architecture"] + ", but the target architecture is " + self.architecture)
+
+		self.compiler = data.get("compiler", None)
+		self.flags = data.get("flags", None)
+		self.sizes = data["sizes"]
+
+	def toJSON(self, jsonFile):
+		with open(jsonFile, 'w') as outFile:
+			json.dump({
+				"architecture" : self.architecture,
+				"compiler" : self.compiler,
+				"flags" : self.flags,
+				"sizes" : self.sizes
+			}, outFile, indent = 4)
+
+	def sizeOfNode(self, node, splitDataType):
+		""" Returns the estimated code size of the given node in bytes
+
+		Args:
+			node (Node): The node
+			splitDataType (str): The data type of the splits, either "int" or "float"
+
+		Returns:
+			float: The estimated size in bytes
+		"""
+		if node.prediction is not None:
+			return self.sizes[splitDataType]["leaf"]
+		else:
+			return self.sizes[splitDataType]["split"]
+
+def getFunctionSizes(cppCode, compiler, flags, nm = "nm"):
+	""" Compile the given code into an object file and return the size of each {namespace}_predict{treeID} function
+
+	Args:
+		cppCode (str): The code to be compiled
+		compiler (str): The compiler (e.g. g++)
+		flags (str): The compiler flags
+		nm (str, optional): The nm binary to read the symbol table
+
+	Returns:
+		dict: A dictionary (key = treeID, value = size of the function in bytes)
+	"""
+	tmpDir = tempfile.mkdtemp()
+	try:
+		cppFile = os.path.join(tmpDir, "snippet.cpp")
+		objFile = os.path.join(tmpDir, "snippet.o")
+		with open(cppFile, 'w') as outFile:
+			outFile.write(cppCode)
+
+		# Inline functions are only emitted if they are not inlined anywhere, so we force them
+		subprocess.run(compiler + " " + flags + " -fkeep-inline-functions -c " + cppFile + " -o " + objFile, shell = True, check = True)
+		output = subprocess.run(nm + " -S -C --defined-only " + objFile, shell = True, check = True, stdout = subprocess.PIPE, universal_newlines = True).stdout
+	finally:
+		shutil.rmtree(tmpDir)
+
+	sizes = {}
+	for line in output.split("\n"):
+		entries = line.split(" ", 3)
+		if len(entries) == 4:
+			match = re.search(r"_predict(\d+)\(", entries[3])
+			if match is not None:
+				sizes[int(match.group(1))] = int(entries[1], 16)
+
+	return sizes
+
+def getTreeCode(converter, trees, numClasses):
+	cppCode = ""
+	for i, tree in enumerate(trees):
+		if tree is not None:
+			_, tCode = converter.getCode(tree, i, numClasses)
+			cppCode += tCode
+
+	return cppCode
+
+def calibrate(architecture, forest, compiler, flags, nm = "nm"):
+	""" Calibrate the cost model for the given compiler and flags on the trees of a trained forest. The total
+		function size of the trees is divided by their total number of splits. Since every tree has one more
+		leaf than splits, the size per split includes one leaf. The size of a leaf is taken from a function
+		which only returns a constant, but at most half of the size per split (the compiler merges identical
+		returns in larger trees). Only the split type of the forest is calibrated, the other one keeps its
+		default sizes
+
+	Args:
+		architecture (str): The target architecture (arm, intel or ppc)
+		forest (Forest): The trained forest whose trees are used as samples
+		compiler (str): The compiler (e.g. g++)
+		flags (str): The compiler flags used for the generated code
+		nm (str, optional): The nm binary to read the symbol table
+
+	Returns:
+		CostModel: The calibrated cost model
+	"""
+	from IfTreeConverter import OptimizedIFTreeConverter
+
+	costModel = CostModel(architecture)
+	costModel.compiler = compiler
+	costModel.flags = flags
+
+	trees = [t for t in forest.trees if t.head.prediction is None]
+	containsFloat = any([isinstance(t.nodes[n].split, float) for t in trees for n in t.nodes])
+	samples = {"float" if containsFloat else "int" : trees}
+	numClasses = forest.getNumClasses()
+	dim = max([t.nodes[n].feature for t in trees for n in t.nodes if t.nodes[n].prediction is None]) + 1
+
+	for splitDataType in samples:
+		trees = samples[splitDataType]
+		featureType = splitDataType
+		# Use an unlimited budget, so that every node ends up in the kernel
+		converter = OptimizedIFTreeConverter(dim, "calibration", featureType, architecture, "path", float("inf"))
+		# Function 0 only consists of a single leaf, the sample trees follow
+		cppCode = "inline unsigned int calibration_predict0({feature_t} const pX[{dim}]){\n\treturn 1;\n}\n" \
+					.replace("{feature_t}", featureType) \
+					.replace("{dim}", str(dim))
+		cppCode += getTreeCode(converter, [None] + trees, numClasses)
+		sizes = getFunctionSizes(cppCode, compiler, flags, nm)
+
+		numSplits = sum([len(tree.nodes) // 2 for tree in trees])
+		slope = sum([sizes[i + 1] for i in range(len(trees))]) / numSplits
+		leafSize = min(float(sizes[0]), slope / 2.0)
+
+		costModel.sizes[splitDataType] = {"split" : float(slope - leafSize), "leaf" : leafSize}
+
+	return costModel
+
+def checkKernelSizes(converter, forest, compiler, flags, nm = "nm"):
+	""" Compare the code size predicted by the cost model of the converter with the actual size of
+		each tree function, as emitted by the compiler
+
+	Args:
+		converter (OptimizedIFTreeConverter): The converter with the cost model to check
+		forest (Forest): The forest
+		compiler (str): The compiler (e.g. g++)
+		flags (str): The compiler flags
+		nm (str, optional): The nm binary to read the symbol table
+
+	Returns:
+		list: A list of tuples (treeID, predicted kernel size, predicted size, actual size)
+	"""
+	cppCode = ""
+	predicted = []
+	for i, tree in enumerate(forest.trees):
+		_, tCode = converter.getCode(tree, i, forest.getNumClasses())
+		cppCode += tCode
+
+		splitDataType = "float" if converter.containsFloat(tree) else "int"
+		kernelSize = sum([converter.sizeOfNode(tree, tree.nodes[n], splitDataType) for n in converter.inKernel if converter.inKernel[n]])
+		totalSize = sum([converter.sizeOfNode(tree, tree.nodes[n], splitDataType) for n in tree.nodes])
+		predicted.append((kernelSize, totalSize))
+
+	sizes = getFunctionSizes(cppCode, compiler, flags, nm)
+
+	return [(i, predicted[i][0], predicted[i][1], sizes.get(i, 0)) for i in range(len(forest.trees))]
@@ -6,6 +6,7 @@ from sklearn.ensemble import RandomForestClassifier
 from sklearn.ensemble import ExtraTreesClassifier
 
 import Tree
+import Profiler
 
 class Forest:
 	def __init__(self):
@@ -40,14 +41,17 @@ class Forest:
 
 		
 	def fromJSON(self, jsonFile):
-		with open(jsonFile) as data_file:    
-			data = json.load(data_file)
+		with Profiler.phase("load"):
+			with open(jsonFile) as data_file:    
+				data = json.load(data_file)
 
-		for x in data:
-			tree = Tree.Tree()
-			tree.fromJSON(x)
+			for x in data:
+				tree = Tree.Tree()
+				tree.fromJSON(x)
 
-			self.trees.append(tree)
+				self.trees.append(tree)
+				Profiler.count("trees")
+				Profiler.count("nodes", tree.getNumNodes())
 
 	def str(self):
 		s = "["
@@ -85,6 +89,80 @@ class Forest:
 	def getTotalNumNodes(self):
 		return sum([t.getNumNodes() for t in self.trees])
 
+	def collapse(self, tolerance = None):
+		""" Collapses same-class subtrees of all trees in this forest, see Tree.collapse
+
+		Args:
+			tolerance (float, optional): The soft-vote tolerance. If None, leaves are merged if they predict the same class
+
+		Returns:
+			int: The number of removed nodes
+		"""
+		return sum([t.collapse(tolerance) for t in self.trees])
+
+	def hashConsSubtrees(self, getLabel = None):
+		""" Identifies structurally identical subtrees within and across all trees of this forest.
+			Afterwards, every node has a subtreeID field, see Tree.hashConsSubtrees (also for getLabel)
+
+		Returns:
+			dict: A dictionary (key = subtreeID, value = number of occurrences in the forest)
+		"""
+		table = {}
+		counts = {}
+		for t in self.trees:
+			t.hashConsSubtrees(table, counts, getLabel = getLabel)
+
+		return counts
+
+	def getTotalNumSplits(self):
+		return sum([t.getNumSplits() for t in self.trees])
+
+	def getExpectedNumComparisons(self):
+		return sum([t.getExpectedNumComparisons() for t in self.trees])
+
+	def getPredicates(self):
+		""" Collects all distinct predicates (feature, split) tested anywhere in this forest
+
+		Returns:
+			dict: A dictionary (key = (feature, split), value = index of the predicate). Predicates are
+			numbered by feature first and split second, so that evaluating them in index order reads
+			the feature vector front to back
+		"""
+		predicates = set()
+		for t in self.trees:
+			t.getPredicates(predicates)
+
+		return {p : i for i, p in enumerate(sorted(predicates))}
+
+	def getFeatureMapping(self):
+		""" Collects all features tested anywhere in this forest, ordered by their expected number
+			of accesses per sample (most frequently accessed feature first)
+
+		Returns:
+			list: The list of used features. The i-th entry is the original index of the i-th packed feature
+		"""
+		accesses = {}
+		for t in self.trees:
+			t.getProbAllPaths()
+			for key in t.nodes:
+				node = t.nodes[key]
+				if node.prediction is None:
+					accesses[node.feature] = accesses.get(node.feature, 0) + node.pathProb
+
+		return sorted(accesses, key = lambda f : (-accesses[f], f))
+
+	def remapFeatures(self, mapping):
+		""" Renumbers the features of all split nodes in this forest
+
+		Args:
+			mapping (dict): A dictionary (key = old feature index, value = new feature index)
+		"""
+		for t in self.trees:
+			for key in t.nodes:
+				node = t.nodes[key]
+				if node.prediction is None:
+					node.feature = mapping[node.feature]
+
 	def predict(self,x):
 		pred = [0 for i in range(self.getNumClasses())]
 
@@ -105,19 +183,92 @@ class Forest:
 
 		# return pred
 
-	def predict_batch(self,X):
-		YPred = []
-
-		for x in X:
-			pred = [0 for i in range(self.getNumClasses())]
-
-			for t in self.trees:
-				c = t.predict(x)
-				pred[c] += 1
-
-			YPred.append(np.argmax(pred))
+	def predict_trees(self, X):
+		""" Returns the class predicted by each tree for each row of X (vectorized, see Tree.predict_leaves)
+
+		Returns:
+			numpy.ndarray: The predictions with shape (len(X), number of trees)
+		"""
+		X = np.asarray(X)
+		YTrees = np.zeros((len(X), len(self.trees)), dtype = np.int64)
+		for i, t in enumerate(self.trees):
+			YTrees[:, i] = t.predict_batch(X)
+
+		return YTrees
+
+	def vote(self, YTrees):
+		""" Returns the majority vote over the predictions of the trees (see predict_trees). Ties are broken
+			towards the smaller class as in predict and in the generated code
+		"""
+		votes = np.zeros((len(YTrees), self.getNumClasses()), dtype = np.int64)
+		for i in range(YTrees.shape[1]):
+			votes[np.arange(len(YTrees)), YTrees[:, i]] += 1
+
+		return votes.argmax(axis = 1)
+
+	def getLeafTable(self, bits = None):
+		""" Returns the class probabilities of all leaves of the forest. The rows of tree t start at offsets[t]
+			and are ordered like the leaves of the tree (see Tree.getLeafIndices)
+
+		Args:
+			bits (int, optional): If given, the probabilities are quantized to unsigned fixed-point numbers with the
+								  given number of bits (at most 16), i.e. round(p * (2^bits - 1))
+
+		Returns:
+			Tuple: A tuple (offsets, table), where table has shape (number of leaves, number of classes)
+		"""
+		offsets = []
+		rows = []
+		for t in self.trees:
+			offsets.append(len(rows))
+			rows.extend([n.prediction for n in t.getArrays()[0] if n.prediction is not None])
+
+		# The leaf predictions are normalized, since sklearn stores weighted counts for some models
+		table = np.array(rows, dtype = np.float64)
+		sums = table.sum(axis = 1, keepdims = True)
+		sums[sums == 0] = 1
+		table = table / sums
+
+		if bits is not None:
+			table = np.rint(table * ((1 << bits) - 1)).astype(np.uint8 if bits <= 8 else np.uint16)
+
+		return np.array(offsets, dtype = np.int64), table
+
+	def predict_leaf_indices(self, X, offsets = None):
+		""" Returns the row of the leaf table (see getLeafTable) of the leaf reached in each tree for each row of X
+
+		Returns:
+			numpy.ndarray: The rows with shape (len(X), number of trees)
+		"""
+		X = np.asarray(X)
+		YLeaves = np.zeros((len(X), len(self.trees)), dtype = np.int64)
+		offset = 0
+		for i, t in enumerate(self.trees):
+			arrays = t.getArrays()
+			leafIndices = t.getLeafIndices(arrays)
+			YLeaves[:, i] = (offset if offsets is None else offsets[i]) + leafIndices[t.predict_leaves(X, arrays)]
+			offset += int(np.sum(leafIndices >= 0))
+
+		return YLeaves
+
+	def vote_soft(self, YLeaves, table):
+		""" Returns the class with the largest sum of probabilities over the leaves reached in all trees (see
+			predict_leaf_indices). Quantized tables are summed exactly in integers as in the generated code
+			(see SoftVoteForestConverter), ties are broken towards the smaller class
+		"""
+		votes = np.zeros((len(YLeaves), table.shape[1]), dtype = np.int64 if np.issubdtype(table.dtype, np.integer) else np.float64)
+		for i in range(YLeaves.shape[1]):
+			votes += table[YLeaves[:, i]]
+
+		return votes.argmax(axis = 1)
+
+	def predict_batch_soft(self, X, bits = None):
+		""" Soft voting: Returns the class with the largest sum of (optionally quantized, see getLeafTable) leaf probabilities """
+		offsets, table = self.getLeafTable(bits)
+		return self.vote_soft(self.predict_leaf_indices(X, offsets), table)
 
-		return YPred
+	def predict_batch(self,X):
+		return self.vote(self.predict_trees(X))
 		# YPred = []
 		# for x in X:
 		# 	pred = None
@@ -152,4 +303,28 @@ class Forest:
 	# 	return min([t.getNumLeaf() for t in self.trees])
 
 	# def getAvgNumPaths(self):
-	# 	return sum([t.getNumLeaf() for t in self.trees]) / len(self.trees)
\ No newline at end of file
+	# 	return sum([t.getNumLeaf() for t in self.trees]) / len(self.trees)
+
+
+def getSKLearnDicts(forest, roundSplit = False):
+	""" Returns the JSON structure of Forest.fromSKLearn(forest).str() (as list of nested dictionaries)
+		without creating the Forest object first, see Tree.getSKLearnDict
+
+	Args:
+	    forest: The sci-kit ensemble
+	    roundSplit (bool, optional): If True, the splits are rounded to integers
+
+	Returns:
+	    list: The trees, which can be written with json.dump
+	"""
+	if (issubclass(type(forest), AdaBoostClassifier)):
+		sumW = sum([w for w in forest.estimator_weights_])
+
+		if (forest.algorithm == "SAMME"):
+			return [Tree.getSKLearnDict(e, roundSplit, "SAMME", w/sumW) for e,w in zip(forest.estimators_,forest.estimator_weights_)]
+		else:
+			return [Tree.getSKLearnDict(e, roundSplit, "SAMME.R", 1.0/sumW) for e in forest.estimators_]
+	elif (issubclass(type(forest), RandomForestClassifier)) or (issubclass(type(forest), ExtraTreesClassifier)):
+		return [Tree.getSKLearnDict(e, roundSplit, "RandomForest", 1.0/len(forest.estimators_)) for e in forest.estimators_]
+	else:
+		raise NotImplementedError("getSKLearnDicts() is not implemented for class ", type(forest))
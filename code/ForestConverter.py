@@ -1,12 +1,125 @@
+import re
 import struct
 
 import numpy as np
 
+import Profiler
+
+def stripInline(code, namespace):
+	""" Removes the inline specifier of all {namespace}_predict{treeID} functions, so that each tree can be
+		defined in its own translation unit and still be called from {namespace}_predict
+
+	Args:
+		code (str): The header code or the code of a tree
+		namespace (str): The namespace of the generated code
+
+	Returns:
+		str: The code without inline specifiers for the tree functions
+	"""
+	return re.sub(r"inline\s+(unsigned int " + re.escape(namespace) + r"_predict\d+\s*\()", r"\1", code)
+
+# The numpy types of the struct fields used by the native converters. The signedness of char does not
+# matter, since the initializers are converted bit by bit
+TABLE_FIELD_TYPES = {
+	"bool" : np.bool_,
+	"char" : np.int8,
+	"signed char" : np.int8,
+	"unsigned char" : np.uint8,
+	"short" : np.int16,
+	"unsigned short" : np.uint16,
+	"int" : np.int32,
+	"unsigned int" : np.uint32,
+	"float" : np.float32,
+	"double" : np.float64
+}
+
+def getStructTypes(headerCode):
+	""" Returns the numpy types of all structs in the header code whose fields are known (see TABLE_FIELD_TYPES).
+		The types are aligned like the C structs, i.e. they contain the same padding
+
+	Returns:
+		dict: A dictionary which maps the struct name to its numpy type
+	"""
+	structs = {}
+	for name, body in re.findall(r"struct\s+(\w+)\s*\{(.*?)\};", headerCode, re.S):
+		fields = []
+		for line in body.split("\n"):
+			line = line.split("//")[0].strip()
+			if line == "":
+				continue
+			field = re.fullmatch(r"([\w ]+?)\s+(\w+)\s*;", line)
+			if field is None or " ".join(field.group(1).split()) not in TABLE_FIELD_TYPES:
+				fields = None
+				break
+			fields.append((field.group(2), TABLE_FIELD_TYPES[" ".join(field.group(1).split())]))
+
+		if fields is not None and len(fields) > 0:
+			structs[name] = np.dtype(fields, align = True)
+
+	return structs
+
+def getBinaryTables(code, headerCode, namespace, byteOrder = "<"):
+	""" Moves the node tables of the native converters (struct arrays like {namespace}_Node0 const tree0[N] = {...})
+		out of the code into binary files. Every table is embedded into the object file via .incbin and accessed
+		through a typed extern const symbol {namespace}_{name}, so that the source stays small and the compile
+		time no longer depends on the size of the model. The tables are written with the alignment of the host
+		compiler, which matches gcc on all targets (arm, intel, ppc)
+
+	Args:
+		code (str): The code of a tree (or of the forest) containing the tables
+		headerCode (str): The header code containing the struct definitions
+		namespace (str): The namespace of the generated code
+		byteOrder (str, optional): The byte order of the target, < for little endian and > for big endian (ppc)
+
+	Returns:
+		Tuple: A tuple (code, tables), where tables maps the file names {namespace}_{name}.bin to their content
+	"""
+	structs = getStructTypes(headerCode)
+	tables = {}
+
+	def replace(match):
+		structName, name, N, body = match.groups()
+		if structName not in structs:
+			return match.group(0)
+
+		dtype = structs[structName].newbyteorder(byteOrder)
+		entries = [e.split(",") for e in re.findall(r"\{([^{}]*)\}", body)]
+		if len(entries) != int(N) or any(len(e) != len(dtype.names) for e in entries):
+			return match.group(0)
+
+		table = np.zeros(len(entries), dtype = dtype)
+		for i, field in enumerate(dtype.names):
+			values = [e[i].strip() for e in entries]
+			if np.issubdtype(dtype[field], np.floating):
+				table[field] = np.array(values, dtype = np.float64)
+			else:
+				# Integers are wrapped like the C conversion of an initializer
+				table[field] = np.array([int(float(v)) for v in values], dtype = np.int64).astype(dtype[field])
+
+		symbol = namespace + "_" + name
+		tables[symbol + ".bin"] = table.tobytes()
+
+		return """__asm__(".section .rodata\\n.balign 64\\n.global {symbol}\\n{symbol}:\\n.incbin \\"{symbol}.bin\\"\\n.previous\\n");
+extern "C" __attribute__((visibility("hidden"))) {struct} const {symbol}[{N}];
+static {struct} const (&{name})[{N}] = {symbol};""" \
+			.replace("{symbol}", symbol) \
+			.replace("{struct}", structName) \
+			.replace("{name}", name) \
+			.replace("{N}", N)
+
+	code = re.sub(r"(\w+) const (\w+)\[(\d+)\] = \{(.*?)\};", replace, code, flags = re.S)
+
+	return code, tables
+
 class TreeConverter:
+	# True for converters which generate all trees of a forest at once (see OptimizedNativeForestConverter)
+	convertsForest = False
+
 	def __init__(self, dim, namespace, featureType):
 		self.dim = dim
 		self.namespace = namespace
 		self.featureType = featureType
+		self.leafIndices = None
 
 	def containsFloat(self,tree):
 		for key in tree.nodes:
@@ -35,6 +148,56 @@ class TreeConverter:
 	def getFeatureType(self):
 		return self.featureType
 
+	def accepts(self, tree):
+		""" Checks if this converter is able to convert the given tree. Converters which only support
+			certain trees (e.g. shallow ones) override this, so that the forest converter can fall back
+			to another converter
+
+		Args:
+			tree (Tree): The tree to be converted
+
+		Returns:
+			bool: True if the tree can be converted by this converter
+		"""
+		return True
+
+	def prepareForest(self, forest):
+		""" Called once by the forest converter before the single trees are converted. Sub-classes may
+			override this to perform forest-wide analysis
+
+		Args:
+			forest (Forest): The forest which is about to be converted
+		"""
+		pass
+
+	def setPredicates(self, predicates):
+		""" Sets the forest-wide predicates used by predicate tree converters
+
+		Args:
+			predicates (dict): A dictionary (key = (feature, split), value = index of the predicate)
+		"""
+		self.predicates = predicates
+
+	def setLeafIndices(self, leafIndices):
+		""" Sets the indices of the leaves, which the trees return instead of the predicted class (see SoftVoteForestConverter)
+
+		Args:
+			leafIndices (dict): A dictionary (key = id of the leaf node, value = index of the leaf in its tree)
+		"""
+		self.leafIndices = leafIndices
+
+	def getLabel(self, leaf):
+		""" Returns the value returned by a tree for the given leaf, i.e. the predicted class or the index of
+			the leaf if leaf indices are set (see setLeafIndices)
+		"""
+		if self.leafIndices is not None:
+			return self.leafIndices[id(leaf)]
+		return int(np.argmax(leaf.prediction))
+
+	def getNumWords(self):
+		# Number of 32 bit words needed to store one bit per predicate
+		return max(1, (len(self.predicates) + 31) // 32)
+
 	#def floatToHex(self, f):
 		# Note: Use =I for unsigned int (see https://docs.python.org/2/library/struct.html#format-characters)
 	#	return hex(struct.unpack('=i', struct.pack('=f', f))[0])
@@ -45,14 +208,31 @@ class ForestConverter:
 		treeConverter to convert single trees into appropriate
 		c-code and adds some additional glue-code for prediction
 	"""
-	def __init__(self, treeConverter):
+	def __init__(self, treeConverter, fallbackConverter = None):
 		""" Generate a new ForestConverter
 
 		Args:
 			treeConverter: A tree converter
+			fallbackConverter (optional): A tree converter with the same namespace, which is used for all
+				trees the treeConverter does not accept
 		"""
 		assert(issubclass(type(treeConverter), TreeConverter))
+		assert(fallbackConverter is None or issubclass(type(fallbackConverter), TreeConverter))
 		self.treeConverter = treeConverter
+		self.fallbackConverter = fallbackConverter
+
+	def getTreeConverters(self):
+		if self.fallbackConverter is None:
+			return [self.treeConverter]
+		else:
+			return [self.treeConverter, self.fallbackConverter]
+
+	def getTreeConverter(self, tree):
+		""" Returns the tree converter which is used for the given tree """
+		if self.fallbackConverter is not None and not self.treeConverter.accepts(tree):
+			return self.fallbackConverter
+		else:
+			return self.treeConverter
 
 	def getCode(self, forest):
 		""" Generate the actual code for the given forest
@@ -64,6 +244,21 @@ class ForestConverter:
 			Tuple: A tuple (headerCode, cppCode), where headerCode contains the code (=string) for
 			a *.h file and cppCode contains the code (=string) for a *.cpp file
 		"""
+		headerCode, cppCode, treeCodes = self.getCodeUnits(forest)
+		return headerCode, cppCode + "".join(treeCodes)
+
+	def getCodeUnits(self, forest):
+		""" Generate the code for the given forest, but keep the code of each tree separately, so that
+			every tree can be placed into its own translation unit (see stripInline)
+
+		Args:
+			forest (TYPE): The forest object
+
+		Returns:
+			Tuple: A tuple (headerCode, cppCode, treeCodes), where headerCode contains the code (=string) for
+			a *.h file, cppCode contains the code (=string) of {namespace}_predict and treeCodes is a list
+			with the code (=string) of each tree
+		"""
 		dim = self.treeConverter.getDim()
 		namespace = self.treeConverter.getNamespace()
 		featureType = self.treeConverter.getFeatureType()
@@ -92,14 +287,41 @@ class ForestConverter:
 		# """.replace("{numClasses}", str(numClasses))
 		# cppCode += "}"
 
+		cppCode += self.getVoteCode(numClasses, len(forest.trees), "pX")
+
+		with Profiler.phase("kernel selection"):
+			for converter in self.getTreeConverters():
+				converter.prepareForest(forest)
+
+		treeCodes = []
+		for i in range(len(forest.trees)):
+			tHeader, tCode = self.getTreeConverter(forest.trees[i]).getCode(forest.trees[i], i, numClasses)
+			headerCode += tHeader
+			treeCodes.append(tCode)
+
+		return headerCode, cppCode, treeCodes
+
+	def getVoteCode(self, numClasses, numTrees, argument):
+		""" Generate the majority vote over all trees, which closes the {namespace}_predict function
+
+		Args:
+			numClasses (int): The number of classes
+			numTrees (int): The number of trees in the forest
+			argument (str): The name of the argument passed to each tree
+
+		Returns:
+			String: The voting code as a string
+		"""
+		namespace = self.treeConverter.getNamespace()
+
 		initCode = "{"
 		for i in range(0,numClasses):
 			initCode += "0,"
 		initCode = initCode[:-1] + "};\n"
 
-		cppCode += "	unsigned int predCnt[{num_classes}] = " + initCode
-		for i in range(len(forest.trees)):
-			cppCode += "	predCnt[{namespace}_predict{id}(pX)]++;\n".replace("{id}", str(i)).replace("{namespace}", namespace)
+		cppCode = "	unsigned int predCnt[{num_classes}] = " + initCode
+		for i in range(numTrees):
+			cppCode += "	predCnt[{namespace}_predict{id}({argument})]++;\n".replace("{id}", str(i)).replace("{namespace}", namespace).replace("{argument}", argument)
 		cppCode += """unsigned int pred = 0;
 				unsigned int cnt = predCnt[0];
 				for (unsigned int i = 1; i < {num_classes}; ++i) {
@@ -112,13 +334,241 @@ class ForestConverter:
 			}\n"""
 		cppCode = cppCode.replace("{num_classes}", str(numClasses))
 
+		return cppCode
+
+class PredicateForestConverter(ForestConverter):
+	""" A PredicateForestConverter evaluates every distinct predicate (feature, split) of the forest
+		exactly once per sample and stores the outcomes in a bit vector. The trees are then generated
+		by a predicate tree converter, which tests bits of this vector instead of comparing features.
+	"""
+	def __init__(self, treeConverter, fallbackConverter = None):
+		""" Generate a new PredicateForestConverter
+
+		Args:
+			treeConverter: A tree converter which supports predicates (e.g. PredicateIFTreeConverter)
+			fallbackConverter (optional): A predicate tree converter used for all trees the treeConverter does not accept
+		"""
+		super().__init__(treeConverter, fallbackConverter)
+
+	def getCodeUnits(self, forest):
+		""" Generate the code for the given forest, but keep the code of each tree separately (see ForestConverter.getCodeUnits)
+
+		Args:
+			forest (TYPE): The forest object
+
+		Returns:
+			Tuple: A tuple (headerCode, cppCode, treeCodes)
+		"""
+		dim = self.treeConverter.getDim()
+		namespace = self.treeConverter.getNamespace()
+		featureType = self.treeConverter.getFeatureType()
+		numClasses = forest.getNumClasses()
+
+		predicates = forest.getPredicates()
+		for converter in self.getTreeConverters():
+			converter.setPredicates(predicates)
+		numWords = self.treeConverter.getNumWords()
+
+		# {namespace}_predicates is exposed, so that the trees can be called separately (e.g. by verifyCode.py)
+		headerCode = "unsigned int {namespace}_predict({feature_t} const pX[{dim}]);\n"
+		headerCode += "void {namespace}_predicates({feature_t} const pX[{dim}], unsigned int pB[{num_words}]);\n"
+
+		cppCode = "void {namespace}_predicates({feature_t} const pX[{dim}], unsigned int pB[{num_words}]) {\n"
+		cppCode += "	for (unsigned int i = 0; i < {num_words}; ++i) pB[i] = 0;\n"
+		for (feature, split), i in sorted(predicates.items(), key = lambda x : x[1]):
+			cppCode += "	pB[" + str(i // 32) + "] |= (unsigned int)(pX[" + str(feature) + "] <= " + str(split) + ") << " + str(i % 32) + ";\n"
+		cppCode += "}\n"
+
+		cppCode += "unsigned int {namespace}_predict({feature_t} const pX[{dim}]) {\n"
+		cppCode += "	unsigned int pB[{num_words}];\n"
+		cppCode += "	{namespace}_predicates(pX, pB);\n"
+
+		headerCode = headerCode.replace("{dim}", str(dim)).replace("{num_words}", str(numWords)).replace("{namespace}", namespace).replace("{feature_t}", featureType)
+		cppCode = cppCode.replace("{dim}", str(dim)).replace("{num_words}", str(numWords)).replace("{namespace}", namespace).replace("{feature_t}", featureType)
+		cppCode += self.getVoteCode(numClasses, len(forest.trees), "pB")
+
+		with Profiler.phase("kernel selection"):
+			for converter in self.getTreeConverters():
+				converter.prepareForest(forest)
+
+		treeCodes = []
 		for i in range(len(forest.trees)):
-			tHeader, tCode = self.treeConverter.getCode(forest.trees[i], i, numClasses)
+			tHeader, tCode = self.getTreeConverter(forest.trees[i]).getCode(forest.trees[i], i, numClasses)
 			headerCode += tHeader
-			cppCode += tCode
+			treeCodes.append(tCode)
 
-		return headerCode, cppCode
+		return headerCode, cppCode, treeCodes
+
+class CompactForestConverter(ForestConverter):
+	""" A CompactForestConverter renumbers the features actually used by the forest densely (ordered by
+		their expected number of accesses) and generates the trees against this packed feature vector.
+		The generated {namespace}_predict gathers the used features of a sample before traversing the trees,
+		whereas {namespace}_pack and {namespace}_predict_packed offer a packed input ABI to the caller.
+	"""
+	def __init__(self, treeConverter, fallbackConverter = None):
+		""" Generate a new CompactForestConverter
+
+		Args:
+			treeConverter: A tree converter
+			fallbackConverter (optional): A tree converter used for all trees the treeConverter does not accept
+		"""
+		super().__init__(treeConverter, fallbackConverter)
+
+	def getCodeUnits(self, forest):
+		""" Generate the code for the given forest, but keep the code of each tree separately (see ForestConverter.getCodeUnits)
+
+		Args:
+			forest (TYPE): The forest object
+
+		Returns:
+			Tuple: A tuple (headerCode, cppCode, treeCodes)
+		"""
+		dim = self.treeConverter.getDim()
+		namespace = self.treeConverter.getNamespace()
+		featureType = self.treeConverter.getFeatureType()
+		numClasses = forest.getNumClasses()
+
+		features = forest.getFeatureMapping()
+		if len(features) == 0:
+			features = [0]
+		packedDim = len(features)
+
+		headerCode = "unsigned int {namespace}_predict({feature_t} const pX[{dim}]);\n"
+		headerCode += "void {namespace}_pack({feature_t} const pX[{dim}], {feature_t} pC[{packed_dim}]);\n"
+		headerCode += "unsigned int {namespace}_predict_packed({feature_t} const pC[{packed_dim}]);\n"
+
+		cppCode = "void {namespace}_pack({feature_t} const pX[{dim}], {feature_t} pC[{packed_dim}]) {\n"
+		for i, f in enumerate(features):
+			cppCode += "	pC[" + str(i) + "] = pX[" + str(f) + "];\n"
+		cppCode += "}\n"
+
+		cppCode += "unsigned int {namespace}_predict({feature_t} const pX[{dim}]) {\n"
+		cppCode += "	{feature_t} pC[{packed_dim}];\n"
+		cppCode += "	{namespace}_pack(pX, pC);\n"
+		cppCode += "	return {namespace}_predict_packed(pC);\n"
+		cppCode += "}\n"
+
+		cppCode += "unsigned int {namespace}_predict_packed({feature_t} const pC[{packed_dim}]) {\n"
+
+		headerCode = headerCode.replace("{dim}", str(dim)).replace("{packed_dim}", str(packedDim)).replace("{namespace}", namespace).replace("{feature_t}", featureType)
+		cppCode = cppCode.replace("{dim}", str(dim)).replace("{packed_dim}", str(packedDim)).replace("{namespace}", namespace).replace("{feature_t}", featureType)
+		cppCode += self.getVoteCode(numClasses, len(forest.trees), "pC")
+
+		# The trees are generated against the packed feature vector. We temporarily renumber the
+		# features of the forest (and the dimension of the tree converter) and restore both afterwards
+		forest.remapFeatures({f : i for i, f in enumerate(features)})
+		try:
+			for converter in self.getTreeConverters():
+				converter.dim = packedDim
+				with Profiler.phase("kernel selection"):
+					converter.prepareForest(forest)
+
+			treeCodes = []
+			for i in range(len(forest.trees)):
+				tHeader, tCode = self.getTreeConverter(forest.trees[i]).getCode(forest.trees[i], i, numClasses)
+				headerCode += tHeader
+				treeCodes.append(tCode)
+		finally:
+			for converter in self.getTreeConverters():
+				converter.dim = dim
+			forest.remapFeatures({i : f for i, f in enumerate(features)})
+
+		return headerCode, cppCode, treeCodes
+
+class SoftVoteForestConverter(ForestConverter):
+	""" A SoftVoteForestConverter predicts the class with the largest sum of leaf probabilities instead of
+		the majority of the leaf classes (like sklearn). The probabilities are quantized to 8 or 16 bit
+		fixed-point numbers and stored in the leaf table {namespace}_leaves, so that the votes are summed up
+		in integers. The trees are generated by the given tree converter, but return the index of the reached
+		leaf instead of its class (see TreeConverter.getLabel). The python counterpart is Forest.predict_batch_soft
+	"""
+	def __init__(self, treeConverter, bits = 8, fallbackConverter = None):
+		""" Generate a new SoftVoteForestConverter
+
+		Args:
+			treeConverter: A tree converter
+			bits (int, optional): The number of bits of a quantized probability (8 or 16)
+			fallbackConverter (optional): A tree converter used for all trees the treeConverter does not accept
+		"""
+		super().__init__(treeConverter, fallbackConverter)
+		# The leaf indices have to be returned by separately generated trees, which rules out forest converters (e.g. DAGNativeTreeConverter)
+		assert(not treeConverter.convertsForest and (fallbackConverter is None or not fallbackConverter.convertsForest))
+		assert(bits in [8, 16])
+		self.bits = bits
+		self.offsets = None
+
+	def getLeafType(self):
+		return "unsigned char" if self.bits == 8 else "unsigned short"
+
+	def getCodeUnits(self, forest):
+		""" Generate the code for the given forest, but keep the code of each tree separately (see ForestConverter.getCodeUnits)
+
+		Args:
+			forest (TYPE): The forest object
+
+		Returns:
+			Tuple: A tuple (headerCode, cppCode, treeCodes)
+		"""
+		namespace = self.treeConverter.getNamespace()
+		self.offsets, table = forest.getLeafTable(self.bits)
+
+		leafIndices = {}
+		for t in forest.trees:
+			arrays = t.getArrays()
+			for node, i in zip(arrays[0], t.getLeafIndices(arrays)):
+				if i >= 0:
+					leafIndices[id(node)] = int(i)
+
+		for converter in self.getTreeConverters():
+			converter.setLeafIndices(leafIndices)
+		try:
+			headerCode, cppCode, treeCodes = super().getCodeUnits(forest)
+		finally:
+			for converter in self.getTreeConverters():
+				converter.setLeafIndices(None)
+
+		# The leaf table is declared in the header, so that the quantization is visible to the caller (e.g. verifyCode.py)
+		leavesCode = "{leaf_t} const {namespace}_leaves[{num_leaves}][{num_classes}]" \
+			.replace("{leaf_t}", self.getLeafType()) \
+			.replace("{namespace}", namespace) \
+			.replace("{num_leaves}", str(table.shape[0])) \
+			.replace("{num_classes}", str(table.shape[1]))
+		headerCode = "extern " + leavesCode + ";\n" + headerCode
+		cppCode = leavesCode + " = {" + ",".join(["{" + ",".join([str(p) for p in row]) + "}" for row in table]) + "};\n" + cppCode
+
+		return headerCode, cppCode, treeCodes
 
+	def getVoteCode(self, numClasses, numTrees, argument):
+		""" Generate the soft vote over all trees, which closes the {namespace}_predict function
+
+		Args:
+			numClasses (int): The number of classes
+			numTrees (int): The number of trees in the forest
+			argument (str): The name of the argument passed to each tree
+
+		Returns:
+			String: The voting code as a string
+		"""
+		namespace = self.treeConverter.getNamespace()
+
+		cppCode = "	unsigned int votes[{num_classes}] = {" + ",".join(["0"] * numClasses) + "};\n"
+		cppCode += "	{leaf_t} const * leaf;\n"
+		for i in range(numTrees):
+			cppCode += "	leaf = {namespace}_leaves[{offset} + {namespace}_predict{id}({argument})];\n".replace("{offset}", str(self.offsets[i])).replace("{id}", str(i))
+			cppCode += "	for (unsigned int i = 0; i < {num_classes}; ++i) votes[i] += leaf[i];\n"
+		cppCode += """unsigned int pred = 0;
+				unsigned int cnt = votes[0];
+				for (unsigned int i = 1; i < {num_classes}; ++i) {
+					if (votes[i] > cnt) {
+						cnt = votes[i];
+						pred = i;
+					}
+				}
+				return pred;
+			}\n"""
+		cppCode = cppCode.replace("{num_classes}", str(numClasses)).replace("{leaf_t}", self.getLeafType()).replace("{namespace}", namespace).replace("{argument}", argument)
+
+		return cppCode
 
 class OptimizedNativeForestConverter:
 	""" TODO
@@ -208,3 +658,8 @@ class OptimizedNativeForestConverter:
 		#cppCode += tCode
 
 		return headerCode, cppCode
+
+	def getCodeUnits(self, forest):
+		""" All trees are stored in a single array, so there is no code per tree """
+		headerCode, cppCode = self.getCode(forest)
+		return headerCode, cppCode, []
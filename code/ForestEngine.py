@@ -0,0 +1,393 @@
+import ctypes
+import hashlib
+import os
+import subprocess
+
+import numpy as np
+
+from NativeTreeConverter import StandardNativeTreeConverter, OptimizedNativeTreeConverter
+
+# A node blob is a little-endian file with a header of HEADER_WORDS 32 bit words (see HEADER_FIELDS), the
+# roots of all trees (one word per tree, padded to 16 bytes) and the nodes of all trees (16 bytes each). A
+# node stores its split (int32 or float32, see SPLIT_TYPES), its feature, whose two upper bits mark leaf
+# children (LEFT_LEAF, RIGHT_LEAF), and its children. The child of a leaf is the predicted class. Inner children
+# are always stored after their parent (which holds for both layouts). A root with the CONSTANT_ROOT bit is a tree
+# consisting of a single leaf, the lower bits are its class
+BLOB_MAGIC = 0x424E4652
+BLOB_VERSION = 1
+HEADER_WORDS = 16
+HEADER_FIELDS = ["magic", "version", "splitType", "dim", "numClasses", "numTrees", "numNodes", "layout", "setSize"]
+SPLIT_TYPES = ["int", "float"]
+LAYOUTS = ["standard", "optimized"]
+LEFT_LEAF = 1 << 31
+RIGHT_LEAF = 1 << 30
+CONSTANT_ROOT = 1 << 31
+
+ENGINE_FLAGS = "-std=c++11 -O3 -funroll-loops -shared -fPIC"
+
+engineCode = """#include <cstddef>
+#include <cstdint>
+#include <vector>
+#include <fcntl.h>
+#include <sys/mman.h>
+#include <sys/stat.h>
+#include <unistd.h>
+
+static uint32_t const BLOB_MAGIC = {magic}u;
+static uint32_t const BLOB_VERSION = {version}u;
+static uint32_t const HEADER_WORDS = {header_words}u;
+static uint32_t const LEFT_LEAF = {left_leaf}u;
+static uint32_t const RIGHT_LEAF = {right_leaf}u;
+static uint32_t const CONSTANT_ROOT = {constant_root}u;
+static uint32_t const FEATURE_MASK = ~(LEFT_LEAF | RIGHT_LEAF);
+
+struct Node {
+	union {
+		int32_t i;
+		float f;
+	} split;
+	uint32_t feature;
+	uint32_t left;
+	uint32_t right;
+};
+
+struct Forest {
+	void * base;
+	size_t size;
+	uint32_t const * header;
+	uint32_t const * roots;
+	Node const * nodes;
+};
+
+enum { MAGIC, VERSION, SPLIT_TYPE, DIM, NUM_CLASSES, NUM_TREES, NUM_NODES };
+
+template <typename T> inline T getSplit(Node const & node);
+template <> inline int32_t getSplit<int32_t>(Node const & node) { return node.split.i; }
+template <> inline float getSplit<float>(Node const & node) { return node.split.f; }
+
+template <typename T>
+inline unsigned int predictTree(Node const * nodes, uint32_t root, T const * x) {
+	if (root & CONSTANT_ROOT) {
+		return root & ~CONSTANT_ROOT;
+	}
+
+	uint32_t i = root;
+	while (true) {
+		Node const & node = nodes[i];
+		if (x[node.feature & FEATURE_MASK] <= getSplit<T>(node)) {
+			if (node.feature & LEFT_LEAF) {
+				return node.left;
+			}
+			i = node.left;
+		} else {
+			if (node.feature & RIGHT_LEAF) {
+				return node.right;
+			}
+			i = node.right;
+		}
+	}
+}
+
+template <typename T>
+void predict(Forest const * forest, T const * pX, size_t n, unsigned int * pPred, unsigned int * pTrees) {
+	uint32_t const dim = forest->header[DIM];
+	uint32_t const numTrees = forest->header[NUM_TREES];
+	uint32_t const numClasses = forest->header[NUM_CLASSES];
+	std::vector<unsigned int> predCnt(numClasses);
+
+	for (size_t i = 0; i < n; ++i) {
+		T const * x = pX + i * dim;
+		for (uint32_t c = 0; c < numClasses; ++c) {
+			predCnt[c] = 0;
+		}
+
+		for (uint32_t t = 0; t < numTrees; ++t) {
+			unsigned int c = predictTree<T>(forest->nodes, forest->roots[t], x);
+			predCnt[c]++;
+			if (pTrees != NULL) {
+				pTrees[i * numTrees + t] = c;
+			}
+		}
+
+		if (pPred != NULL) {
+			unsigned int pred = 0;
+			for (uint32_t c = 1; c < numClasses; ++c) {
+				if (predCnt[c] > predCnt[pred]) {
+					pred = c;
+				}
+			}
+			pPred[i] = pred;
+		}
+	}
+}
+
+// The number of words of the roots (padded to 16 bytes). Computed in size_t, since it overflows uint32_t for large NUM_TREES
+static size_t getRootWords(uint32_t const * header) {
+	return ((size_t)header[NUM_TREES] + 3) / 4 * 4;
+}
+
+// Check all indices once, so that traversing a broken blob never reads outside of the mapping. Since inner children
+// have to be stored after their parent, every traversal ends after at most NUM_NODES steps
+static bool isValid(Forest const * forest) {
+	uint32_t const * h = forest->header;
+	size_t rootWords = getRootWords(h);
+	if (h[MAGIC] != BLOB_MAGIC || h[VERSION] != BLOB_VERSION || h[SPLIT_TYPE] > 1 || h[NUM_CLASSES] == 0 ||
+		forest->size != (HEADER_WORDS + rootWords) * 4 + (size_t)h[NUM_NODES] * sizeof(Node)) {
+		return false;
+	}
+
+	for (uint32_t t = 0; t < h[NUM_TREES]; ++t) {
+		uint32_t root = forest->roots[t];
+		if ((root & CONSTANT_ROOT) ? (root & ~CONSTANT_ROOT) >= h[NUM_CLASSES] : root >= h[NUM_NODES]) {
+			return false;
+		}
+	}
+
+	for (uint32_t i = 0; i < h[NUM_NODES]; ++i) {
+		Node const & node = forest->nodes[i];
+		if ((node.feature & FEATURE_MASK) >= h[DIM] ||
+			node.left >= ((node.feature & LEFT_LEAF) ? h[NUM_CLASSES] : h[NUM_NODES]) ||
+			node.right >= ((node.feature & RIGHT_LEAF) ? h[NUM_CLASSES] : h[NUM_NODES]) ||
+			(!(node.feature & LEFT_LEAF) && node.left <= i) || (!(node.feature & RIGHT_LEAF) && node.right <= i)) {
+			return false;
+		}
+	}
+
+	return true;
+}
+
+extern "C" {
+
+void * forest_open(char const * path) {
+	int fd = open(path, O_RDONLY);
+	if (fd < 0) {
+		return NULL;
+	}
+
+	struct stat st;
+	if (fstat(fd, &st) != 0 || (size_t)st.st_size < HEADER_WORDS * 4) {
+		close(fd);
+		return NULL;
+	}
+
+	void * base = mmap(NULL, st.st_size, PROT_READ, MAP_PRIVATE, fd, 0);
+	close(fd);
+	if (base == MAP_FAILED) {
+		return NULL;
+	}
+
+	Forest * forest = new Forest;
+	forest->base = base;
+	forest->size = st.st_size;
+	forest->header = (uint32_t const *)base;
+	forest->roots = forest->header + HEADER_WORDS;
+	forest->nodes = (Node const *)(forest->roots + getRootWords(forest->header));
+
+	if (!isValid(forest)) {
+		munmap(base, st.st_size);
+		delete forest;
+		return NULL;
+	}
+
+	return forest;
+}
+
+void forest_close(void * handle) {
+	Forest * forest = (Forest *)handle;
+	munmap(forest->base, forest->size);
+	delete forest;
+}
+
+uint32_t const * forest_header(void * handle) {
+	return ((Forest *)handle)->header;
+}
+
+void forest_predict(void * handle, void const * pX, size_t n, unsigned int * pPred, unsigned int * pTrees) {
+	Forest const * forest = (Forest *)handle;
+	if (forest->header[SPLIT_TYPE] == 0) {
+		predict<int32_t>(forest, (int32_t const *)pX, n, pPred, pTrees);
+	} else {
+		predict<float>(forest, (float const *)pX, n, pPred, pTrees);
+	}
+}
+
+}
+""".replace("{magic}", str(BLOB_MAGIC)) \
+   .replace("{version}", str(BLOB_VERSION)) \
+   .replace("{header_words}", str(HEADER_WORDS)) \
+   .replace("{left_leaf}", str(LEFT_LEAF)) \
+   .replace("{right_leaf}", str(RIGHT_LEAF)) \
+   .replace("{constant_root}", str(CONSTANT_ROOT))
+
+def getNodeType(splitType):
+	""" Returns the numpy type of a node of a blob with the given split type ("int" or "float") """
+	return np.dtype([("split", "<i4" if splitType == "int" else "<f4"), ("feature", "<u4"), ("left", "<u4"), ("right", "<u4")])
+
+def getSplits(splits, splitType):
+	""" Convert the splits (float64) to the split type of the blob without changing any comparison x <= split.
+		For integer features, this is the largest integer <= split. For float32 features, the split is rounded
+		towards -inf, since x <= split for a float32 x iff x <= the largest float32 which is <= split
+	"""
+	splits = np.asarray(splits, dtype = np.float64)
+	if splitType == "int":
+		info = np.iinfo(np.int32)
+		return np.clip(np.floor(splits), info.min, info.max).astype(np.int32)
+
+	rounded = splits.astype(np.float32)
+	tooLarge = rounded.astype(np.float64) > splits
+	rounded[tooLarge] = np.nextafter(rounded[tooLarge], np.float32(-np.inf))
+	return rounded
+
+def getLayoutConverter(layout, dim, setSize):
+	""" Returns the native converter whose array layout (getArrayStructs) is used for the given layout """
+	if layout == "standard":
+		return StandardNativeTreeConverter(dim, "ForestEngine", "float")
+	elif layout == "optimized":
+		return OptimizedNativeTreeConverter(dim, "ForestEngine", "float", setSize)
+	else:
+		raise NotImplementedError("Please use one of " + ", ".join(LAYOUTS) + " as layout")
+
+def toBlob(forest, dim, splitType = "float", layout = "optimized", setSize = 8):
+	""" Pack the forest into a node blob (see BLOB_MAGIC) using the array layout of the native converters
+
+	Args:
+		forest (Forest): The forest
+		dim (int): The dimension of the features
+		splitType (str, optional): "int" for integer features (given as int32) or "float" for float32 features
+		layout (str, optional): "standard" (BFS, see StandardNativeTreeConverter) or "optimized" (most probable paths
+								of setSize nodes are consecutive, see OptimizedNativeTreeConverter)
+		setSize (int, optional): The number of nodes per path for the optimized layout
+
+	Returns:
+		bytes: The blob
+	"""
+	converter = getLayoutConverter(layout, dim, setSize)
+	roots = []
+	trees = []
+	numNodes = 0
+	for tree in forest.trees:
+		if tree.head.prediction is not None:
+			roots.append(CONSTANT_ROOT | int(np.argmax(tree.head.prediction)))
+			continue
+
+		if layout == "optimized":
+			tree.getProbAllPaths()
+		entries = converter.getArrayStructs(tree.head)
+
+		indicator = np.array([e[4] for e in entries], dtype = np.int64)
+		leftLeaf = (indicator == 1) | (indicator == 3)
+		rightLeaf = (indicator == 2) | (indicator == 3)
+		left = np.array([e[2] for e in entries], dtype = np.int64)
+		right = np.array([e[3] for e in entries], dtype = np.int64)
+
+		nodes = np.zeros(len(entries), dtype = getNodeType(splitType))
+		nodes["split"] = getSplits([e[1] for e in entries], splitType)
+		nodes["feature"] = np.array([e[0] for e in entries], dtype = np.uint32) | np.where(leftLeaf, LEFT_LEAF, 0).astype(np.uint32) | np.where(rightLeaf, RIGHT_LEAF, 0).astype(np.uint32)
+		# The children are local to the tree, all trees are stored in one array
+		nodes["left"] = np.where(leftLeaf, left, left + numNodes)
+		nodes["right"] = np.where(rightLeaf, right, right + numNodes)
+
+		roots.append(numNodes)
+		trees.append(nodes)
+		numNodes += len(nodes)
+
+	header = np.zeros(HEADER_WORDS, dtype = "<u4")
+	values = [BLOB_MAGIC, BLOB_VERSION, SPLIT_TYPES.index(splitType), dim, forest.getNumClasses(), len(forest.trees), numNodes, LAYOUTS.index(layout), setSize]
+	header[:len(values)] = values
+	roots = np.array(roots + [0] * (-len(roots) % 4), dtype = "<u4")
+
+	return b"".join([header.tobytes(), roots.tobytes()] + [t.tobytes() for t in trees])
+
+def writeBlob(forest, blobFile, dim, splitType = "float", layout = "optimized", setSize = 8):
+	""" Write the node blob of the forest (see toBlob). The file is replaced atomically, so that a running
+		ForestEngine can switch to the new model with reload()
+	"""
+	blob = toBlob(forest, dim, splitType, layout, setSize)
+	tmpFile = blobFile + "." + str(os.getpid()) + ".tmp"
+	with open(tmpFile, 'wb') as outFile:
+		outFile.write(blob)
+	os.replace(tmpFile, blobFile)
+
+def getLibrary(compiler = "g++", flags = ENGINE_FLAGS):
+	""" Returns the engine as shared library. It is compiled once and cached next to this module (one file
+		per version of the code and flags), so that loading a model does not need a compiler afterwards
+	"""
+	key = hashlib.sha1((engineCode + compiler + flags).encode()).hexdigest()[:12]
+	path = os.path.dirname(os.path.abspath(__file__))
+	library = os.path.join(path, "libForestEngine_" + key + ".so")
+
+	if not os.path.exists(library):
+		cppFile = os.path.join(path, "ForestEngine_" + key + "." + str(os.getpid()) + ".cpp")
+		tmpFile = library + "." + str(os.getpid()) + ".tmp"
+		with open(cppFile, 'w') as f:
+			f.write(engineCode)
+		try:
+			subprocess.run(compiler.split() + flags.split() + [cppFile, "-o", tmpFile], check = True)
+			os.replace(tmpFile, library)
+		finally:
+			os.remove(cppFile)
+
+	lib = ctypes.CDLL(library)
+	lib.forest_open.restype = ctypes.c_void_p
+	lib.forest_open.argtypes = [ctypes.c_char_p]
+	lib.forest_close.restype = None
+	lib.forest_close.argtypes = [ctypes.c_void_p]
+	lib.forest_header.restype = ctypes.POINTER(ctypes.c_uint32)
+	lib.forest_header.argtypes = [ctypes.c_void_p]
+	lib.forest_predict.restype = None
+	lib.forest_predict.argtypes = [ctypes.c_void_p, ctypes.c_void_p, ctypes.c_size_t, ctypes.c_void_p, ctypes.c_void_p]
+
+	return lib
+
+class ForestEngine:
+	""" A ForestEngine predicts with a node blob (see toBlob) in the precompiled engine. The blob is memory
+		mapped, so deploying a new model is a matter of replacing the file (see writeBlob) and calling reload()
+	"""
+	def __init__(self, blobFile, lib = None):
+		self.blobFile = blobFile
+		self.lib = getLibrary() if lib is None else lib
+		self.handle = None
+		self.reload()
+
+	def reload(self):
+		""" Map the current content of blobFile. The old mapping is only released if the new one is valid """
+		handle = self.lib.forest_open(self.blobFile.encode())
+		if not handle:
+			raise ValueError("Could not load the node blob " + self.blobFile)
+
+		if self.handle is not None:
+			self.lib.forest_close(self.handle)
+		self.handle = handle
+
+		header = self.lib.forest_header(self.handle)
+		self.header = {name : int(header[i]) for i, name in enumerate(HEADER_FIELDS)}
+		self.splitType = SPLIT_TYPES[self.header["splitType"]]
+		self.layout = LAYOUTS[self.header["layout"]]
+
+	def close(self):
+		if self.handle is not None:
+			self.lib.forest_close(self.handle)
+			self.handle = None
+
+	def __del__(self):
+		self.close()
+
+	def getFeatures(self, X):
+		X = np.ascontiguousarray(X, dtype = np.int32 if self.splitType == "int" else np.float32)
+		if X.ndim != 2 or X.shape[1] != self.header["dim"]:
+			raise ValueError("Expected features of shape (n, " + str(self.header["dim"]) + ")")
+		return X
+
+	def predict_batch(self, X):
+		""" Returns the majority vote of all trees for each row of X (as Forest.predict_batch) """
+		X = self.getFeatures(X)
+		pred = np.zeros(len(X), dtype = np.uint32)
+		self.lib.forest_predict(self.handle, X.ctypes.data, len(X), pred.ctypes.data, None)
+		return pred.astype(np.int64)
+
+	def predict_trees(self, X):
+		""" Returns the class predicted by each tree for each row of X (as Forest.predict_trees) """
+		X = self.getFeatures(X)
+		pred = np.zeros((len(X), self.header["numTrees"]), dtype = np.uint32)
+		self.lib.forest_predict(self.handle, X.ctypes.data, len(X), None, pred.ctypes.data)
+		return pred.astype(np.int64)
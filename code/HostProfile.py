@@ -0,0 +1,149 @@
+import json
+import os
+import sys
+
+class HostProfile:
+	""" A HostProfile describes the cache topology of the machine the generated code runs on. It is either
+		read from /sys/devices/system/cpu/cpu0/cache (for the local machine) or from a JSON file (e.g. for
+		cross targets, see main() to create such a file on the target machine). All sizes are in bytes
+	"""
+	def __init__(self):
+		self.l1i = None
+		self.l1d = None
+		self.l2 = None
+		self.l3 = None
+		self.lineSize = None
+
+	def parseSize(self, size):
+		# sysfs reports sizes like 32K or 2M
+		size = size.strip()
+		if size.endswith("K"):
+			return int(size[:-1]) * 1024
+		elif size.endswith("M"):
+			return int(size[:-1]) * 1024 * 1024
+		else:
+			return int(size)
+
+	def fromSysfs(self, path = "/sys/devices/system/cpu/cpu0/cache"):
+		""" Read the cache topology of the local machine
+
+		Args:
+			path (str, optional): The sysfs cache directory of a cpu
+
+		Returns:
+			bool: True if at least one cache was found
+		"""
+		if not os.path.isdir(path):
+			return False
+
+		found = False
+		for index in sorted(os.listdir(path)):
+			if not index.startswith("index"):
+				continue
+
+			try:
+				with open(os.path.join(path, index, "level")) as f:
+					level = int(f.read())
+				with open(os.path.join(path, index, "type")) as f:
+					cacheType = f.read().strip()
+				with open(os.path.join(path, index, "size")) as f:
+					size = self.parseSize(f.read())
+				with open(os.path.join(path, index, "coherency_line_size")) as f:
+					lineSize = int(f.read())
+			except (IOError, ValueError):
+				continue
+
+			found = True
+			self.lineSize = lineSize
+			if level == 1 and cacheType == "Instruction":
+				self.l1i = size
+			elif level == 1 and cacheType == "Data":
+				self.l1d = size
+			elif level == 1:
+				# Unified L1 cache
+				self.l1i = size
+				self.l1d = size
+			elif level == 2:
+				self.l2 = size
+			elif level == 3:
+				self.l3 = size
+
+		return found
+
+	def fromJSON(self, jsonFile):
+		with open(jsonFile) as data_file:
+			data = json.load(data_file)
+
+		self.l1i = data.get("l1i", None)
+		self.l1d = data.get("l1d", None)
+		self.l2 = data.get("l2", None)
+		self.l3 = data.get("l3", None)
+		self.lineSize = data.get("lineSize", None)
+
+	def toJSON(self):
+		return json.dumps({
+			"l1i" : self.l1i,
+			"l1d" : self.l1d,
+			"l2" : self.l2,
+			"l3" : self.l3,
+			"lineSize" : self.lineSize
+		}, indent = 4)
+
+	def getBudgetSizes(self):
+		""" Returns the i-cache budgets for the if-else kernels: The L1 instruction cache and half of
+			the L2 cache (which is shared with data). Empty if the cache sizes are unknown
+		"""
+		budgetSizes = []
+		if self.l1i is not None:
+			budgetSizes.append(self.l1i)
+
+		if self.l2 is not None and self.l2 // 2 not in budgetSizes:
+			budgetSizes.append(self.l2 // 2)
+
+		return budgetSizes
+
+	def getSetSizes(self, nodeSize = 8):
+		""" Returns the set sizes for the native path-oriented layout: The number of nodes which fit into
+			a single cache line and into four consecutive cache lines (which adjacent-line prefetchers
+			typically fetch together). Empty if the line size is unknown
+
+		Args:
+			nodeSize (int, optional): The (estimated) size of a single node of the native array in bytes
+		"""
+		if self.lineSize is None:
+			return []
+
+		return [max(1, self.lineSize // nodeSize), max(1, 4 * self.lineSize // nodeSize)]
+
+def getLocalProfile():
+	""" Returns the HostProfile of the local machine or None if the cache topology is not available """
+	profile = HostProfile()
+	if profile.fromSysfs():
+		return profile
+	else:
+		return None
+
+def getDefaultBudgetSize(architecture = "intel"):
+	""" Returns the size of the L1 instruction cache of the given target architecture. The caches of the
+		local machine are only used for intel, since the code of the cross targets (arm, ppc) runs elsewhere.
+		Otherwise or if the cache size is not available, 32*1000 is returned
+	"""
+	profile = getLocalProfile() if architecture == "intel" else None
+	if profile is not None and profile.l1i is not None:
+		return profile.l1i
+	else:
+		return 32*1000
+
+def main(argv):
+	# Run this on the target machine to create an override file for cross compilation, e.g.
+	#	python3 HostProfile.py > arm.json
+	profile = getLocalProfile()
+	if profile is None:
+		print("Could not read the cache topology from /sys/devices/system/cpu/cpu0/cache", file = sys.stderr)
+		return 1
+
+	print(profile.toJSON())
+	return 0
+
+if __name__ == "__main__":
+	sys.exit(main(sys.argv[1:]))
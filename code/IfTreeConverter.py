@@ -1,9 +1,9 @@
 from ForestConverter import TreeConverter
+from CostModel import CostModel
 import numpy as np
 from functools import reduce
 import heapq
-import gc
-#import objgraph
+import Profiler
 
 class StandardIFTreeConverter(TreeConverter):
     """ A IfTreeConverter converts a DecisionTree into its if-else structure in c language
@@ -36,7 +36,7 @@ class StandardIFTreeConverter(TreeConverter):
             # for i in range(len(head.prediction)):
             #     code += tabs + "pred[" + str(i) + "] += " + str(head.prediction[i]) + ";\n"
 
-            return tabs + "return " + str(int(np.argmax(head.prediction))) + ";\n" ;
+            return tabs + "return " + str(self.getLabel(head)) + ";\n" ;
             #return tabs + "return " + str(int(head.prediction)) + ";\n" ;
             #return tabs + "return " + str(float(head.prediction)) + ";\n" ;
         else:
@@ -83,11 +83,16 @@ class StandardIFTreeConverter(TreeConverter):
 class OptimizedIFTreeConverter(TreeConverter):
     """ A IfTreeConverter converts a DecisionTree into its if-else structure in c language
     """
-    def __init__(self, dim, namespace, featureType, architecture, orientation="path", budgetSize=32*1000):
+    def __init__(self, dim, namespace, featureType, architecture, orientation="path", budgetSize=32*1000, costModel=None):
         super().__init__(dim, namespace, featureType)
         self.architecture = architecture
         if self.architecture != "arm" and self.architecture != "intel" and self.architecture != "ppc":
            raise NotImplementedError("Please use 'arm' or 'intel' or 'ppc' as target architecture - other architectures are not supported")
+        # The estimated code size per node. Use a calibrated cost model if given (see CostModel.calibrate)
+        if costModel is None:
+            self.costModel = CostModel(architecture)
+        else:
+            self.costModel = costModel
         self.inKernel = {}
         # size of i-cache is 32kB. One instruction is 32B. So there are 1024 instructions in i-cache
         self.givenBudget = budgetSize
@@ -212,44 +217,7 @@ class OptimizedIFTreeConverter(TreeConverter):
 
 
     def sizeOfNode(self, tree, node, splitDataType):
-        size = 0
-
-        if node.prediction is not None:
-            if splitDataType == "int" and self.architecture == "arm":
-                size += 2*4
-            elif splitDataType == "float" and self.architecture == "arm":
-                size += 2*4
-            elif splitDataType == "int" and self.architecture == "intel":
-                size += 10
-            elif splitDataType == "float" and self.architecture == "intel":
-                size += 10
-            elif splitDataType == "int" and self.architecture == "ppc":
-                size += 2*4
-            elif splitDataType == "float" and self.architecture == "ppc":
-                size += 2*4
-        else:
-            # In O0, the basic size of a split node is 4 instructions for loading.
-            # Since a split node must contain a pair of if-else statements,
-            # one instruction for branching is not avoidable.
-            if splitDataType == "int" and self.architecture == "arm":
-                # this is for arm int (ins * bytes)
-                size += 5*4
-            elif splitDataType == "float" and self.architecture == "arm":
-                # this is for arm float
-                size += 8*4
-            elif splitDataType == "int" and self.architecture == "ppc":
-                # this is for ppc int (ins * bytes)
-                size += 5*4
-            elif splitDataType == "float" and self.architecture == "ppc":
-                # this is for ppc float
-                size += 8*4
-            elif splitDataType == "int" and self.architecture == "intel":
-                # this is for intel integer (bytes)
-                size += 28
-            elif splitDataType == "float" and self.architecture == "intel":
-                # this is for intel float (bytes)
-                size += 17
-        return size
+        return self.costModel.sizeOfNode(node, splitDataType)
 
     def getSwapImplementation(self, treeID, head, level = 1):
         """ Generate the actual if-else implementation for a given node
@@ -276,7 +244,7 @@ class OptimizedIFTreeConverter(TreeConverter):
         if head.prediction is not None:
              # for i in range(len(head.prediction)):
              #    code += tabs + "pred[" + str(i) + "] += " + str(head.prediction[i]) + ";\n"
-                return tabs + "return " + str(int(np.argmax(head.prediction))) + ";\n" ;
+                return tabs + "return " + str(self.getLabel(head)) + ";\n" ;
                 #return tabs + "return " + str(int(head.prediction)) + ";\n" ;
                 #return tabs + "return " + str(float(head.prediction)) + ";\n" ;
         else:
@@ -330,10 +298,10 @@ class OptimizedIFTreeConverter(TreeConverter):
                     # predCode += tabs + "pred[" + str(i) + "] += " + str(head.prediction[i]) + ";\n"
 
                 if self.inKernel[head.id] is False:
-                    return (code, tabs + "return " + str(int(np.argmax(head.prediction))) + ";\n", labelIdx)
+                    return (code, tabs + "return " + str(self.getLabel(head)) + ";\n", labelIdx)
                     # return (code, predCode, labelIdx)
                 else:
-                    return (tabs + "return " + str(int(np.argmax(head.prediction))) + ";\n", labels,  labelIdx)
+                    return (tabs + "return " + str(self.getLabel(head)) + ";\n", labels,  labelIdx)
                     # return (tabs + predCode, labels,  labelIdx)
         else:
                 # it is split node
@@ -451,13 +419,8 @@ class OptimizedIFTreeConverter(TreeConverter):
             Tuple: A tuple (headerCode, cppCode), where headerCode contains the code (=string) for
             a *.h file and cppCode contains the code (=string) for a *.cpp file
         """
-        # gc.collect()
-        # objgraph.show_most_common_types(limit=20)
-        # print("\tGET ALL PROBS")
-        tree.getProbAllPaths()
-        # print("\tDONE PROBS")  
-        # gc.collect()
-        # objgraph.show_most_common_types(limit=20)
+        with Profiler.phase("probabilities"):
+            tree.getProbAllPaths()
 
         featureType = self.getFeatureType()
         cppCode = "inline unsigned int {namespace}_predict{treeID}({feature_t} const pX[{dim}]){\n" \
@@ -474,23 +437,19 @@ class OptimizedIFTreeConverter(TreeConverter):
         #print("GET IMPL")
         #print("\tPATH SORT")
         if self.orientation == "path":
-            self.pathSort(tree)
+            with Profiler.phase("kernel selection"):
+                self.pathSort(tree)
             output = self.getImplementation(tree, treeID, tree.head, 0)
             cppCode += output[0] #code
             cppCode += output[1] #label
         elif self.orientation == "swap":
             cppCode += self.getSwapImplementation(treeID, tree.head)
         else:
-            # print("\tPATH SORT START")
-            # gc.collect()
-            # objgraph.show_most_common_types(limit=20)
-            self.nodeSort(tree)
+            with Profiler.phase("kernel selection"):
+                self.nodeSort(tree)
             output = self.getImplementation(tree, treeID, tree.head, 0)
             cppCode += output[0] #code
             cppCode += output[1] #label
-            # print("\tPATH SORT DONE")
-            # gc.collect()
-            # objgraph.show_most_common_types(limit=20)
 
         #self.nodeSort(tree)
         #print("\tGET IMPL")
@@ -506,3 +465,175 @@ class OptimizedIFTreeConverter(TreeConverter):
                                         .replace("{feature_t}", featureType)
 
         return headerCode, cppCode
+
+class PredicateIFTreeConverter(StandardIFTreeConverter):
+    """ A PredicateIFTreeConverter converts a DecisionTree into its if-else structure in c language,
+        but tests bits of a pre-computed predicate vector instead of comparing features. It has to be used
+        together with a PredicateForestConverter, which sets the predicates of the forest
+    """
+    def __init__(self, dim, namespace, featureType):
+        super().__init__(dim, namespace, featureType)
+        self.predicates = {}
+
+    def getImplementation(self, treeID, head, level = 1):
+        """ Generate the actual if-else implementation for a given node
+
+        Args:
+            treeID (TYPE): The id of this tree (in case we are dealing with a forest)
+            head (TYPE): The current node to generate an if-else structure for.
+            level (int, optional): The intendation level of the generated code for easier
+                                                        reading of the generated code
+
+        Returns:
+            String: The actual if-else code as a string
+        """
+        code = ""
+        tabs = "".join(['\t' for i in range(level)])
+
+        if head.prediction is not None:
+            return tabs + "return " + str(self.getLabel(head)) + ";\n" ;
+        else:
+                i = self.predicates[(head.feature, head.split)]
+                code += tabs + "if(pB[" + str(i // 32) + "] & " + hex(1 << (i % 32)) + "u){\n"
+                code += self.getImplementation(treeID, head.leftChild, level + 1)
+                code += tabs + "} else {\n"
+                code += self.getImplementation(treeID, head.rightChild, level + 1)
+                code += tabs + "}\n"
+
+        return code
+
+    def getCode(self, tree, treeID, numClasses):
+        """ Generate the actual if-else implementation for a given tree
+
+        Args:
+            tree (TYPE): The tree
+            treeID (TYPE): The id of this tree (in case we are dealing with a forest)
+
+        Returns:
+            Tuple: A tuple (headerCode, cppCode), where headerCode contains the code (=string) for
+            a *.h file and cppCode contains the code (=string) for a *.cpp file
+        """
+        cppCode = "inline unsigned int {namespace}_predict{treeID}(unsigned int const pB[{numWords}]){\n" \
+                                .replace("{treeID}", str(treeID)) \
+                                .replace("{numWords}", str(self.getNumWords())) \
+                                .replace("{namespace}", self.namespace)
+
+        cppCode += self.getImplementation(treeID, tree.head)
+        cppCode += "}\n"
+
+        headerCode = "inline unsigned int {namespace}_predict{treeID}(unsigned int const pB[{numWords}]);\n" \
+                                        .replace("{treeID}", str(treeID)) \
+                                        .replace("{numWords}", str(self.getNumWords())) \
+                                        .replace("{namespace}", self.namespace)
+
+        return headerCode, cppCode
+
+class SharedIFTreeConverter(StandardIFTreeConverter):
+    """ A SharedIFTreeConverter converts a DecisionTree into its if-else structure in c language, but
+        emits every subtree which occurs multiple times in the forest only once as a helper function.
+        All occurrences of such a subtree call the shared helper instead of repeating its code
+    """
+    def __init__(self, dim, namespace, featureType, minSplits = 3, noInline = True):
+        """ Generate a new SharedIFTreeConverter
+
+        Args:
+            minSplits (int, optional): The minimum number of split nodes a subtree must contain to be shared
+            noInline (bool, optional): If True, the compiler is not allowed to inline the helpers again
+        """
+        super().__init__(dim, namespace, featureType)
+        self.minSplits = minSplits
+        self.noInline = noInline
+        self.shared = set()
+        self.emitted = set()
+
+    def getNumSplitsBelow(self, node, sizes):
+        if node.prediction is not None:
+            return 0
+
+        if node.subtreeID not in sizes:
+            sizes[node.subtreeID] = 1 + self.getNumSplitsBelow(node.leftChild, sizes) + self.getNumSplitsBelow(node.rightChild, sizes)
+
+        return sizes[node.subtreeID]
+
+    def prepareForest(self, forest):
+        # Leaves are identified by their label, so that shared subtrees also return the same leaf indices for soft voting
+        counts = forest.hashConsSubtrees(self.getLabel)
+        sizes = {}
+        for t in forest.trees:
+            self.getNumSplitsBelow(t.head, sizes)
+
+        self.shared = set([sid for sid in sizes if counts[sid] > 1 and sizes[sid] >= self.minSplits])
+        self.emitted = set()
+        self.helperCode = ""
+
+    def getHelper(self, treeID, head):
+        """ Generate the helper function for the given shared subtree (if not done already). Helpers
+            of nested shared subtrees are generated first, so that they are defined before their use
+        """
+        if head.subtreeID in self.emitted:
+            return
+
+        body = self.getImplementation(treeID, head, 1, False)
+
+        if self.noInline:
+            qualifier = "inline __attribute__((noinline)) unsigned int"
+        else:
+            qualifier = "inline unsigned int"
+
+        self.helperCode += "{qualifier} {namespace}_shared{subtreeID}({feature_t} const pX[{dim}]){\n" \
+                                .replace("{qualifier}", qualifier) \
+                                .replace("{subtreeID}", str(head.subtreeID)) \
+                                .replace("{dim}", str(self.dim)) \
+                                .replace("{namespace}", self.namespace) \
+                                .replace("{feature_t}", self.getFeatureType())
+        self.helperCode += body
+        self.helperCode += "}\n"
+        self.emitted.add(head.subtreeID)
+
+    def getImplementation(self, treeID, head, level = 1, share = True):
+        """ Generate the actual if-else implementation for a given node
+
+        Args:
+            treeID (TYPE): The id of this tree (in case we are dealing with a forest)
+            head (TYPE): The current node to generate an if-else structure for.
+            level (int, optional): The intendation level of the generated code for easier
+                                                        reading of the generated code
+            share (bool, optional): If False, the given node is not replaced by its helper. This is
+                                                        used to generate the body of the helper itself
+
+        Returns:
+            String: The actual if-else code as a string
+        """
+        code = ""
+        tabs = "".join(['\t' for i in range(level)])
+
+        if head.prediction is not None:
+            return tabs + "return " + str(self.getLabel(head)) + ";\n" ;
+        elif share and head.subtreeID in self.shared:
+            self.getHelper(treeID, head)
+            return tabs + "return " + self.namespace + "_shared" + str(head.subtreeID) + "(pX);\n"
+        else:
+                code += tabs + "if(pX[" + str(head.feature) + "] <= " + str(head.split) + "){\n"
+                code += self.getImplementation(treeID, head.leftChild, level + 1)
+                code += tabs + "} else {\n"
+                code += self.getImplementation(treeID, head.rightChild, level + 1)
+                code += tabs + "}\n"
+
+        return code
+
+    def getCode(self, tree, treeID, numClasses):
+        """ Generate the actual if-else implementation for a given tree. Shared helpers which are used for the
+            first time by this tree are returned as part of the header, so that all trees can use them
+
+        Args:
+            tree (TYPE): The tree
+            treeID (TYPE): The id of this tree (in case we are dealing with a forest)
+
+        Returns:
+            Tuple: A tuple (headerCode, cppCode), where headerCode contains the code (=string) for
+            a *.h file and cppCode contains the code (=string) for a *.cpp file
+        """
+        self.helperCode = ""
+        headerCode, cppCode = super().getCode(tree, treeID, numClasses)
+
+        return self.helperCode + headerCode, cppCode
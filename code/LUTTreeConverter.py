@@ -0,0 +1,110 @@
+from ForestConverter import TreeConverter
+import numpy as np
+
+class LUTTreeConverter(TreeConverter):
+    """ A LUTTreeConverter converts a shallow DecisionTree into a lookup table. All distinct predicates
+        (feature, split) of the tree are evaluated and packed into a bitmask, which is then used as an
+        index into a precomputed table of classes. Thus, no traversal is performed at all.
+        The table of a tree with k distinct predicates has 2^k entries, so only trees with at most maxPredicates
+        distinct predicates are accepted. This covers all trees of depth <= 4 (at most 15 splits), but a complete
+        tree of depth 5 already tests up to 31 predicates. Thus, this converter should be used together with a
+        fallback converter (see ForestConverter)
+    """
+    def __init__(self, dim, namespace, featureType, maxPredicates = 16, maxDepth = None):
+        """ Generate a new LUTTreeConverter
+
+        Args:
+            dim (int): The dimension of the input data
+            namespace (str): The namespace of the generated code
+            featureType (str): The data type of the features
+            maxPredicates (int, optional): The maximum number of distinct predicates of a tree. The table
+                                           of a tree has up to 2^maxPredicates entries (64 KiB for 16 predicates and
+                                           8 bit classes)
+            maxDepth (int, optional): The maximum depth of a tree. No limit if None
+        """
+        super().__init__(dim, namespace, featureType)
+        self.maxPredicates = maxPredicates
+        self.maxDepth = maxDepth
+
+    def getTreePredicates(self, tree):
+        # Sort the predicates to get a deterministic bit order
+        return sorted(tree.getPredicates(), key = lambda p : (p[0], p[1]))
+
+    def accepts(self, tree):
+        if self.maxDepth is not None and tree.getMaxDepth() > self.maxDepth:
+            return False
+
+        return len(tree.getPredicates()) <= self.maxPredicates
+
+    def getTable(self, tree, predicates):
+        """ Compute the class for every possible outcome of the predicates
+
+        Args:
+            tree (Tree): The tree
+            predicates (list): The predicates (feature, split) of the tree. Predicate i is stored in bit i
+
+        Returns:
+            list: A list with 2^len(predicates) entries, where entry m contains the predicted class
+                  if the predicates are evaluated as given by the bitmask m
+        """
+        bits = {p : i for i, p in enumerate(predicates)}
+        table = []
+        for mask in range(1 << len(predicates)):
+            node = tree.head
+            while node.prediction is None:
+                if mask & (1 << bits[(node.feature, node.split)]):
+                    node = node.leftChild
+                else:
+                    node = node.rightChild
+            table.append(self.getLabel(node))
+
+        return table
+
+    def getCode(self, tree, treeID, numClasses):
+        """ Generate the lookup table and the index computation for a given tree
+
+        Args:
+            tree (TYPE): The tree
+            treeID (TYPE): The id of this tree (in case we are dealing with a forest)
+            numClasses (int): The number of classes
+
+        Returns:
+            Tuple: A tuple (headerCode, cppCode), where headerCode contains the code (=string) for
+            a *.h file and cppCode contains the code (=string) for a *.cpp file
+        """
+        featureType = self.getFeatureType()
+        predicates = self.getTreePredicates(tree)
+        table = self.getTable(tree, predicates)
+
+        # The entries are classes or leaf indices (see TreeConverter.getLabel)
+        if max(table) < 256:
+            tableType = "unsigned char"
+        else:
+            tableType = "unsigned short"
+
+        cppCode = "const {table_t} {namespace}_table{treeID}[{size}] = {" + ",".join([str(c) for c in table]) + "};\n"
+
+        cppCode += "inline unsigned int {namespace}_predict{treeID}({feature_t} const pX[{dim}]){\n"
+        if len(predicates) == 0:
+            cppCode += "\treturn {namespace}_table{treeID}[0];\n"
+        else:
+            cppCode += "\tunsigned int idx = "
+            cppCode += " | ".join(["((unsigned int)(pX[" + str(f) + "] <= " + str(s) + ") << " + str(i) + ")" for i, (f, s) in enumerate(predicates)])
+            cppCode += ";\n"
+            cppCode += "\treturn {namespace}_table{treeID}[idx];\n"
+        cppCode += "}\n"
+
+        cppCode = cppCode.replace("{treeID}", str(treeID)) \
+                         .replace("{dim}", str(self.dim)) \
+                         .replace("{namespace}", self.namespace) \
+                         .replace("{feature_t}", featureType) \
+                         .replace("{table_t}", tableType) \
+                         .replace("{size}", str(len(table)))
+
+        headerCode = "inline unsigned int {namespace}_predict{treeID}({feature_t} const pX[{dim}]);\n" \
+                                        .replace("{treeID}", str(treeID)) \
+                                        .replace("{dim}", str(self.dim)) \
+                                        .replace("{namespace}", self.namespace) \
+                                        .replace("{feature_t}", featureType)
+
+        return headerCode, cppCode
@@ -1,259 +1,261 @@
 from ForestConverter import TreeConverter
+from CostModel import CostModel
+from HostProfile import getDefaultBudgetSize
 import numpy as np
 import heapq
+import Profiler
 
 class MixConverter(TreeConverter):
-        """ A MixConverter converts a DecisionTree into its mixed structure in c language
+        """ A MixConverter converts a DecisionTree into its mixed structure in c language. The most probable
+            split nodes of the forest form an if-else kernel as long as they fit into the given budget. Whenever
+            the kernel is left, the remaining subtree is traversed natively on a compact array, which only
+            contains the split nodes outside the kernel (see StandardNativeTreeConverter for the layout)
         """
-        def __init__(self, dim, namespace, featureType, architecture):
+        def __init__(self, dim, namespace, featureType, architecture, budgetSize = None, setSize = None, costModel = None):
+                """ Generate a new MixConverter
+
+                Args:
+                    dim (int): The dimension of the input data
+                    namespace (str): The namespace of the generated code
+                    featureType (str): The data type of the features
+                    architecture (str): The target architecture ('arm', 'intel' or 'ppc')
+                    budgetSize (int, optional): The size of the kernels of all trees in bytes. Defaults to the size
+                                                of the L1 instruction cache of the architecture (see getDefaultBudgetSize)
+                    setSize (int, optional): The number of nodes of a path which are placed consecutively in the
+                                             native array. Defaults to an architecture specific value
+                    costModel (CostModel, optional): The estimated code size per node. Defaults to the fixed
+                                                     sizes of the architecture
+                """
                 super().__init__(dim, namespace, featureType)
                 #Generates a new mix-tree converter object
                 self.architecture = architecture
-                self.arrayLenBit = 0
 
-                if self.architecture != "arm" and self.architecture != "intel":
-                    raise NotImplementedError("Please use 'arm' or 'intel' as target architecture - other architectures are not supported")
+                if self.architecture != "arm" and self.architecture != "intel" and self.architecture != "ppc":
+                    raise NotImplementedError("Please use 'arm' or 'intel' or 'ppc' as target architecture - other architectures are not supported")
+
+                if setSize is not None:
+                    self.setSize = setSize
+                elif self.architecture == "intel":
+                    self.setSize = 10
                 else:
-                    if self.architecture == "arm":
-                        self.setSize = 8
-                    else:
-                        self.setSize = 10
+                    self.setSize = 8
+
+                if costModel is None:
+                    self.costModel = CostModel(architecture)
+                else:
+                    self.costModel = costModel
+
                 self.inKernel = {}
-        # size of i-cache is 32kB. One instruction is 32B. So there are 1024 instructions in i-cache
-                self.givenBudget = 32*1000 # This was 32*500
+                self.kernels = {}
+                # The budget is shared by the kernels of all trees of the forest
+                if budgetSize is None:
+                    self.givenBudget = getDefaultBudgetSize(self.architecture)
+                else:
+                    self.givenBudget = budgetSize
 
-        def getNativeBasis(self, head, treeID):
-                return self.getNativeImplementation(head, treeID)
-        def pathSort(self, tree):
-            self.inKernel = {}
+        def getSplitDataType(self, tree):
+            if self.containsFloat(tree):
+                return "float"
+            else:
+                return "int"
+
+        def getKernelCosts(self, tree, node, splitDataType):
+            # The split itself and the code for its children, which is either a leaf (return) or a
+            # jump to the native part. Both of which are roughly as large as a leaf
+            return self.sizeOfNode(tree, node, splitDataType) + \
+                   self.sizeOfNode(tree, node.leftChild, splitDataType) + \
+                   self.sizeOfNode(tree, node.rightChild, splitDataType)
+
+        def prepareForest(self, forest):
+            """ Choose the kernels of all trees at once. Starting at the roots, the split node with the
+                largest path probability of all trees is added to its kernel as long as the budget allows.
+                Since only children of kernel nodes are considered, each kernel is a connected top part of its tree
+
+            Args:
+                forest (Forest): The forest which is about to be converted
+            """
+            self.kernels = {}
             curSize = 0
-            s = []
-            flag = False
-            paths = sorted(self.getPaths(tree.head, [], []),key = lambda i: i[-1:])
-            #O(n^2) to clean up the duplicates
-            for i in paths:
-                if i not in s:
-                    s.append(i)
-            for path in s:
-                for node in path:
-                    try:
-                        if self.inKernel[node] == True:
-                            continue
-                    except KeyError:
-                        curSize += self.sizeOfNode(tree, tree.nodes[node])
-                    if curSize >= self.givenBudget:
-                        self.inKernel[node] = False
-                    else:
-                        self.inKernel[node] = True
+            L = []
+            for treeID, tree in enumerate(forest.trees):
+                with Profiler.phase("probabilities"):
+                    tree.getProbAllPaths()
+                self.kernels[treeID] = {}
+                if tree.head.prediction is None:
+                    # The tree ID breaks ties, so nodes are never compared directly
+                    heapq.heappush(L, (-tree.head.pathProb, treeID, len(L), tree.head))
+
+            cnt = len(L)
+            while len(L) > 0:
+                _, treeID, _, node = heapq.heappop(L)
+                tree = forest.trees[treeID]
+                nodeSize = self.getKernelCosts(tree, node, self.getSplitDataType(tree))
+
+                if curSize + nodeSize > self.givenBudget:
+                    continue
+
+                curSize += nodeSize
+                self.kernels[treeID][node.id] = True
+                for child in [node.leftChild, node.rightChild]:
+                    if child.prediction is None:
+                        heapq.heappush(L, (-child.pathProb, treeID, cnt, child))
+                        cnt += 1
 
         def nodeSort(self, tree):
+            """ Choose the kernel of a single tree with the whole budget. This is used if the tree is converted
+                without a call to prepareForest
+            """
+            splitDataType = self.getSplitDataType(tree)
             self.inKernel = {}
             curSize = 0
             L = []
-            heapq.heapify(L)
-            nodes = [tree.head]
-            while len(nodes) > 0:
-                node = nodes.pop(0)
-                if node.leftChild is not None:
-                    nodes.append(node.leftChild)
-
-                if node.rightChild is not None:
-                    nodes.append(node.rightChild)
-                heapq.heappush(L, node)
-            # now L has BFS nodes sorted by probabilities
+            if tree.head.prediction is None:
+                heapq.heappush(L, (-tree.head.pathProb, 0, tree.head))
+
+            cnt = 1
             while len(L) > 0:
-                node = heapq.heappop(L)
+                _, _, node = heapq.heappop(L)
+                nodeSize = self.getKernelCosts(tree, node, splitDataType)
+
+                if curSize + nodeSize > self.givenBudget:
+                    continue
+
+                curSize += nodeSize
                 self.inKernel[node.id] = True
-                curSize += self.sizeOfNode(tree,node)
-                # if the current size is larger than budget already, break.
-                if curSize >= self.givenBudget:
-                    self.inKernel[node.id] = False
-                    # in fact this can be avoided
-
-        def sizeOfNode(self, tree, node):
-            size = 0
-            if self.containsFloat(tree):
-                splitDataType = "float"
-            else:
-                splitDataType = "int"
-
-            if node.prediction is not None:
-                if splitDataType == "int" and self.architecture == "arm":
-                    size += 2*4
-                elif splitDataType == "float" and self.architecture == "arm":
-                    size += 2*4
-                elif splitDataType == "int" and self.architecture == "intel":
-                    size += 10
-                elif splitDataType == "float" and self.architecture == "intel":
-                    size += 10
-            else:
-                if self.containsFloat(tree):
-                    splitDataType = "float"
-                else:
-                    splitDataType = "int"
-                # In O0, the basic size of a split node is 4 instructions for loading.
-                # Since a split node must contain a pair of if-else statements,
-                # one instruction for branching is not avoidable.
-                if splitDataType == "int" and self.architecture == "arm":
-                    # this is for arm int (ins * bytes)
-                    size += 5*4
-                elif splitDataType == "float" and self.architecture == "arm":
-                    # this is for arm float
-                    size += 8*4
-                elif splitDataType == "int" and self.architecture == "intel":
-                    # this is for intel integer (bytes)
-                    size += 28
-                elif splitDataType == "float" and self.architecture == "intel":
-                    # this is for intel float (bytes)
-                    size += 17
-            return size
+                for child in [node.leftChild, node.rightChild]:
+                    if child.prediction is None:
+                        heapq.heappush(L, (-child.pathProb, cnt, child))
+                        cnt += 1
 
+        def sizeOfNode(self, tree, node, splitDataType):
+            return self.costModel.sizeOfNode(node, splitDataType)
 
         def getIFImplementation(self, tree, treeID, head, mapping, level = 1):
-        #def getIFImplementation(self, tree, treeID, head, inSize, mapping, level = 1):
-            # NOTE: USE self.setSize for INTEL / ARM sepcific set-size parameter (e.g. 3 or 6)
-
-            """ Generate the actual if-else implementation for a given node with Swapping and Kernel Grouping
+            """ Generate the actual if-else implementation of the kernel for a given node
 
             Args:
                 tree : the body of this tree
                 treeID (TYPE): The id of this tree (in case we are dealing with a forest)
                 head (TYPE): The current node to generate an if-else structure for.
+                mapping (dict): The index of each split node outside the kernel in the native array
                 level (int, optional): The intendation level of the generated code for easier
                                                             reading of the generated code
 
             Returns:
-                Tuple: The string of if-else code, the string of label if-else code, generated code size and Final label index
+                String: The if-else code of the kernel as a string
             """
-            featureType = self.getFeatureType()
-            headerCode = "unsigned int {namespace}Forest_predict{treeID}({feature_t} const pX[{dim}]);\n" \
-                                            .replace("{treeID}", str(treeID)) \
-                                            .replace("{dim}", str(self.dim)) \
-                                            .replace("{namespace}", self.namespace) \
-                                            .replace("{feature_t}", featureType)
             code = ""
             tabs = "".join(['\t' for i in range(level)])
-            # size of i-cache is 32kB. One instruction is 32B. So there are 1024 instructions in i-cache
 
-            # khchen: swap-algorithm + kernel grouping
             if head.prediction is not None:
-                    if self.inKernel[head.id] is False:
-                        #it must be in Kernel, otherwise we are in trouble.
-                        code += tabs + '\t' + "subroot = "+str(mapping[head.id])+";\n"
-                        code += tabs + '\t' + "goto Label"+str(treeID)+";\n"
-
-                    else:
-                        return (tabs + "return " + str(int(head.prediction)) + ";\n" )
+                    return tabs + "return " + str(self.getLabel(head)) + ";\n"
+            elif not self.inKernel.get(head.id, False):
+                    # Leave the kernel: set up the index of the sub-root, then continue natively
+                    code += tabs + "subroot = " + str(mapping[head.id]) + ";\n"
+                    code += tabs + "goto Label" + str(treeID) + ";\n"
             else:
-                    # check if it is the moment to go out the kernel, set up the root id then goto the end of the while loop.
-                    if self.inKernel[head.id] is False:
-                        # set up the index before goto
-                        code += tabs + '\t' + "subroot = "+str(mapping[head.id])+";\n"
-                        code += tabs + '\t' + "goto Label"+str(treeID)+";\n"
+                    if head.probLeft >= head.probRight:
+                            code += tabs + "if(pX[" + str(head.feature) + "] <= " + str(head.split) + "){\n"
+                            code += self.getIFImplementation(tree, treeID, head.leftChild, mapping, level + 1)
+                            code += tabs + "} else {\n"
+                            code += self.getIFImplementation(tree, treeID, head.rightChild, mapping, level + 1)
                     else:
-                        if head.probLeft >= head.probRight:
-                                code += tabs + "if(pX[" + str(head.feature) + "] <= " + str(head.split) + "){\n"
-                                code += self.getIFImplementation(tree, treeID, head.leftChild,  mapping, level + 1)
-                                code += tabs + "} else {\n"
-                                code += self.getIFImplementation(tree, treeID, head.rightChild,  mapping, level + 1)
-                        else:
-                                code += tabs + "if(pX[" + str(head.feature) + "] > " + str(head.split) + "){\n"
-                                code += self.getIFImplementation(tree, treeID, head.rightChild,  mapping, level + 1)
-                                code += tabs + "} else {\n"
-                                code += self.getIFImplementation(tree, treeID, head.leftChild,  mapping, level + 1)
-                        code += tabs + "}\n"
-            return (code)
+                            code += tabs + "if(pX[" + str(head.feature) + "] > " + str(head.split) + "){\n"
+                            code += self.getIFImplementation(tree, treeID, head.rightChild, mapping, level + 1)
+                            code += tabs + "} else {\n"
+                            code += self.getIFImplementation(tree, treeID, head.leftChild, mapping, level + 1)
+                    code += tabs + "}\n"
+            return code
+
+        def getSubroots(self, head):
+            # All split nodes outside the kernel whose parent is inside the kernel (or the root itself)
+            if head.prediction is not None:
+                return []
+            elif not self.inKernel.get(head.id, False):
+                return [head]
+            else:
+                return self.getSubroots(head.leftChild) + self.getSubroots(head.rightChild)
 
         def getNativeImplementation(self, head, treeID):
-            arrayStructs = []
-            nextIndexInArray = 1
+            """ Generate the native array for all split nodes outside the kernel. Starting at the sub-roots,
+                paths of setSize nodes are placed consecutively (path-oriented layout)
+
+            Args:
+                head (Node): The root of the tree
+                treeID (TYPE): The id of this tree (in case we are dealing with a forest)
 
+            Returns:
+                Tuple: The array code as a string, the length of the array and the mapping of the
+                       sub-roots to their index in the array
+            """
+            arrayStructs = []
             mapping = {}
 
-            # Path-oriented Layout
-            head.parent = -1 #for root init
-            L = [head]
-            heapq.heapify(L)
+            L = []
+            for node in self.getSubroots(head):
+                node.parent = -1
+                heapq.heappush(L, node)
+
             while len(L) > 0:
-                    #print()
-                    #for node in L:
-                    #    print(node.pathProb)
                     #the one with the maximum probability will be the next sub-root.
                     node = heapq.heappop(L)
                     cset = []
-                    while len(cset) != self.setSize: # 32/10
-                        cset.append(node)
-                        entry = []
-                        mapping[node.id] = len(arrayStructs)
-
+                    while len(cset) != self.setSize:
                         if node.prediction is not None:
-                                entry.append(1)
-                                entry.append(int(node.prediction))
-                                entry.append(0)
-                                entry.append(0)
-                                entry.append(0)
-                                entry.append(0)
-                                arrayStructs.append(entry)
-
-                                if node.parent != -1:
-                                    # if this node is not root, it must be assigned with self.side
-                                    if node.side == 0:
-                                        arrayStructs[node.parent][4] = nextIndexInArray - 1
-                                    else:
-                                        arrayStructs[node.parent][5] = nextIndexInArray - 1
-
-
-                                nextIndexInArray += 1
+                            break
 
+                        cset.append(node)
+                        entry = [node.feature, node.split]
 
-                                if len(L) != 0 and len(cset) != self.setSize:
-                                    node = heapq.heappop(L)
-                                else:
-                                    break
+                        if node.parent == -1:
+                            mapping[node.id] = len(arrayStructs)
+                        elif node.side == 0:
+                            arrayStructs[node.parent][2] = len(arrayStructs)
+                        else:
+                            arrayStructs[node.parent][3] = len(arrayStructs)
+
+                        if (node.leftChild.prediction is not None) and (node.rightChild.prediction is not None):
+                            indicator = 3
+                            entry.append(self.getLabel(node.leftChild))
+                            entry.append(self.getLabel(node.rightChild))
+                        elif (node.leftChild.prediction is None) and (node.rightChild.prediction is not None):
+                            indicator = 2
+                            entry.append(-1)
+                            entry.append(self.getLabel(node.rightChild))
+                        elif (node.leftChild.prediction is not None) and (node.rightChild.prediction is None):
+                            indicator = 1
+                            entry.append(self.getLabel(node.leftChild))
+                            entry.append(-1)
+                        else:
+                            indicator = 0
+                            entry.append(-1)
+                            entry.append(-1)
+                        entry.append(indicator)
+
+                        node.leftChild.parent = len(arrayStructs)
+                        node.rightChild.parent = len(arrayStructs)
+                        node.leftChild.side = 0
+                        node.rightChild.side = 1
+                        arrayStructs.append(entry)
+
+                        if len(cset) != self.setSize:
+                            if node.leftChild.pathProb >= node.rightChild.pathProb:
+                                heapq.heappush(L, node.rightChild)
+                                node = node.leftChild
+                            else:
+                                heapq.heappush(L, node.leftChild)
+                                node = node.rightChild
                         else:
-                                entry.append(0)
-                                entry.append(0) # COnstant prediction
-                                entry.append(node.feature)
-                                entry.append(node.split)
-
-                                node.leftChild.parent = nextIndexInArray - 1
-                                node.rightChild.parent = nextIndexInArray - 1
-
-                                if node.parent != -1:
-                                    # if this node is not root, it must be assigned with self.side
-                                    if node.side == 0:
-                                        arrayStructs[node.parent][4] = nextIndexInArray - 1
-                                    else:
-                                        arrayStructs[node.parent][5] = nextIndexInArray - 1
-
-                                # the following two fields now are modified by its children.
-                                entry.append(-1)
-                                entry.append(-1)
-                                arrayStructs.append(entry)
-                                nextIndexInArray += 1
-
-
-                                # note the sides of the children
-                                node.leftChild.side = 0
-                                node.rightChild.side = 1
-
-                                if len(cset) != self.setSize:
-                                    if node.leftChild.pathProb >= node.rightChild.pathProb:
-                                        heapq.heappush(L, node.rightChild)
-                                        node = node.leftChild
-                                    else:
-                                        heapq.heappush(L, node.leftChild)
-                                        node = node.rightChild
-                                else:
-                                    heapq.heappush(L, node.leftChild)
-                                    heapq.heappush(L, node.rightChild)
+                            heapq.heappush(L, node.leftChild)
+                            heapq.heappush(L, node.rightChild)
 
-            featureType = self.getFeatureType()
             arrLen = len(arrayStructs)
+            if arrLen == 0:
+                return "", arrLen, mapping
 
             cppCode = "{namespace}_Node{id} const tree{id}[{N}] = {" \
                     .replace("{id}", str(treeID)) \
-                    .replace("{N}", str(len(arrayStructs))) \
+                    .replace("{N}", str(arrLen)) \
                     .replace("{namespace}", self.namespace)
 
             for e in arrayStructs:
@@ -261,14 +263,10 @@ class MixConverter(TreeConverter):
                     for val in e:
                             cppCode += str(val) + ","
                     cppCode = cppCode[:-1] + "},"
-            cppCode = cppCode[:-1] + "};"
+            cppCode = cppCode[:-1] + "};\n"
 
             return cppCode, arrLen, mapping
 
-
-        def getMaxThreshold(self, tree):
-                return max([tree.nodes[x].split if tree.nodes[x].prediction is None else 0 for x in tree.nodes])
-
         def getArrayLenType(self, arrLen):
                 arrayLenBit = int(np.log2(arrLen)) + 1
                 if arrayLenBit <= 8:
@@ -279,7 +277,6 @@ class MixConverter(TreeConverter):
                         arrayLenDataType = "unsigned int"
                 return arrayLenDataType
 
-
         def getNativeHeader(self, splitType, treeID, arrLen):
                 dimBit = int(np.log2(self.dim)) + 1 if self.dim != 0 else 1
 
@@ -290,108 +287,121 @@ class MixConverter(TreeConverter):
                 else:
                         dimDataType = "unsigned int"
 
-                featureType = self.getFeatureType()
                 headerCode = """struct {namespace}_Node{id} {
-                        bool isLeaf;
-                        unsigned int prediction;
                         {dimDataType} feature;
                         {splitType} split;
                         {arrayLenDataType} leftChild;
                         {arrayLenDataType} rightChild;
-
+                        unsigned char indicator;
                 };\n""".replace("{namespace}", self.namespace) \
                            .replace("{id}", str(treeID)) \
                            .replace("{arrayLenDataType}", self.getArrayLenType(arrLen)) \
                            .replace("{splitType}",splitType) \
                            .replace("{dimDataType}",dimDataType)
-                """
-                headerCode += "unsigned int {namespace}_predict{id}({feature_t} const pX[{dim}]);\n" \
-                                                .replace("{id}", str(treeID)) \
-                                                .replace("{dim}", str(self.dim)) \
-                                                .replace("{namespace}", self.namespace) \
-                                                .replace("{feature_t}", featureType)
-                """
                 return headerCode
 
-
-        def getCode(self, tree, treeID):
+        def getCode(self, tree, treeID, numClasses):
             """ Generate the actual mixture implementation for a given tree
 
             Args:
                 tree (TYPE): The tree
                 treeID (TYPE): The id of this tree (in case we are dealing with a forest)
+                numClasses (int): The number of classes
 
             Returns:
                 Tuple: A tuple (headerCode, cppCode), where headerCode contains the code (=string) for
                 a *.h file and cppCode contains the code (=string) for a *.cpp file
             """
-            tree.getProbAllPaths()
+            with Profiler.phase("probabilities"):
+                tree.getProbAllPaths()
+            if treeID in self.kernels:
+                self.inKernel = self.kernels[treeID]
+            else:
+                with Profiler.phase("kernel selection"):
+                    self.nodeSort(tree)
+
             featureType = self.getFeatureType()
-            cppCode = "unsigned int {namespace}_predict{treeID}({feature_t} const pX[{dim}]){\n" \
+            arrayCode, arrLen, mapping = self.getNativeImplementation(tree.head, treeID)
+
+            cppCode = arrayCode
+            cppCode += "inline unsigned int {namespace}_predict{treeID}({feature_t} const pX[{dim}]){\n" \
                                     .replace("{treeID}", str(treeID)) \
                                     .replace("{dim}", str(self.dim)) \
                                     .replace("{namespace}", self.namespace) \
                                     .replace("{feature_t}", featureType)
-            cppCode += "unsigned int subroot;\n"
-            nativeImplementation = self.getNativeImplementation(tree.head, treeID)
-            cppCode += nativeImplementation[0]+ "\n"
-            arrLen = nativeImplementation[1]
-            mapping = nativeImplementation[2]
-
-            self.nodeSort(tree)
-            ifImplementation = self.getIFImplementation(tree, treeID, tree.head, mapping, 0)
+
+            # The child fields hold array indices as well as the labels of leaves (classes or, for soft voting,
+            # leaf indices of the whole tree, see getLabel), so their type has to cover both
+            fieldLen = max([arrLen] + [self.getLabel(n) + 1 for n in tree.nodes.values() if n.prediction is not None])
+
+            if arrLen > 0:
+                cppCode += "\tunsigned int subroot;\n"
+
             # kernel code
-            cppCode += ifImplementation
+            cppCode += self.getIFImplementation(tree, treeID, tree.head, mapping)
 
             # Data Array
-            cppCode += """
+            if arrLen > 0:
+                cppCode += """
                     Label{id}:
                     {
                             {arrayLenDataType} i = subroot;
 
-                            while(!tree{id}[i].isLeaf) {
-                                    if (pX[tree{id}[i].feature] <= tree{id}[i].split){
-                                            i = tree{id}[i].leftChild;
+                            while(true) {
+                                if (pX[tree{id}[i].feature] <= tree{id}[i].split){
+                                    if (tree{id}[i].indicator == 0 || tree{id}[i].indicator == 2) {
+                                        i = tree{id}[i].leftChild;
+                                    } else {
+                                        return tree{id}[i].leftChild;
+                                    }
+                                } else {
+                                    if (tree{id}[i].indicator == 0 || tree{id}[i].indicator == 1) {
+                                        i = tree{id}[i].rightChild;
                                     } else {
-                                            i = tree{id}[i].rightChild;
+                                        return tree{id}[i].rightChild;
                                     }
+                                }
                             }
-
-                            return tree{id}[i].prediction;
                     }
+                    return 0; // Make the compiler happy
             """.replace("{id}", str(treeID)) \
-               .replace("{arrayLenDataType}",self.getArrayLenType(arrLen))
+               .replace("{arrayLenDataType}",self.getArrayLenType(fieldLen))
 
             cppCode += "}\n"
 
             # the rest is for generating the header
-            headerCode = "unsigned int {namespace}_predict{treeID}({feature_t} const pX[{dim}]);\n" \
-                                            .replace("{treeID}", str(treeID)) \
-                                            .replace("{dim}", str(self.dim)) \
-                                            .replace("{namespace}", self.namespace) \
-                                            .replace("{feature_t}", featureType)
+            headerCode = ""
+            if arrLen > 0:
+                if self.containsFloat(tree):
+                    splitDataType = "float"
+                else:
+                    lower, upper = self.getSplitRange(tree)
 
-            if self.containsFloat(tree):
-                splitDataType = "float"
-            else:
-                lower, upper = self.getSplitRange(tree)
+                    bitUsed = 0
+                    if lower > 0:
+                        prefix = "unsigned"
+                        maxVal = upper
+                    else:
+                        prefix = ""
+                        bitUsed = 1
+                        maxVal = max(-lower, upper)
 
-                if lower > 0:
-                    prefix = "unsigned"
-                    maxVal = upper
-                else:
-                    prefix = ""
-                    bitUsed = 1
-                    maxVal = max(-lower, upper)
+                    splitBit = int(np.log2(maxVal) + 1 if maxVal != 0 else 1)
 
-                splitBit = int(np.log2(maxVal) + 1 if maxVal != 0 else 1)
+                    if splitBit <= (8-bitUsed):
+                        # The signedness of char depends on the platform (e.g. unsigned on arm)
+                        splitDataType = "unsigned char" if prefix == "unsigned" else "signed char"
+                    elif splitBit <= (16-bitUsed):
+                        splitDataType = prefix + " short"
+                    else:
+                        splitDataType = prefix + " int"
 
-                if splitBit <= (8-bitUsed):
-                    splitDataType = prefix + " char"
-                elif splitBit <= (16-bitUsed):
-                    splitDataType = prefix + " short"
-                else:
-                    splitDataType = prefix + " int"
+                headerCode += self.getNativeHeader(splitDataType, treeID, fieldLen)
+
+            headerCode += "inline unsigned int {namespace}_predict{treeID}({feature_t} const pX[{dim}]);\n" \
+                                            .replace("{treeID}", str(treeID)) \
+                                            .replace("{dim}", str(self.dim)) \
+                                            .replace("{namespace}", self.namespace) \
+                                            .replace("{feature_t}", featureType)
 
-            headerCode += self.getNativeHeader(splitDataType, treeID, arrLen)
             return headerCode, cppCode
@@ -1,6 +1,8 @@
 from ForestConverter import TreeConverter
 import numpy as np
 import heapq
+from collections import deque
+import Profiler
 
 class NativeTreeConverter(TreeConverter):
     def __init__(self, dim, namespace, featureType):
@@ -69,7 +71,8 @@ class NativeTreeConverter(TreeConverter):
     def getCode(self, tree, treeID, numClasses):
             # kh.chen
             # Note: this function has to be called once to traverse the tree to calculate the probabilities.
-            tree.getProbAllPaths()
+            with Profiler.phase("probabilities"):
+                tree.getProbAllPaths()
             cppCode, arrLen = self.getImplementation(tree.head, treeID)
 
             if self.containsFloat(tree):
@@ -146,7 +149,7 @@ class NaiveNativeTreeConverter(NativeTreeConverter):
 
                 if node.prediction is not None:
                     entry.append(1)
-                    entry.append(int(np.argmax(node.prediction)))
+                    entry.append(self.getLabel(node))
                     #entry.append(int(node.prediction.at(np.argmax(node.prediction)))
                     #entry.append(node.id)
                     entry.append(0)
@@ -210,7 +213,17 @@ class StandardNativeTreeConverter(NativeTreeConverter):
     def __init__(self, dim, namespace, featureType):
             super().__init__(dim, namespace, featureType)
 
-    def getImplementation(self, head, treeID):
+    def getArrayStructs(self, head):
+            """ Compute the array layout of a tree. Leaves are not stored, instead the prediction of a leaf is
+                stored in the child field of its parent and the indicator of the parent tells which children
+                are leaves (0 = none, 1 = left child, 2 = right child, 3 = both children)
+
+            Args:
+                head (Node): The root of the tree
+
+            Returns:
+                list: A list of entries [feature, split, leftChild, rightChild, indicator] in BFS order
+            """
             arrayStructs = []
             nextIndexInArray = 1
 
@@ -241,18 +254,18 @@ class StandardNativeTreeConverter(NativeTreeConverter):
                             indicator = 3
                             # entry.append(int(node.leftChild.prediction))
                             # entry.append(int(node.rightChild.prediction))
-                            entry.append(int(np.argmax(node.leftChild.prediction)))
-                            entry.append(int(np.argmax(node.rightChild.prediction)))
+                            entry.append(self.getLabel(node.leftChild))
+                            entry.append(self.getLabel(node.rightChild))
                         elif (node.leftChild.prediction is None) and (node.rightChild.prediction is not None):
                             indicator = 2
                             entry.append(nextIndexInArray)
                             nextIndexInArray += 1
                             #entry.append(int(node.rightChild.prediction))
-                            entry.append(int(np.argmax(node.rightChild.prediction)))
+                            entry.append(self.getLabel(node.rightChild))
                         elif (node.leftChild.prediction is not None) and (node.rightChild.prediction is  None):
                             indicator = 1
                             #entry.append(int(node.leftChild.prediction))
-                            entry.append(int(np.argmax(node.leftChild.prediction)))
+                            entry.append(self.getLabel(node.leftChild))
                             entry.append(nextIndexInArray)
                             nextIndexInArray += 1
                         else:
@@ -268,6 +281,11 @@ class StandardNativeTreeConverter(NativeTreeConverter):
 
                     arrayStructs.append(entry)
 
+            return arrayStructs
+
+    def getImplementation(self, head, treeID):
+            arrayStructs = self.getArrayStructs(head)
+
             featureType = self.getFeatureType()
             arrLen = len(arrayStructs)
             # kh.chen
@@ -317,12 +335,192 @@ class StandardNativeTreeConverter(NativeTreeConverter):
                .replace("{feature_t}", featureType)
             return cppCode, arrLen
 
+class SwitchNativeTreeConverter(StandardNativeTreeConverter):
+    """ A SwitchNativeTreeConverter uses the same array layout as the StandardNativeTreeConverter, but
+        dispatches on the kind of each node (inner, left leaf, right leaf, both leaves) as a state machine.
+        Each kind has its own specialised handler, so that no indicator tests are performed after the
+        comparison. With computedGoto = True, GCC's labels as values (goto *) are used for the dispatch,
+        otherwise a switch statement is generated
+    """
+    def __init__(self, dim, namespace, featureType, computedGoto = True):
+            super().__init__(dim, namespace, featureType)
+            self.computedGoto = computedGoto
+
+    def getImplementation(self, head, treeID):
+            arrayStructs = self.getArrayStructs(head)
+
+            featureType = self.getFeatureType()
+            arrLen = len(arrayStructs)
+
+            cppCode = "{namespace}_Node{treeID} const tree{treeID}[{N}] = {" \
+                    .replace("{treeID}", str(treeID)) \
+                    .replace("{N}", str(len(arrayStructs))) \
+                    .replace("{namespace}", self.namespace)
+
+            for e in arrayStructs:
+                    cppCode += "{"
+                    for val in e:
+                            cppCode += str(val) + ","
+                    cppCode = cppCode[:-1] + "},"
+            cppCode = cppCode[:-1] + "};"
+
+            if self.computedGoto:
+                cppCode += """
+                    inline unsigned int {namespace}_predict{treeID}({feature_t} const pX[{dim}]){
+                            static void * const dispatch[4] = {&&inner, &&leftLeaf, &&rightLeaf, &&bothLeaves};
+                            {arrayLenDataType} i = 0;
+                            goto *dispatch[tree{treeID}[i].indicator];
+
+                            inner:
+                                i = (pX[tree{treeID}[i].feature] <= tree{treeID}[i].split) ? tree{treeID}[i].leftChild : tree{treeID}[i].rightChild;
+                                goto *dispatch[tree{treeID}[i].indicator];
+
+                            leftLeaf:
+                                if (pX[tree{treeID}[i].feature] <= tree{treeID}[i].split) {
+                                    return tree{treeID}[i].leftChild;
+                                }
+                                i = tree{treeID}[i].rightChild;
+                                goto *dispatch[tree{treeID}[i].indicator];
+
+                            rightLeaf:
+                                if (pX[tree{treeID}[i].feature] > tree{treeID}[i].split) {
+                                    return tree{treeID}[i].rightChild;
+                                }
+                                i = tree{treeID}[i].leftChild;
+                                goto *dispatch[tree{treeID}[i].indicator];
+
+                            bothLeaves:
+                                return (pX[tree{treeID}[i].feature] <= tree{treeID}[i].split) ? tree{treeID}[i].leftChild : tree{treeID}[i].rightChild;
+                    }
+            """
+            else:
+                cppCode += """
+                    inline unsigned int {namespace}_predict{treeID}({feature_t} const pX[{dim}]){
+                            {arrayLenDataType} i = 0;
+
+                            while(true) {
+                                switch(tree{treeID}[i].indicator) {
+                                    case 0:
+                                        i = (pX[tree{treeID}[i].feature] <= tree{treeID}[i].split) ? tree{treeID}[i].leftChild : tree{treeID}[i].rightChild;
+                                        break;
+                                    case 1:
+                                        if (pX[tree{treeID}[i].feature] <= tree{treeID}[i].split) {
+                                            return tree{treeID}[i].leftChild;
+                                        }
+                                        i = tree{treeID}[i].rightChild;
+                                        break;
+                                    case 2:
+                                        if (pX[tree{treeID}[i].feature] > tree{treeID}[i].split) {
+                                            return tree{treeID}[i].rightChild;
+                                        }
+                                        i = tree{treeID}[i].leftChild;
+                                        break;
+                                    default:
+                                        return (pX[tree{treeID}[i].feature] <= tree{treeID}[i].split) ? tree{treeID}[i].leftChild : tree{treeID}[i].rightChild;
+                                }
+                            }
+
+                            return 0; // Make the compiler happy
+                    }
+            """
+
+            cppCode = cppCode.replace("{treeID}", str(treeID)) \
+                             .replace("{dim}", str(self.dim)) \
+                             .replace("{namespace}", self.namespace) \
+                             .replace("{arrayLenDataType}",self.getArrayLenType(len(arrayStructs))) \
+                             .replace("{feature_t}", featureType)
+            return cppCode, arrLen
+
+class PredicateNativeTreeConverter(StandardNativeTreeConverter):
+    """ A PredicateNativeTreeConverter generates the same array layout as the StandardNativeTreeConverter
+        (see getArrayStructs), but each node stores the index of its predicate instead of feature and split.
+        It has to be used together with a PredicateForestConverter, which sets the predicates of the forest
+    """
+    def __init__(self, dim, namespace, featureType):
+            super().__init__(dim, namespace, featureType)
+            self.predicates = {}
+
+    def getHeader(self, treeID, arrLen, numClasses):
+            predicateDataType = self.getArrayLenType(len(self.predicates))
+
+            headerCode = """struct {namespace}_Node{treeID} {
+                        {predicateDataType} predicate;
+                        {arrayLenDataType} leftChild;
+                        {arrayLenDataType} rightChild;
+                        unsigned char indicator;
+                };\n""".replace("{namespace}", self.namespace) \
+                       .replace("{treeID}", str(treeID)) \
+                       .replace("{predicateDataType}",predicateDataType) \
+                       .replace("{arrayLenDataType}", self.getArrayLenType(arrLen))
+
+            headerCode += "inline unsigned int {namespace}_predict{treeID}(unsigned int const pB[{numWords}]);\n" \
+                                            .replace("{treeID}", str(treeID)) \
+                                            .replace("{numWords}", str(self.getNumWords())) \
+                                            .replace("{namespace}", self.namespace)
+            return headerCode
+
+    def getImplementation(self, head, treeID):
+            # The layout of the StandardNativeTreeConverter, in which feature and split are replaced by the predicate
+            arrayStructs = [[self.predicates[(e[0], e[1])]] + e[2:] for e in self.getArrayStructs(head)]
+            arrLen = len(arrayStructs)
+
+            cppCode = "{namespace}_Node{treeID} const tree{treeID}[{N}] = {" \
+                    .replace("{treeID}", str(treeID)) \
+                    .replace("{N}", str(len(arrayStructs))) \
+                    .replace("{namespace}", self.namespace)
+            cppCode += ",".join(["{" + ",".join([str(val) for val in e]) + "}" for e in arrayStructs]) + "};"
+
+            cppCode += """
+                    inline unsigned int {namespace}_predict{treeID}(unsigned int const pB[{numWords}]){
+                            {arrayLenDataType} i = 0;
+
+                            while(true) {
+                                if (pB[tree{treeID}[i].predicate >> 5] & (1u << (tree{treeID}[i].predicate & 31))){
+                                    if (tree{treeID}[i].indicator == 0 || tree{treeID}[i].indicator == 2) {
+                                        i = tree{treeID}[i].leftChild;
+                                    } else {
+                                        return tree{treeID}[i].leftChild;
+                                    }
+                                } else {
+                                    if (tree{treeID}[i].indicator == 0 || tree{treeID}[i].indicator == 1) {
+                                        i = tree{treeID}[i].rightChild;
+                                    } else {
+                                        return tree{treeID}[i].rightChild;
+                                    }
+                                }
+                            }
+
+                            return 0; // Make the compiler happy
+                    }
+            """.replace("{treeID}", str(treeID)) \
+               .replace("{numWords}", str(self.getNumWords())) \
+               .replace("{namespace}", self.namespace) \
+               .replace("{arrayLenDataType}",self.getArrayLenType(len(arrayStructs)))
+            return cppCode, arrLen
+
+    def getCode(self, tree, treeID, numClasses):
+            cppCode, arrLen = self.getImplementation(tree.head, treeID)
+            headerCode = self.getHeader(treeID, arrLen, numClasses)
+
+            return headerCode, cppCode
+
 class OptimizedNativeTreeConverter(NativeTreeConverter):
     def __init__(self, dim, namespace, featureType, setSize = 3):
         super().__init__(dim, namespace, featureType)
         self.setSize = setSize
 
-    def getImplementation(self, head, treeID):
+    def getArrayStructs(self, head):
+        """ Compute the path-oriented array layout of a tree: Starting with the most probable sub-root, the most
+            probable path of up to setSize split nodes is placed consecutively, the other children become sub-roots.
+            The entries have the same format as in StandardNativeTreeConverter.getArrayStructs. Requires the path
+            probabilities (see Tree.getProbAllPaths)
+
+        Args:
+            head (Node): The root of the tree
+
+        Returns:
+            list: A list of entries [feature, split, leftChild, rightChild, indicator]
+        """
         arrayStructs = []
         nextIndexInArray = 1
 
@@ -354,19 +552,19 @@ class OptimizedNativeTreeConverter(NativeTreeConverter):
                             indicator = 3
                             # entry.append(int(node.leftChild.prediction))
                             # entry.append(int(node.rightChild.prediction))
-                            entry.append(int(np.argmax(node.leftChild.prediction)))
-                            entry.append(int(np.argmax(node.rightChild.prediction)))
+                            entry.append(self.getLabel(node.leftChild))
+                            entry.append(self.getLabel(node.rightChild))
                         elif (node.leftChild.prediction is None) and (node.rightChild.prediction is not None):
                             indicator = 2
                             entry.append(-1)
                             node.leftChild.parent = nextIndexInArray - 1
 
                             # entry.append(int(node.rightChild.prediction))
-                            entry.append(int(np.argmax(node.rightChild.prediction)))
+                            entry.append(self.getLabel(node.rightChild))
                         elif (node.leftChild.prediction is not None) and (node.rightChild.prediction is  None):
                             indicator = 1
                             # entry.append(int(node.leftChild.prediction))
-                            entry.append(int(np.argmax(node.leftChild.prediction)))
+                            entry.append(self.getLabel(node.leftChild))
                             entry.append(-1)
                             node.rightChild.parent = nextIndexInArray - 1
 
@@ -414,6 +612,11 @@ class OptimizedNativeTreeConverter(NativeTreeConverter):
                             heapq.heappush(L, node.leftChild)
                             heapq.heappush(L, node.rightChild)
 
+        return arrayStructs
+
+    def getImplementation(self, head, treeID):
+        arrayStructs = self.getArrayStructs(head)
+
         featureType = self.getFeatureType()
         arrLen = len(arrayStructs)
         # kh.chen
@@ -462,6 +665,8 @@ class OptimizedNativeTreeConverter(NativeTreeConverter):
 
 
 class OptimizedNativeTreeConverterForest(NativeTreeConverter):
+    convertsForest = True
+
     def __init__(self, dim, namespace, featureType, setSize = 3):
         super().__init__(dim, namespace, featureType)
         self.setSize = setSize # is this tau ?
@@ -545,7 +750,8 @@ class OptimizedNativeTreeConverterForest(NativeTreeConverter):
         # put all roots in L
         for i in range(len(forest.trees)):
             # why don't we use return vals
-            forest.trees[i].getProbAllPaths()
+            with Profiler.phase("probabilities"):
+                forest.trees[i].getProbAllPaths()
             currentHead = forest.trees[i].head
             currentHead.parent = -1
             L.append(currentHead)
@@ -575,19 +781,19 @@ class OptimizedNativeTreeConverterForest(NativeTreeConverter):
                             indicator = 3
                             # entry.append(int(node.leftChild.prediction))
                             # entry.append(int(node.rightChild.prediction))
-                            entry.append(int(np.argmax(node.leftChild.prediction)))
-                            entry.append(int(np.argmax(node.rightChild.prediction)))
+                            entry.append(self.getLabel(node.leftChild))
+                            entry.append(self.getLabel(node.rightChild))
                         elif (node.leftChild.prediction is None) and (node.rightChild.prediction is not None):
                             indicator = 2
                             entry.append(-1)
                             node.leftChild.parent = nextIndexInArray - 1
 
                             # entry.append(int(node.rightChild.prediction))
-                            entry.append(int(np.argmax(node.rightChild.prediction)))
+                            entry.append(self.getLabel(node.rightChild))
                         elif (node.leftChild.prediction is not None) and (node.rightChild.prediction is  None):
                             indicator = 1
                             # entry.append(int(node.leftChild.prediction))
-                            entry.append(int(np.argmax(node.leftChild.prediction)))
+                            entry.append(self.getLabel(node.leftChild))
                             entry.append(-1)
                             node.rightChild.parent = nextIndexInArray - 1
 
@@ -634,31 +840,32 @@ class OptimizedNativeTreeConverterForest(NativeTreeConverter):
                             heapq.heappush(L, node.leftChild)
                             heapq.heappush(L, node.rightChild)
 
-        featureType = self.getFeatureType()
         arrLen = len(arrayStructs)
-        # kh.chen
-        #print("Get ArrayLenType")
-        #print(self.getArrayLenType(len(arrayStructs)))
+        cppCode = self.getArrayCode(posOfRootsInArray, arrayStructs)
+
+        return cppCode, arrLen
+
+    def getArrayCode(self, posOfRootsInArray, arrayStructs):
+        """ Returns the code of the root positions and of the node array of the whole forest. The entries are
+            joined once, since extending the code string per node takes quadratic time in the size of the forest
+
+        Args:
+            posOfRootsInArray (list): The position of the root of every tree in the array
+            arrayStructs (list): The entries (feature, split, leftChild, rightChild, indicator) of the array
+
+        Returns:
+            str: The code
+        """
         cppCode = "unsigned int nodePos[{nrOfTrees}] = {" \
                 .replace("{nrOfTrees}", str(len(posOfRootsInArray)))
-        for pos in posOfRootsInArray:
-            cppCode += str(pos) + ","
-        cppCode = cppCode[:-1] + "};\n"
-
+        cppCode += ",".join([str(pos) for pos in posOfRootsInArray]) + "};\n"
 
         cppCode += "{namespace}_Node const tree[{N}] = {" \
                 .replace("{N}", str(len(arrayStructs))) \
                 .replace("{namespace}", self.namespace)
+        cppCode += ",".join(["{" + ",".join([str(val) for val in e]) + "}" for e in arrayStructs]) + "};"
 
-        # Code for all nodes in forest
-        for e in arrayStructs:
-                cppCode += "{"
-                for val in e:
-                        cppCode += str(val) + ","
-                cppCode = cppCode[:-1] + "},"
-        cppCode = cppCode[:-1] + "};"
-
-        return cppCode, arrLen
+        return cppCode
 
     # OLD code, apply alg 2 at one tree at a time
     def getImplementationOLD(self, forest):
@@ -702,19 +909,19 @@ class OptimizedNativeTreeConverterForest(NativeTreeConverter):
                                 indicator = 3
                                 # entry.append(int(node.leftChild.prediction))
                                 # entry.append(int(node.rightChild.prediction))
-                                entry.append(int(np.argmax(node.leftChild.prediction)))
-                                entry.append(int(np.argmax(node.rightChild.prediction)))
+                                entry.append(self.getLabel(node.leftChild))
+                                entry.append(self.getLabel(node.rightChild))
                             elif (node.leftChild.prediction is None) and (node.rightChild.prediction is not None):
                                 indicator = 2
                                 entry.append(-1)
                                 node.leftChild.parent = nextIndexInArray - 1
 
                                 # entry.append(int(node.rightChild.prediction))
-                                entry.append(int(np.argmax(node.rightChild.prediction)))
+                                entry.append(self.getLabel(node.rightChild))
                             elif (node.leftChild.prediction is not None) and (node.rightChild.prediction is  None):
                                 indicator = 1
                                 # entry.append(int(node.leftChild.prediction))
-                                entry.append(int(np.argmax(node.leftChild.prediction)))
+                                entry.append(self.getLabel(node.leftChild))
                                 entry.append(-1)
                                 node.rightChild.parent = nextIndexInArray - 1
 
@@ -782,3 +989,131 @@ class OptimizedNativeTreeConverterForest(NativeTreeConverter):
         cppCode = cppCode[:-1] + "};"
 
         return cppCode, arrLen
+
+# The size in bytes of the C types used by the node arrays
+TYPE_SIZES = {"char" : 1, "short" : 2, "int" : 4, "float" : 4}
+
+class DAGNativeTreeConverter(OptimizedNativeTreeConverterForest):
+    """ A DAGNativeTreeConverter stores all trees of a forest in one shared node array, in which structurally
+        identical subtrees (within and across trees) are stored only once. Thus the array forms a DAG. It has
+        to be used together with the OptimizedNativeForestConverter. Since a single array holds the nodes of
+        all trees, its child indices are usually wider than those of per-tree arrays, so the DAG only pays off
+        if enough nodes are shared (see getTableSizes)
+    """
+    def __init__(self, dim, namespace, featureType):
+        super().__init__(dim, namespace, featureType)
+
+    def getSplitDataType(self, forest):
+        # In contrast to OptimizedNativeTreeConverterForest, nodes are shared between trees, thus
+        # the data type of the splits is determined by all trees of the forest
+        if any([self.containsFloat(tree) for tree in forest.trees]):
+            return "float"
+
+        ranges = [self.getSplitRange(tree) for tree in forest.trees]
+        lower = min([r[0] for r in ranges])
+        upper = max([r[1] for r in ranges])
+
+        bitUsed = 0
+        if lower > 0:
+            prefix = "unsigned"
+            maxVal = upper
+        else:
+            prefix = ""
+            bitUsed = 1
+            maxVal = max(-lower, upper)
+
+        splitBit = int(np.log2(maxVal) + 1 if maxVal != 0 else 1)
+
+        if splitBit <= (8-bitUsed):
+            # The signedness of char depends on the platform (e.g. unsigned on arm)
+            return "unsigned char" if prefix == "unsigned" else "signed char"
+        elif splitBit <= (16-bitUsed):
+            return prefix + " short"
+        else:
+            return prefix + " int"
+
+    def getNodeSize(self, splitDataType, arrLen):
+        """ Returns the size in bytes of a node (see getHeader) with the given split type in an array of arrLen nodes,
+            including the padding of the compiler
+        """
+        dimBit = int(np.log2(self.dim)) + 1 if self.dim != 0 else 1
+        dimSize = 1 if dimBit <= 8 else (2 if dimBit <= 16 else 4)
+        fields = [dimSize, TYPE_SIZES[splitDataType.split()[-1]]] + [TYPE_SIZES[self.getArrayLenType(arrLen).split()[-1]]] * 2 + [1]
+
+        size = 0
+        for f in fields:
+            size = (size + f - 1) // f * f + f
+        return (size + max(fields) - 1) // max(fields) * max(fields)
+
+    def getTableSizes(self, forest):
+        """ Compare the size of the shared node array with the size of one array per tree (as generated by
+            StandardNativeTreeConverter), both with the same split type
+
+        Returns:
+            Tuple: A tuple (numShared, dagBytes, treeBytes) with the number of nodes which are saved by sharing,
+            the size of the shared array (including the root positions) and the total size of the arrays per tree
+        """
+        forest.hashConsSubtrees()
+        splitDataType = self.getSplitDataType(forest)
+        numSplits = [tree.getNumSplits() for tree in forest.trees]
+        numDistinct = len(set([n.subtreeID for tree in forest.trees for n in tree.nodes.values() if n.prediction is None]))
+
+        dagBytes = self.getNodeSize(splitDataType, numDistinct) * numDistinct + 4 * len(forest.trees)
+        treeBytes = sum([self.getNodeSize(splitDataType, n) * n for n in numSplits if n > 0])
+
+        return sum(numSplits) - numDistinct, dagBytes, treeBytes
+
+    def getCode(self, forest):
+            cppCode, arrLen = self.getImplementation(forest)
+            headerCode = self.getHeader(self.getSplitDataType(forest), arrLen)
+
+            return headerCode, cppCode
+
+    def getImplementation(self, forest):
+        forest.hashConsSubtrees()
+
+        # First pass: Assign one array position to every distinct split subtree (BFS per tree)
+        positions = {}
+        order = []
+        for tree in forest.trees:
+            nodes = deque([tree.head])
+            while len(nodes) > 0:
+                node = nodes.popleft()
+                if node.prediction is None and node.subtreeID not in positions:
+                    positions[node.subtreeID] = len(order)
+                    order.append(node)
+                    nodes.append(node.leftChild)
+                    nodes.append(node.rightChild)
+
+        # Second pass: Generate the entries, children are either shared positions or predictions
+        arrayStructs = []
+        for node in order:
+            entry = []
+            entry.append(node.feature)
+            entry.append(node.split)
+
+            if (node.leftChild.prediction is not None) and (node.rightChild.prediction is not None):
+                indicator = 3
+                entry.append(self.getLabel(node.leftChild))
+                entry.append(self.getLabel(node.rightChild))
+            elif (node.leftChild.prediction is None) and (node.rightChild.prediction is not None):
+                indicator = 2
+                entry.append(positions[node.leftChild.subtreeID])
+                entry.append(self.getLabel(node.rightChild))
+            elif (node.leftChild.prediction is not None) and (node.rightChild.prediction is  None):
+                indicator = 1
+                entry.append(self.getLabel(node.leftChild))
+                entry.append(positions[node.rightChild.subtreeID])
+            else:
+                indicator = 0
+                entry.append(positions[node.leftChild.subtreeID])
+                entry.append(positions[node.rightChild.subtreeID])
+            entry.append(indicator)
+
+            arrayStructs.append(entry)
+
+        posOfRootsInArray = [positions[tree.head.subtreeID] for tree in forest.trees]
+        arrLen = len(arrayStructs)
+        cppCode = self.getArrayCode(posOfRootsInArray, arrayStructs)
+
+        return cppCode, arrLen
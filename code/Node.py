@@ -41,6 +41,10 @@ class Node:
         # Note: This field is only used after calling getProbAllPaths onc
 		self.pathProb = None
 
+		# The ID of the subtree below this node. Structurally identical subtrees share the same ID
+		# Note: This field is only used after calling hashConsSubtrees once
+		self.subtreeID = None
+
 	# TODO: THESE CHANGES ARE CURRENTLY JUST NEEDED BY Tree.py FOR MIXTURE IMPLEMENTATION
 	# Unfortunately, as the standard library provides min-heap, I invert the object comparison
 	def __lt__(self, other):
@@ -0,0 +1,172 @@
+import cProfile
+import io
+import json
+import pstats
+import timeit
+import tracemalloc
+from contextlib import contextmanager, nullcontext
+
+# The profiler which records the phases and counts of Forest and the converters, see activate
+active = None
+
+class Profiler:
+	""" A Profiler records the time (and optionally the peak memory) spent in named phases of the code
+		generation, e.g. load, probabilities, kernel selection, emission and write. Phases may be nested,
+		the time of a phase excludes the time of all phases it contains, so the phases add up to the total.
+		Additionally, named counts (e.g. the number of nodes) can be recorded. All phases and counts are
+		recorded per scope (e.g. the namespace of a converter)
+	"""
+	def __init__(self, name = "", memory = False, profile = False):
+		"""
+		Args:
+			name (str, optional): The name of the report, e.g. the model
+			memory (bool, optional): If True, the peak memory of each phase is traced with tracemalloc. This
+									 slows down the allocations considerably
+			profile (bool, optional): If True, all calls are profiled with cProfile
+		"""
+		self.name = name
+		self.memory = memory
+		self.profile = profile
+
+		self.phases = {}
+		self.counts = {}
+		self.stack = []
+		self.scope = ""
+
+		self.profiler = None
+		self.profileStats = None
+		self.startTime = None
+		self.lastTime = None
+		self.total = 0.0
+		self.peak = 0
+
+	def start(self):
+		self.startTime = timeit.default_timer()
+		self.lastTime = self.startTime
+		if self.memory:
+			tracemalloc.start()
+		if self.profile:
+			self.profiler = cProfile.Profile()
+			self.profiler.enable()
+
+	def stop(self):
+		if self.profiler is not None:
+			self.profiler.disable()
+		self.flush()
+		self.total = timeit.default_timer() - self.startTime
+		if self.memory:
+			tracemalloc.stop()
+
+	def getKey(self, name):
+		return name if self.scope == "" else self.scope + "/" + name
+
+	def flush(self):
+		""" Charge the time (and the peak memory) since the last transition to the innermost running phase """
+		now = timeit.default_timer()
+		if len(self.stack) > 0:
+			self.phases[self.stack[-1]]["time"] += now - self.lastTime
+		self.lastTime = now
+
+		if self.memory:
+			_, peak = tracemalloc.get_traced_memory()
+			self.peak = max(self.peak, peak)
+			if len(self.stack) > 0:
+				self.phases[self.stack[-1]]["peak"] = max(self.phases[self.stack[-1]]["peak"], peak)
+			tracemalloc.reset_peak()
+
+	@contextmanager
+	def phase(self, name):
+		key = self.getKey(name)
+		if key not in self.phases:
+			self.phases[key] = {"time" : 0.0, "calls" : 0, "peak" : 0}
+
+		self.flush()
+		self.stack.append(key)
+		self.phases[key]["calls"] += 1
+		try:
+			yield
+		finally:
+			self.flush()
+			self.stack.pop()
+
+	@contextmanager
+	def inScope(self, scope):
+		""" Record all phases and counts in the given scope, e.g. the namespace of a converter """
+		outer = self.scope
+		self.scope = scope
+		try:
+			yield
+		finally:
+			self.scope = outer
+
+	def count(self, name, value = 1):
+		key = self.getKey(name)
+		self.counts[key] = self.counts.get(key, 0) + value
+
+	def getTotals(self):
+		""" Returns the time of each phase summed over all scopes """
+		totals = {}
+		for key, p in self.phases.items():
+			name = key.split("/")[-1]
+			totals[name] = totals.get(name, 0.0) + p["time"]
+		totals["other"] = self.total - sum(p["time"] for p in self.phases.values())
+
+		return totals
+
+	def getTopFunctions(self, limit = 25):
+		""" Returns the functions with the largest cumulative time, if profile is True """
+		if self.profiler is None:
+			return []
+
+		stats = pstats.Stats(self.profiler, stream = io.StringIO())
+		top = []
+		for (fileName, line, function), (_, calls, tottime, cumtime, _) in stats.stats.items():
+			top.append({"function" : function, "file" : fileName, "line" : line, "calls" : calls, "tottime" : tottime, "cumtime" : cumtime})
+
+		return sorted(top, key = lambda f : -f["cumtime"])[:limit]
+
+	def getReport(self):
+		report = {
+			"name" : self.name,
+			"total" : self.total,
+			"totals" : self.getTotals(),
+			"phases" : self.phases,
+			"counts" : self.counts
+		}
+		if self.memory:
+			report["peak"] = self.peak
+		if self.profile:
+			report["profile"] = self.getTopFunctions()
+
+		return report
+
+	def toJSON(self, jsonFile):
+		with open(jsonFile, 'w') as outFile:
+			json.dump(self.getReport(), outFile, indent = 4)
+
+	def dumpProfile(self, profileFile):
+		""" Write the raw cProfile data, e.g. for snakeviz or python -m pstats """
+		if self.profiler is not None:
+			self.profiler.dump_stats(profileFile)
+
+def activate(profiler):
+	""" Record all phases and counts with the given profiler (or stop recording if None). Returns the previous one """
+	global active
+	previous = active
+	active = profiler
+	return previous
+
+def phase(name):
+	""" A context manager timing the given phase with the active profiler. Does nothing if there is none """
+	if active is None:
+		return nullcontext()
+	return active.phase(name)
+
+def inScope(scope):
+	if active is None:
+		return nullcontext()
+	return active.inScope(scope)
+
+def count(name, value = 1):
+	if active is not None:
+		active.count(name, value)
@@ -0,0 +1,230 @@
+import gc
+
+import numpy as np
+
+import Forest
+import Tree
+import Node
+
+class SyntheticTree:
+	""" A SyntheticTree is a random tree stored as flat arrays in pre-order (as the ids assigned by
+		Tree.fromSKLearn). The arrays are generated at once with numpy, so that forests with millions
+		of nodes can be generated in a few seconds. Inner nodes have the children left / right, leafs
+		have left = right = -1
+	"""
+	def __init__(self, depth, dim, numClasses = 2, splitDataType = "int", skew = 0.5, leafProb = 0.0, featureRange = 1000, numSamples = 100000, weight = 1.0, rng = None):
+		"""
+		Args:
+			depth (int): The maximum number of splits on a path from the root to a leaf
+			dim (int): The dimension of the features
+			numClasses (int, optional): The number of classes
+			splitDataType (str, optional): Either "int" or "float"
+			skew (float, optional): The skew of probLeft in [0, 1). probLeft is drawn from Beta(a, a) with
+									a = 1 / skew - 1, i.e. 0 gives balanced splits (probLeft = 0.5), 0.5
+									uniform probLeft and values close to 1 mostly probLeft close to 0 or 1
+			leafProb (float, optional): The probability of an inner node (except the root) to be a leaf
+										before the maximum depth is reached. 0 gives complete trees
+			featureRange (int, optional): The features are uniformly distributed in [0, featureRange). The
+										  splits are the quantiles of probLeft, so getSyntheticData follows
+										  the branches with probLeft
+			numSamples (int, optional): The number of samples at the root, split along probLeft
+			weight (float, optional): The weight of the predictions of this tree (1 / #trees for a forest)
+			rng (numpy.random.RandomState, optional): The random number generator
+		"""
+		if rng is None:
+			rng = np.random.RandomState()
+
+		# The structure is generated in pre-order with a stack, all other values are drawn at once
+		stopEarly = []
+		left = []
+		right = []
+		nodeDepth = []
+		parents = [(-1, 0, 0)]
+		while len(parents) > 0:
+			parent, isRight, curDepth = parents.pop()
+			curNode = len(left)
+			left.append(-1)
+			right.append(-1)
+			nodeDepth.append(curDepth)
+			if parent >= 0:
+				if isRight:
+					right[parent] = curNode
+				else:
+					left[parent] = curNode
+
+			if curNode >= len(stopEarly):
+				stopEarly += (rng.uniform(size = 1 << 16) < leafProb).tolist()
+
+			if curDepth < depth and (curDepth == 0 or not stopEarly[curNode]):
+				parents.append((curNode, 1, curDepth + 1))
+				parents.append((curNode, 0, curDepth + 1))
+
+		self.left = np.array(left, dtype = np.int64)
+		self.right = np.array(right, dtype = np.int64)
+		self.depth = np.array(nodeDepth, dtype = np.int64)
+		numNodes = len(left)
+		isLeaf = self.left < 0
+
+		if skew <= 0:
+			self.probLeft = np.full(numNodes, 0.5)
+		else:
+			a = max(1.0 / skew - 1.0, 1e-3)
+			self.probLeft = np.clip(rng.beta(a, a, size = numNodes), 1e-6, 1 - 1e-6)
+		self.probLeft[isLeaf] = 0.0
+
+		self.feature = rng.randint(dim, size = numNodes)
+		self.feature[isLeaf] = -1
+		if splitDataType == "float":
+			self.split = (self.probLeft * featureRange).astype(np.float32)
+		else:
+			# P(x <= split) = (split + 1) / featureRange for uniform integer features
+			self.split = np.floor(self.probLeft * featureRange).astype(np.int64) - 1
+
+		# After the k-th pass, the number of samples of all nodes up to level k is final
+		self.numSamples = np.zeros(numNodes, dtype = np.int64)
+		self.numSamples[0] = numSamples
+		inner = np.nonzero(~isLeaf)[0]
+		for i in range(depth):
+			self.numSamples[self.left[inner]] = np.round(self.numSamples[inner] * self.probLeft[inner])
+			self.numSamples[self.right[inner]] = self.numSamples[inner] - self.numSamples[self.left[inner]]
+
+		self.prediction = rng.dirichlet(np.ones(numClasses), size = numNodes) * weight
+		self.prediction[~isLeaf] = 0.0
+
+	def getNumNodes(self):
+		return len(self.left)
+
+	def predict(self, X):
+		""" Returns the class predicted for each row of X (vectorized, level by level) as Tree.predict """
+		curNode = np.zeros(len(X), dtype = np.int64)
+		rows = np.arange(len(X))
+		for i in range(self.depth.max()):
+			goLeft = X[rows, np.maximum(self.feature[curNode], 0)] <= self.split[curNode]
+			nextNode = np.where(goLeft, self.left[curNode], self.right[curNode])
+			curNode = np.where(nextNode >= 0, nextNode, curNode)
+
+		return self.prediction[curNode].argmax(axis = 1)
+
+	def toTree(self):
+		""" Returns the Tree with one Node per entry of the arrays """
+		left = self.left.tolist()
+		right = self.right.tolist()
+		numSamples = self.numSamples.tolist()
+		probLeft = self.probLeft.tolist()
+		feature = self.feature.tolist()
+		split = self.split.tolist()
+		prediction = self.prediction.tolist()
+
+		nodes = {}
+		for curNode in range(len(left)):
+			node = Node.Node()
+			node.id = curNode
+			node.numSamples = numSamples[curNode]
+			if left[curNode] < 0:
+				node.prediction = prediction[curNode]
+			else:
+				node.probLeft = probLeft[curNode]
+				node.probRight = 1.0 - probLeft[curNode]
+				node.isCategorical = False
+				node.feature = feature[curNode]
+				node.split = split[curNode]
+			nodes[curNode] = node
+
+		for curNode in range(len(left)):
+			if left[curNode] >= 0:
+				nodes[curNode].leftChild = nodes[left[curNode]]
+				nodes[curNode].rightChild = nodes[right[curNode]]
+
+		tree = Tree.Tree()
+		tree.fromTree(nodes, nodes[0])
+		tree.numClasses = self.prediction.shape[1]
+
+		return tree
+
+	def toDict(self):
+		""" Returns the structure written by Tree.str() as nested dictionaries, see Tree.getSKLearnDict """
+		left = self.left.tolist()
+		right = self.right.tolist()
+		numSamples = self.numSamples.tolist()
+		probLeft = self.probLeft.tolist()
+		feature = self.feature.tolist()
+		split = self.split.tolist()
+		prediction = self.prediction.tolist()
+
+		def toDict(curNode):
+			node = {"id" : curNode, "numSamples" : numSamples[curNode]}
+
+			if left[curNode] < 0:
+				node["prediction"] = prediction[curNode]
+			else:
+				node["probLeft"] = probLeft[curNode]
+				node["probRight"] = 1.0 - probLeft[curNode]
+				node["isCategorical"] = "False"
+				node["feature"] = feature[curNode]
+				node["split"] = split[curNode]
+				node["leftChild"] = toDict(left[curNode])
+				node["rightChild"] = toDict(right[curNode])
+
+			return node
+
+		return toDict(0)
+
+def getSyntheticTrees(numTrees, depth, dim, numClasses = 2, splitDataType = "int", skew = 0.5, leafProb = 0.0, featureRange = 1000, seed = 0):
+	""" Generate the trees of a synthetic forest, see SyntheticTree for the arguments
+
+	Returns:
+		list: The SyntheticTrees (each weighted with 1 / numTrees as in a random forest)
+	"""
+	rng = np.random.RandomState(seed)
+	return [SyntheticTree(depth, dim, numClasses, splitDataType, skew, leafProb, featureRange, weight = 1.0 / numTrees, rng = rng) for i in range(numTrees)]
+
+def withoutGC(function):
+	""" Call function with the cyclic garbage collector disabled. Otherwise, allocating millions of nodes
+		triggers full collections over all nodes created so far again and again
+	"""
+	enabled = gc.isenabled()
+	gc.disable()
+	try:
+		return function()
+	finally:
+		if enabled:
+			gc.enable()
+
+def toForest(trees):
+	""" Convert the SyntheticTrees into a Forest, which can be given to the converters """
+	forest = Forest.Forest()
+	forest.trees = withoutGC(lambda : [t.toTree() for t in trees])
+
+	return forest
+
+def getSyntheticForest(numTrees, depth, dim, numClasses = 2, splitDataType = "int", skew = 0.5, leafProb = 0.0, featureRange = 1000, seed = 0):
+	""" Generate a random forest without training, see SyntheticTree for the arguments
+
+	Returns:
+		Forest: The forest
+	"""
+	return toForest(getSyntheticTrees(numTrees, depth, dim, numClasses, splitDataType, skew, leafProb, featureRange, seed))
+
+def getSyntheticData(trees, numSamples, dim, splitDataType = "int", featureRange = 1000, seed = 0):
+	""" Generate test data for the given SyntheticTrees. The features are uniformly distributed, so that
+		the branches are taken with (roughly) probLeft. The labels are the predictions of the forest
+		(majority vote as in Forest.predict)
+
+	Returns:
+		tuple: X (int32 or float32) and Y
+	"""
+	rng = np.random.RandomState(seed)
+	if splitDataType == "float":
+		X = rng.uniform(0, featureRange, size = (numSamples, dim)).astype(np.float32)
+	else:
+		X = rng.randint(featureRange, size = (numSamples, dim)).astype(np.int32)
+
+	votes = np.zeros((numSamples, trees[0].prediction.shape[1]), dtype = np.int64)
+	for t in trees:
+		votes[np.arange(numSamples), t.predict(X)] += 1
+
+	return X, votes.argmax(axis = 1)
+
+def toDicts(trees):
+	""" Returns the JSON structure of the forest of the given SyntheticTrees (see SyntheticTree.toDict) """
+	return withoutGC(lambda : [t.toDict() for t in trees])
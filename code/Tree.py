@@ -158,9 +158,15 @@ class Tree():
 	# def getNumNodes(self):
 	# 	return len(self.nodes)
 
-	# def getMaxDepth(self):
-	# 	paths = self.getAllPaths()
-	# 	return max([len(p) for p in paths])
+	def getMaxDepth(self, node = None):
+		""" Returns the maximum number of splits on a path from the root to a leaf """
+		if node is None:
+			node = self.head
+
+		if node.prediction is not None:
+			return 0
+		else:
+			return 1 + max(self.getMaxDepth(node.leftChild), self.getMaxDepth(node.rightChild))
 
 	def getAvgDepth(self):
 		paths = self.getAllPaths()
@@ -216,6 +222,121 @@ class Tree():
 	def getNumNodes(self):
 		return len(self.nodes)
 
+	def collapse(self, tolerance = None, node = None):
+		""" Collapses all subtrees whose leaves lead to the same result into a single leaf (bottom-up).
+			The root node is never collapsed, since all native layouts require at least one split.
+
+		Args:
+		    tolerance (float, optional): If None, two leaves are merged if they predict the same class
+		    	(hard voting). Otherwise, two leaves are merged if their class probabilities differ by
+		    	at most tolerance for every class (soft voting)
+		    node (Node, optional): The current node (default = None ==> root node of the tree)
+
+		Returns:
+		    int: The number of removed nodes
+		"""
+		if node is None:
+			node = self.head
+
+		if node.prediction is not None:
+			return 0
+
+		removed = self.collapse(tolerance, node.leftChild) + self.collapse(tolerance, node.rightChild)
+		left = node.leftChild
+		right = node.rightChild
+
+		if node is self.head or left.prediction is None or right.prediction is None:
+			return removed
+
+		leftPred = np.array(left.prediction)
+		rightPred = np.array(right.prediction)
+		if tolerance is None:
+			mergeable = np.argmax(leftPred) == np.argmax(rightPred)
+		else:
+			# Leaf predictions are scaled by the tree weight, thus compare the normalized probabilities
+			leftProb = leftPred / max(np.sum(np.abs(leftPred)), np.finfo(float).eps)
+			rightProb = rightPred / max(np.sum(np.abs(rightPred)), np.finfo(float).eps)
+			mergeable = np.max(np.abs(leftProb - rightProb)) <= tolerance
+
+		if mergeable:
+			node.prediction = list(node.probLeft * leftPred + node.probRight * rightPred)
+			node.feature = None
+			node.split = None
+			node.isCategorical = None
+			node.probLeft = None
+			node.probRight = None
+			node.leftChild = None
+			node.rightChild = None
+			del self.nodes[left.id]
+			del self.nodes[right.id]
+			removed += 2
+
+		return removed
+
+	def hashConsSubtrees(self, table, counts, node = None, getLabel = None):
+		""" Assigns the same subtreeID to all structurally identical subtrees (hash-consing). Leaves are
+			identified by their predicted class (or by the value given by getLabel), split nodes by feature,
+			split and the IDs of their children.
+
+		Args:
+		    table (dict): A dictionary (key = subtree key, value = subtreeID) shared between trees
+		    counts (dict): A dictionary (key = subtreeID, value = number of occurrences) shared between trees
+		    node (Node, optional): The current node (default = None ==> root node of the tree)
+		    getLabel (function, optional): Returns the value the generated code returns for a leaf, e.g. its leaf index
+		                                   for soft voting (see TreeConverter.getLabel). Defaults to the predicted class
+
+		Returns:
+		    int: The subtreeID of the given node
+		"""
+		if node is None:
+			node = self.head
+
+		if node.prediction is not None:
+			key = (int(np.argmax(node.prediction)) if getLabel is None else getLabel(node),)
+		else:
+			leftID = self.hashConsSubtrees(table, counts, node.leftChild, getLabel)
+			rightID = self.hashConsSubtrees(table, counts, node.rightChild, getLabel)
+			key = (node.feature, node.split, leftID, rightID)
+
+		if key not in table:
+			table[key] = len(table)
+		node.subtreeID = table[key]
+		counts[node.subtreeID] = counts.get(node.subtreeID, 0) + 1
+
+		return node.subtreeID
+
+	def getNumSplits(self):
+		return len([key for key in self.nodes if self.nodes[key].prediction is None])
+
+	def getExpectedNumComparisons(self):
+		""" Computes the expected number of comparisons needed to traverse this tree, that is the sum
+		    of the probabilities to reach each split node
+
+		Returns:
+		    float: The expected number of comparisons per sample
+		"""
+		self.getProbAllPaths()
+		return sum([self.nodes[key].pathProb for key in self.nodes if self.nodes[key].prediction is None])
+
+	def getPredicates(self, predicates = None):
+		""" Collects all distinct predicates (feature, split) tested by this tree
+
+		Args:
+		    predicates (set, optional): A set of already known predicates, which is extended by this tree
+
+		Returns:
+		    set: The set of (feature, split) tuples tested by this tree
+		"""
+		if predicates is None:
+			predicates = set()
+
+		for key in self.nodes:
+			node = self.nodes[key]
+			if node.prediction is None:
+				predicates.add((node.feature, node.split))
+
+		return predicates
+
 	def predict(self,x):
 		curNode = self.head
 
@@ -229,12 +350,66 @@ class Tree():
 
 		return curNode.predict(x)
 
+	def getArrays(self):
+		""" Returns the tree as flat arrays in pre-order, so that it can be evaluated for many samples at once
+
+		Returns:
+			Tuple: A tuple (nodes, left, right, feature, split, label), where nodes is the list of Nodes, left and right
+			are the indices of the children (-1 for leaves) and label is the predicted class of each leaf (-1 for splits)
+		"""
+		nodes = []
+		stack = [self.head]
+		while len(stack) > 0:
+			node = stack.pop()
+			nodes.append(node)
+			if node.prediction is None:
+				stack.append(node.rightChild)
+				stack.append(node.leftChild)
+
+		index = {id(n) : i for i, n in enumerate(nodes)}
+		left = np.array([-1 if n.prediction is not None else index[id(n.leftChild)] for n in nodes], dtype = np.int64)
+		right = np.array([-1 if n.prediction is not None else index[id(n.rightChild)] for n in nodes], dtype = np.int64)
+		feature = np.array([0 if n.prediction is not None else n.feature for n in nodes], dtype = np.int64)
+		split = np.array([0 if n.prediction is not None else n.split for n in nodes], dtype = np.float64)
+		label = np.array([-1 if n.prediction is None else np.argmax(n.prediction) for n in nodes], dtype = np.int64)
+
+		return nodes, left, right, feature, split, label
+
+	def predict_leaves(self, X, arrays = None):
+		""" Returns the index (see getArrays) of the leaf reached by each row of X. All rows are moved down
+			one level at a time, so the python overhead only depends on the depth of the tree
+
+		Args:
+			X (numpy.ndarray): The samples
+			arrays (tuple, optional): The result of getArrays, if already computed
+		"""
+		_, left, right, feature, split, _ = self.getArrays() if arrays is None else arrays
+		X = np.asarray(X)
+		curNode = np.zeros(len(X), dtype = np.int64)
+		active = np.arange(len(X))
+		active = active[left[curNode[active]] >= 0]
+		while len(active) > 0:
+			nodes = curNode[active]
+			goLeft = X[active, feature[nodes]] <= split[nodes]
+			curNode[active] = np.where(goLeft, left[nodes], right[nodes])
+			active = active[left[curNode[active]] >= 0]
+
+		return curNode
+
+	def getLeafIndices(self, arrays = None):
+		""" Returns the index of every leaf among all leaves of the tree in pre-order and -1 for splits (see getArrays).
+			The soft voting code (see SoftVoteForestConverter) returns this index instead of the class
+
+		Args:
+			arrays (tuple, optional): The result of getArrays, if already computed
+		"""
+		left = self.getArrays()[1] if arrays is None else arrays[1]
+		isLeaf = left < 0
+		return np.where(isLeaf, np.cumsum(isLeaf) - 1, -1)
+
 	def predict_batch(self,X):
-		YPred = []
-		for x in X:
-			YPred.append(self.predict(x).argmax())
-			
-		return YPred
+		arrays = self.getArrays()
+		return arrays[5][self.predict_leaves(X, arrays)]
 	# def getMaxProb(self, top_n = 1):
 	# 	paths = self.getAllPaths()
 	# 	probs = [reduce(lambda x, y: x*y, path) for path in paths]
@@ -244,4 +419,81 @@ class Tree():
 
 	# def getAvgProb(self):
 	# 	paths = self.getAllPaths()
-	# 	return sum( [reduce(lambda x, y: x*y, path) for path in paths] ) / len(paths)
\ No newline at end of file
+	# 	return sum( [reduce(lambda x, y: x*y, path) for path in paths] ) / len(paths)
+
+
+def getSKLearnDict(tree, roundSplit = False, skType = "RandomForest", weight = 1.0):
+	""" Converts a sci-kit tree into the structure written by Tree.str() (as nested dictionaries), but
+		reads the arrays of the sci-kit tree directly instead of creating a Node object per node.
+		The ids are assigned in the same order as in fromSKLearn
+
+	Args:
+	    tree: The sci-kit tree (e.g. DecisionTreeClassifier)
+	    roundSplit (bool, optional): If True, the splits are rounded to integers
+	    skType (str, optional): The type of the ensemble, see Node.fromSKLearn
+	    weight (float, optional): The weight of the tree
+
+	Returns:
+	    dict: The root node, which can be written with json.dump
+	"""
+	tree = tree.tree_
+	left = tree.children_left.tolist()
+	right = tree.children_right.tolist()
+	isLeaf = (tree.children_left == _tree.TREE_LEAF).tolist()
+	numSamples = tree.n_node_samples.tolist()
+	feature = tree.feature.tolist()
+	if roundSplit:
+		split = tree.threshold.astype(np.int64).tolist()
+	else:
+		split = tree.threshold.tolist()
+
+	# The branch probabilities and the predictions of all nodes at once, see Node.fromSKLearn
+	samples = tree.n_node_samples.astype(np.float64)
+	probLeft = (samples[tree.children_left] / samples).tolist()
+	probRight = (samples[tree.children_right] / samples).tolist()
+
+	proba = np.array(tree.value[:, 0, :], dtype = np.float64)
+	if skType == "SAMME.R":
+		nClasses = proba.shape[1]
+		proba[proba < np.finfo(proba.dtype).eps] = np.finfo(proba.dtype).eps
+		logProba = np.log(proba)
+		proba = (nClasses - 1) * (logProba - (1. / nClasses) * logProba.sum(axis = 1, keepdims = True))
+	elif skType == "RandomForest":
+		proba = proba / proba.sum(axis = 1, keepdims = True)
+	prediction = (proba * weight).tolist()
+
+	nextID = [0]
+	def toDict(curNode):
+		node = {"id" : nextID[0], "numSamples" : numSamples[curNode]}
+		nextID[0] += 1
+
+		if isLeaf[curNode]:
+			node["prediction"] = prediction[curNode]
+		else:
+			node["probLeft"] = probLeft[curNode]
+			node["probRight"] = probRight[curNode]
+			node["isCategorical"] = "False"
+			node["feature"] = feature[curNode]
+			node["split"] = split[curNode]
+			node["leftChild"] = toDict(left[curNode])
+			node["rightChild"] = toDict(right[curNode])
+
+		return node
+
+	return toDict(0)
+
+def getSKLearnAvgDepth(tree):
+	""" Returns Tree.getAvgDepth() of the given sci-kit tree without converting the tree first. As in
+		getAllPaths, the sub-paths to the inner nodes are included (without the inner node itself)
+	"""
+	tree = tree.tree_
+	isLeaf = tree.children_left == _tree.TREE_LEAF
+	inner = np.nonzero(~isLeaf)[0]
+	depth = np.zeros(tree.node_count, dtype = np.int64)
+	# After the k-th pass, the depths of all nodes up to level k are final
+	for i in range(tree.max_depth):
+		depth[tree.children_left[inner]] = depth[inner] + 1
+		depth[tree.children_right[inner]] = depth[inner] + 1
+
+	lengths = np.concatenate([depth[isLeaf] + 1, depth[~isLeaf][1:]])
+	return float(np.mean(lengths))
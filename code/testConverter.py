@@ -6,8 +6,6 @@ import os.path
 import pickle
 import sklearn
 import json
-import gc
-import objgraph
 
 from sklearn.tree import DecisionTreeClassifier
 from sklearn.ensemble import RandomForestClassifier
@@ -26,6 +24,7 @@ sys.setrecursionlimit(20000)
 #sys.path.append('../code/')
 
 import Forest
+import Profiler
 from ForestConverter import *
 from NativeTreeConverter import *
 from IfTreeConverter import *
@@ -203,7 +202,7 @@ def getFeatureType(X):
 			maxVal = upper
 		else:
 			prefix = ""
-			bitUser = 1
+			bitUsed = 1
 			maxVal = max(-lower, upper)
 
 		bit = int(np.log2(maxVal) + 1 if maxVal != 0 else 1)
@@ -223,6 +222,11 @@ def main(argv):
 
 	forestPath = "RF_15.json"
 	for i in range(10):
+		# The peak memory should stay the same in every iteration, otherwise the converters leak nodes
+		profiler = Profiler.Profiler(forestPath, memory = True)
+		Profiler.activate(profiler)
+		profiler.start()
+
 		loadedForest = Forest.Forest()
 		loadedForest.fromJSON(forestPath)
 
@@ -250,12 +254,9 @@ def main(argv):
 		loadedForest = None
 		converter = None
 
-		#gc.set_debug(gc.DEBUG_LEAK)
-		gc.collect()
-		#print(sys.getrefcount(loadedForest))
-		#print(sys.getrefcount(converter))
-
-		objgraph.show_most_common_types(limit=20)
+		profiler.stop()
+		Profiler.activate(None)
+		print("\tIteration %s: %.2f s, peak %.2f MB" % (i, profiler.total, profiler.peak / 1024.0**2))
 
 if __name__ == "__main__":
    main(sys.argv[1:])
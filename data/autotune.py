@@ -0,0 +1,268 @@
+#!/usr/bin/env python3
+
+import sys
+import os
+import json
+import shutil
+import hashlib
+import subprocess
+import queue
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+sys.setrecursionlimit(20000)
+sys.path.append('../code/')
+
+import Forest
+from ForestConverter import *
+from NativeTreeConverter import *
+from IfTreeConverter import *
+from MixConverter import *
+from LUTTreeConverter import *
+from HostProfile import getLocalProfile
+from generateCode import generateClassifier, getFeatureType, getOption, loadTestData, SWEEP_FLAGS
+
+# The compiler flags explored by default (separated by ;)
+FLAGS = SWEEP_FLAGS
+
+def getCandidates(dim, featureType, target, budgetSizes, setSizes):
+	""" Returns the converter configurations to be explored
+
+	Returns:
+		list: A list of tuples (config, factory), where config is a dictionary describing the
+			  configuration and factory(namespace) returns the corresponding forest converter
+	"""
+	candidates = []
+	candidates.append(({"converter" : "StandardIfTree"}, lambda ns : ForestConverter(StandardIFTreeConverter(dim, ns, featureType))))
+	candidates.append(({"converter" : "StandardNativeTree"}, lambda ns : ForestConverter(StandardNativeTreeConverter(dim, ns, featureType))))
+	candidates.append(({"converter" : "SwitchNativeTree"}, lambda ns : ForestConverter(SwitchNativeTreeConverter(dim, ns, featureType))))
+	candidates.append(({"converter" : "SwitchCaseNativeTree"}, lambda ns : ForestConverter(SwitchNativeTreeConverter(dim, ns, featureType, computedGoto = False))))
+	candidates.append(({"converter" : "PredicateIfTree"}, lambda ns : PredicateForestConverter(PredicateIFTreeConverter(dim, ns, featureType))))
+	candidates.append(({"converter" : "PredicateNativeTree"}, lambda ns : PredicateForestConverter(PredicateNativeTreeConverter(dim, ns, featureType))))
+	candidates.append(({"converter" : "SharedIfTree"}, lambda ns : ForestConverter(SharedIFTreeConverter(dim, ns, featureType))))
+	candidates.append(({"converter" : "DAGNativeTree"}, lambda ns : OptimizedNativeForestConverter(DAGNativeTreeConverter(dim, ns, featureType))))
+	candidates.append(({"converter" : "LUTTree"}, lambda ns : ForestConverter(LUTTreeConverter(dim, ns, featureType), StandardIFTreeConverter(dim, ns, featureType))))
+	candidates.append(({"converter" : "CompactStandardIfTree"}, lambda ns : CompactForestConverter(StandardIFTreeConverter(dim, ns, featureType))))
+	candidates.append(({"converter" : "CompactStandardNativeTree"}, lambda ns : CompactForestConverter(StandardNativeTreeConverter(dim, ns, featureType))))
+
+	for b in budgetSizes:
+		for layout in ["path", "node"]:
+			candidates.append(({"converter" : "OptimizedIfTree", "budgetSize" : b, "layout" : layout}, \
+				lambda ns, b = b, layout = layout : ForestConverter(OptimizedIFTreeConverter(dim, ns, featureType, target, layout, b))))
+
+	for s in setSizes:
+		candidates.append(({"converter" : "OptimizedNativeTree", "setSize" : s}, \
+			lambda ns, s = s : ForestConverter(OptimizedNativeTreeConverter(dim, ns, featureType, s))))
+
+		for b in budgetSizes:
+			candidates.append(({"converter" : "MixTree", "budgetSize" : b, "setSize" : s}, \
+				lambda ns, b = b, s = s : ForestConverter(MixConverter(dim, ns, featureType, target, b, s))))
+
+	return candidates
+
+def getHash(files, compiler, flags):
+	h = hashlib.sha1()
+	for f in files:
+		with open(f, 'rb') as inFile:
+			h.update(inFile.read())
+	h.update((compiler + " " + flags).encode())
+	return h.hexdigest()[:16]
+
+def compile(buildPath, namespace, compiler, flags):
+	""" Compile the test binary of the given namespace. Binaries are cached by the hash of their sources
+		and flags, so unchanged configurations are not compiled again
+
+	Returns:
+		str: The name of the binary or None if the compilation failed
+	"""
+	sources = [namespace + ".h", namespace + ".cpp", "test" + namespace + ".cpp"]
+	binary = "bin_" + getHash([os.path.join(buildPath, s) for s in sources], compiler, flags)
+
+	if not os.path.exists(os.path.join(buildPath, binary)):
+		ret = subprocess.run(compiler + " " + flags + " " + namespace + ".cpp test" + namespace + ".cpp -o " + binary + ".tmp", \
+			shell = True, cwd = buildPath, stdout = subprocess.DEVNULL, stderr = subprocess.DEVNULL)
+		if ret.returncode != 0:
+			return None
+		os.rename(os.path.join(buildPath, binary + ".tmp"), os.path.join(buildPath, binary))
+
+	return binary
+
+def run(buildPath, binary, core, targetAcc):
+	""" Run the given binary (pinned to the given core if possible) and return its mean latency or
+		None if the run failed or its accuracy does not match the accuracy of the python model
+	"""
+	cmd = "./" + binary
+	if core is not None and shutil.which("taskset") is not None:
+		cmd = "taskset -c " + str(core) + " " + cmd
+
+	output = subprocess.run(cmd, shell = True, cwd = buildPath, stdout = subprocess.PIPE, stderr = subprocess.PIPE, universal_newlines = True)
+	if output.returncode != 0 or len(output.stdout.strip()) == 0:
+		print("\tRunning", binary, "failed:", output.stderr.strip())
+		return None
+
+	# The test program writes its accuracy to stderr (see measurmentCodeTemplate in generateCode.py)
+	accuracies = [int(l.split(",")[1]) for l in output.stderr.split("\n") if l.startswith("accuracy,")]
+	if len(accuracies) == 0 or accuracies[-1] != targetAcc:
+		print("\tTarget accuracy was not met by", binary, "(target: %s, current: %s)" % (targetAcc, accuracies[-1] if len(accuracies) > 0 else None))
+		return None
+
+	return float(output.stdout.strip().split("\n")[-1].split(",")[0])
+
+def successiveHalving(buildPath, binaries, cores, minRuns, eta, targetAcc):
+	""" Time all candidates with minRuns runs, keep the best 1/eta and repeat with eta times more runs
+		until a single candidate is left
+
+	Args:
+		buildPath (str): The directory of the binaries
+		binaries (dict): A dictionary (key = candidate index, value = binary)
+		cores (list): The cores to run on. Candidates are timed concurrently, one per core
+		minRuns (int): The number of runs per candidate in the first round
+		eta (int): The reduction factor per round
+		targetAcc (int): The number of correctly classified test samples of the python model. Candidates
+						 which do not reach it are dropped
+
+	Returns:
+		dict: A dictionary (key = candidate index, value = list of measured latencies)
+	"""
+	freeCores = queue.Queue()
+	for c in cores:
+		freeCores.put(c)
+
+	def timeCandidate(binary):
+		core = freeCores.get()
+		try:
+			return run(buildPath, binary, core, targetAcc)
+		finally:
+			freeCores.put(core)
+
+	times = {i : [] for i in binaries}
+	survivors = list(binaries.keys())
+	runs = minRuns
+	while len(survivors) > 0:
+		with ThreadPoolExecutor(max_workers = len(cores)) as pool:
+			tasks = [(i, pool.submit(timeCandidate, binaries[i])) for i in survivors for r in range(runs)]
+			for i, task in tasks:
+				t = task.result()
+				if t is None:
+					times[i] = None
+				elif times[i] is not None:
+					times[i].append(t)
+
+		survivors = [i for i in survivors if times[i] is not None]
+		print("\tRound with %d runs: %d candidates" % (runs, len(survivors)))
+		if len(survivors) <= 1:
+			break
+
+		survivors.sort(key = lambda i : np.median(times[i]))
+		survivors = survivors[:max(1, len(survivors) // eta)]
+		if len(survivors) == 1:
+			break
+		runs *= eta
+
+	return times
+
+def main(argv):
+	# Explore converter x setSize x budget x layout x compiler flags for all models of a dataset:
+	#	./autotune.py dataset intel [--models=RF_10,ET_10] [--flags="-O2;-O3"] [--budgets=32768,65536] [--setsizes=4,8]
+	#				  [--jobs=4] [--cores=2,3] [--runs=1] [--eta=2] [--reps=5]
+	# The best configuration per model is stored in dataset/autotune_intel.json
+	options = [a for a in argv if a.startswith("--")]
+	argv = [a for a in argv if not a.startswith("--")]
+
+	if len(argv) < 1:
+		print("Please give a sub-folder / dataset to be used")
+		return
+	else:
+		basepath = argv[0].strip("/")
+
+	if len(argv) < 2:
+		print("Please give a target architecture (arm or intel or ppc)")
+		return
+	else:
+		target = argv[1]
+
+	if target != "intel":
+		# Candidates have to be timed on the machine the code is generated for
+		print("Autotuning is only supported for the local machine (intel)")
+		return
+
+	compiler = getOption(options, "compiler", "g++")
+	flagsList = getOption(options, "flags", FLAGS).split(";")
+	jobs = int(getOption(options, "jobs", os.cpu_count()))
+	cores = [int(c) for c in getOption(options, "cores", str(os.cpu_count() - 1)).split(",")]
+	minRuns = int(getOption(options, "runs", 1))
+	eta = int(getOption(options, "eta", 2))
+	reps = int(getOption(options, "reps", 5))
+
+	hostProfile = getLocalProfile()
+	if getOption(options, "budgets") is not None:
+		budgetSizes = [int(b) for b in getOption(options, "budgets").split(",")]
+	elif hostProfile is not None and len(hostProfile.getBudgetSizes()) > 0:
+		budgetSizes = hostProfile.getBudgetSizes()
+	else:
+		budgetSizes = [32*1000, 128*1000]
+
+	if getOption(options, "setsizes") is not None:
+		setSizes = [int(s) for s in getOption(options, "setsizes").split(",")]
+	elif hostProfile is not None and len(hostProfile.getSetSizes()) > 0:
+		setSizes = hostProfile.getSetSizes()
+	else:
+		setSizes = [8, 25]
+
+	if getOption(options, "models") is not None:
+		models = getOption(options, "models").split(",")
+	else:
+		models = sorted([f[:-len(".json")] for f in os.listdir(basepath + "/text/") if f.endswith(".json")])
+
+	X, Y = loadTestData(basepath + "/test.csv")
+	featureType = getFeatureType(X)
+	dim = len(X[0])
+	testFile = os.path.abspath(basepath + "/test.csv")
+
+	resultFile = basepath + "/autotune_" + target + ".json"
+	if os.path.exists(resultFile):
+		with open(resultFile) as f:
+			results = json.load(f)
+	else:
+		results = {}
+
+	for model in models:
+		print("Autotuning", model)
+		forest = Forest.Forest()
+		forest.fromJSON(basepath + "/text/" + model + ".json")
+		targetAcc = sum(forest.predict_batch(X) == Y)
+
+		buildPath = basepath + "/autotune/" + target + "/" + model + "/"
+		if not os.path.exists(buildPath):
+			os.makedirs(buildPath)
+
+		# The code of a converter does not depend on the flags, so it is generated once per configuration
+		candidates = getCandidates(dim, featureType, target, budgetSizes, setSizes)
+		configs = []
+		for i, (config, factory) in enumerate(candidates):
+			namespace = "Candidate" + str(i)
+			generateClassifier(buildPath, targetAcc, dim, len(X), factory(namespace), namespace, featureType, forest, testFile, reps)
+			for flags in flagsList:
+				configs.append((dict(config, flags = flags), namespace, flags))
+
+		print("\tCompiling %d candidates with %d jobs" % (len(configs), jobs))
+		with ThreadPoolExecutor(max_workers = jobs) as pool:
+			binaries = list(pool.map(lambda c : compile(buildPath, c[1], compiler, c[2]), configs))
+		binaries = {i : b for i, b in enumerate(binaries) if b is not None}
+
+		times = successiveHalving(buildPath, binaries, cores, minRuns, eta, targetAcc)
+		measured = [i for i in times if times[i] is not None and len(times[i]) > 0]
+		if len(measured) == 0:
+			print("\tNo valid candidate found")
+			continue
+
+		best = min(measured, key = lambda i : (-len(times[i]), np.median(times[i])))
+		results[model] = dict(configs[best][0], latency = float(np.median(times[best])), runs = len(times[best]))
+		print("\tBest:", results[model])
+
+		with open(resultFile, 'w') as f:
+			json.dump(results, f, indent = 4)
+
+if __name__ == "__main__":
+	main(sys.argv[1:])
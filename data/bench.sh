@@ -0,0 +1,22 @@
+#/bin/bash
+
+if [ "$#" -lt 1 ]
+then
+  echo "Please give a (valid) sub-folder"
+  exit 1
+fi
+
+if [ "$#" -lt 2 ]
+then
+  echo "Please give a (valid) compile target (arm or intel or ppc)"
+  exit 1
+fi
+
+# Builds and runs the benchmark harness of every classifier. The latency distribution and the
+# hardware counters of each classifier are written to dataset/cpp/target/model/benchX.json
+for d in ./$1/cpp/$2/*/; do
+	make -C $d -j$(nproc) bench
+	for b in $(find $d -maxdepth 1 -executable -type f -name "bench*"); do
+		(cd $d && ./$(basename $b) > $(basename $b).json)
+	done
+done
@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+
+import sys
+import os
+import json
+import shutil
+import tempfile
+import timeit
+import tracemalloc
+
+import numpy as np
+
+sys.setrecursionlimit(20000)
+sys.path.append('../code/')
+
+import Forest
+import SyntheticForest
+from ForestConverter import *
+from NativeTreeConverter import *
+from IfTreeConverter import *
+from MixConverter import *
+from LUTTreeConverter import *
+from generateCode import getOption
+
+def getConverters(dim, featureType, target, budgetSize, setSize):
+	""" Returns one configuration of every converter class used by generateCode.py
+
+	Returns:
+		list: A list of tuples (name, factory), where factory() returns a new forest converter
+	"""
+	return [
+		("StandardIfTree", lambda : ForestConverter(StandardIFTreeConverter(dim, "StandardIfTree", featureType))),
+		("OptimizedPathIfTree", lambda : ForestConverter(OptimizedIFTreeConverter(dim, "OptimizedPathIfTree", featureType, target, "path", budgetSize))),
+		("NaiveNativeTree", lambda : ForestConverter(NaiveNativeTreeConverter(dim, "NaiveNativeTree", featureType))),
+		("StandardNativeTree", lambda : ForestConverter(StandardNativeTreeConverter(dim, "StandardNativeTree", featureType))),
+		("SwitchNativeTree", lambda : ForestConverter(SwitchNativeTreeConverter(dim, "SwitchNativeTree", featureType))),
+		("OptimizedNativeTree", lambda : ForestConverter(OptimizedNativeTreeConverter(dim, "OptimizedNativeTree", featureType, setSize))),
+		("PredicateIfTree", lambda : PredicateForestConverter(PredicateIFTreeConverter(dim, "PredicateIfTree", featureType))),
+		("PredicateNativeTree", lambda : PredicateForestConverter(PredicateNativeTreeConverter(dim, "PredicateNativeTree", featureType))),
+		("SharedIfTree", lambda : ForestConverter(SharedIFTreeConverter(dim, "SharedIfTree", featureType))),
+		("DAGNativeTree", lambda : OptimizedNativeForestConverter(DAGNativeTreeConverter(dim, "DAGNativeTree", featureType))),
+		("CompactStandardIfTree", lambda : CompactForestConverter(StandardIFTreeConverter(dim, "CompactStandardIfTree", featureType))),
+		("CompactStandardNativeTree", lambda : CompactForestConverter(StandardNativeTreeConverter(dim, "CompactStandardNativeTree", featureType))),
+		("LUTTree", lambda : ForestConverter(LUTTreeConverter(dim, "LUTTree", featureType), StandardIFTreeConverter(dim, "LUTTree", featureType))),
+		("MixTree", lambda : ForestConverter(MixConverter(dim, "MixTree", featureType, target, budgetSize, setSize)))
+	]
+
+def measure(function, reps, setup = None):
+	""" Time reps calls of function and measure the peak memory of one additional call. The peak is
+		measured separately, because tracemalloc slows down the allocations considerably
+
+	Args:
+		function (function): The benchmark, called with the result of setup (if given)
+		reps (int): The number of timed calls
+		setup (function, optional): Called before each call of function, but not timed
+
+	Returns:
+		dict: The wall times (median, mean, std, min, max in seconds) and the peak memory (in bytes)
+	"""
+	args = lambda : [] if setup is None else [setup()]
+
+	times = []
+	for r in range(reps):
+		a = args()
+		start = timeit.default_timer()
+		function(*a)
+		times.append(timeit.default_timer() - start)
+
+	a = args()
+	tracemalloc.start()
+	try:
+		function(*a)
+		_, peak = tracemalloc.get_traced_memory()
+	finally:
+		tracemalloc.stop()
+
+	return {
+		"median" : float(np.median(times)),
+		"mean" : float(np.mean(times)),
+		"std" : float(np.std(times)),
+		"min" : float(np.min(times)),
+		"max" : float(np.max(times)),
+		"peak" : int(peak),
+		"reps" : reps
+	}
+
+def getCases(numTrees, depth, dim, splitDataType, numSamples, converters, tmpDir):
+	""" Returns the benchmarks of a synthetic forest with the given number of trees and depth
+
+	Returns:
+		list: A list of tuples (name, function, setup), see measure
+	"""
+	trees = SyntheticForest.getSyntheticTrees(numTrees, depth, dim, splitDataType = splitDataType, skew = 0.7, seed = depth)
+	X, _ = SyntheticForest.getSyntheticData(trees, numSamples, dim, splitDataType, seed = depth)
+	jsonFile = os.path.join(tmpDir, "T" + str(numTrees) + "_D" + str(depth) + ".json")
+	with open(jsonFile, 'w') as outFile:
+		outFile.write(json.dumps(SyntheticForest.toDicts(trees), separators = (",", ":")))
+
+	def load():
+		forest = Forest.Forest()
+		forest.fromJSON(jsonFile)
+		return forest
+
+	forest = load()
+	cases = [
+		("load", load, None),
+		("probabilities", lambda : [t.getProbAllPaths() for t in forest.trees], None),
+		("predict", lambda : forest.predict_batch(X), None)
+	]
+	# Every converter works on a freshly loaded forest, since some of them annotate the nodes
+	for name, factory in converters:
+		cases.append(("convert:" + name, lambda forest, factory = factory : factory().getCode(forest), load))
+
+	return cases
+
+def compare(results, baseline, threshold, minTime = 0.005, minMemory = 1024*1024):
+	""" Compare the median time and the peak memory of all results with the baseline. Differences below
+		minTime (in seconds) and minMemory (in bytes) are ignored, since they are within the noise of short benchmarks
+
+	Returns:
+		list: The names of the benchmarks which are slower (or use more memory) than threshold times the baseline
+	"""
+	regressions = []
+	for name in results:
+		if name not in baseline:
+			continue
+
+		timeRatio = results[name]["median"] / max(baseline[name]["median"], 1e-9)
+		memoryRatio = results[name]["peak"] / max(baseline[name]["peak"], 1)
+		results[name]["timeRatio"] = timeRatio
+		results[name]["memoryRatio"] = memoryRatio
+		slower = timeRatio > threshold and results[name]["median"] - baseline[name]["median"] > minTime
+		larger = memoryRatio > threshold and results[name]["peak"] - baseline[name]["peak"] > minMemory
+		if slower or larger:
+			regressions.append(name)
+
+	return regressions
+
+def main(argv):
+	# Benchmark loading, annotating, predicting and converting synthetic forests in python:
+	#	./benchmarkPython.py [--trees=1,25] [--depths=5,10] [--dim=20] [--type=int] [--samples=1000] [--reps=5]
+	#						 [--converters=StandardIfTree,MixTree] [--target=intel] [--budget=32768] [--setsize=8]
+	#						 [--baseline=benchmark_python.json] [--save] [--threshold=1.25] [--mintime=0.005] [--out=results.json]
+	# With --save, the results are stored as new baseline. Otherwise, they are compared with the baseline (if it
+	# exists) and the script fails if any benchmark is slower or uses more memory than threshold times the baseline
+	options = [a for a in argv if a.startswith("--")]
+
+	numTrees = [int(t) for t in getOption(options, "trees", "1,25").split(",")]
+	depths = [int(d) for d in getOption(options, "depths", "5,10").split(",")]
+	dim = int(getOption(options, "dim", 20))
+	splitDataType = getOption(options, "type", "int")
+	numSamples = int(getOption(options, "samples", 1000))
+	reps = int(getOption(options, "reps", 5))
+	target = getOption(options, "target", "intel")
+	budgetSize = int(getOption(options, "budget", 32*1024))
+	setSize = int(getOption(options, "setsize", 8))
+	baselineFile = getOption(options, "baseline", "benchmark_python.json")
+	threshold = float(getOption(options, "threshold", 1.25))
+	minTime = float(getOption(options, "mintime", 0.005))
+
+	converters = getConverters(dim, splitDataType, target, budgetSize, setSize)
+	if getOption(options, "converters") is not None:
+		selected = getOption(options, "converters").split(",")
+		converters = [c for c in converters if c[0] in selected]
+
+	results = {}
+	tmpDir = tempfile.mkdtemp()
+	try:
+		for t in numTrees:
+			for d in depths:
+				for name, function, setup in getCases(t, d, dim, splitDataType, numSamples, converters, tmpDir):
+					key = "T" + str(t) + "_D" + str(d) + "/" + name
+					results[key] = measure(function, reps, setup)
+					print("%-45s median %9.4f s (std %.4f s) peak %8.2f MB" % (key, results[key]["median"], results[key]["std"], results[key]["peak"] / 1024.0**2))
+	finally:
+		shutil.rmtree(tmpDir)
+
+	if getOption(options, "out") is not None:
+		with open(getOption(options, "out"), 'w') as f:
+			json.dump(results, f, indent = 4)
+
+	if getOption(options, "save") is not None:
+		with open(baselineFile, 'w') as f:
+			json.dump(results, f, indent = 4)
+		print("Saved baseline to", baselineFile)
+		return 0
+
+	if not os.path.exists(baselineFile):
+		print("No baseline found, please run with --save first")
+		return 0
+
+	with open(baselineFile) as f:
+		baseline = json.load(f)
+
+	regressions = compare(results, baseline, threshold, minTime)
+	for name in regressions:
+		print("Regression in %s: %.2fx time, %.2fx memory (threshold %.2fx)" % (name, results[name]["timeRatio"], results[name]["memoryRatio"], threshold))
+
+	if len(regressions) > 0:
+		return 1
+
+	print("No regressions compared to", baselineFile)
+	return 0
+
+if __name__ == "__main__":
+	sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+
+import sys
+import numpy as np
+
+sys.setrecursionlimit(20000)
+sys.path.append('../code/')
+
+import Forest
+import CostModel
+from IfTreeConverter import OptimizedIFTreeConverter
+from generateCode import getOption, COMPILERS, FLAGS
+
+def main(argv):
+	# Calibrate the cost model used by OptimizedIFTreeConverter / MixConverter for the local compiler on the trees of a trained model:
+	#	./calibrateCostModel.py intel --samples=adult/text/RF_10.json [--compiler=g++] [--flags="-O3 ..."] [--nm=nm] [--out=costmodel_intel.json]
+	# Check the predicted code size of a model against the size emitted by the compiler:
+	#	./calibrateCostModel.py intel --check=adult/text/RF_10.json [--costmodel=costmodel_intel.json] [--budget=32000]
+	options = [a for a in argv if a.startswith("--")]
+	argv = [a for a in argv if not a.startswith("--")]
+
+	if len(argv) < 1:
+		print("Please give a target architecture (arm or intel or ppc)")
+		return
+	else:
+		target = argv[0]
+
+		if (target != "intel" and target != "arm" and target != "ppc"):
+			print("Did not recognize architecture, ", target)
+			print("Please use arm or intel or ppc")
+			return
+
+	compiler = getOption(options, "compiler", COMPILERS[target])
+	flags = getOption(options, "flags", FLAGS)
+	nm = getOption(options, "nm", "nm")
+	check = getOption(options, "check")
+
+	if check is None:
+		# Complete random trees do not resemble trained trees (e.g. in the reuse of features and splits), so the
+		# sizes calibrated on them are far off. Thus, the trees of a trained model are required as samples
+		samples = getOption(options, "samples")
+		if samples is None:
+			print("Please give a trained model as samples, e.g. --samples=adult/text/RF_10.json")
+			return
+
+		forest = Forest.Forest()
+		forest.fromJSON(samples)
+
+		costModel = CostModel.calibrate(target, forest, compiler, flags, nm)
+		outFile = getOption(options, "out", "costmodel_" + target + ".json")
+		costModel.toJSON(outFile)
+
+		print("Cost model for", compiler, flags)
+		for splitDataType in costModel.sizes:
+			print("\t%s: split %.2f bytes, leaf %.2f bytes (default: split %s bytes, leaf %s bytes)" % (
+				splitDataType, costModel.sizes[splitDataType]["split"], costModel.sizes[splitDataType]["leaf"],
+				CostModel.DEFAULT_SIZES[target][splitDataType]["split"], CostModel.DEFAULT_SIZES[target][splitDataType]["leaf"]
+			))
+		print("Written to", outFile)
+	else:
+		costModel = CostModel.CostModel(target)
+		costModelFile = getOption(options, "costmodel")
+		if costModelFile is not None:
+			costModel.fromJSON(costModelFile)
+			compiler = getOption(options, "compiler", costModel.compiler)
+			flags = getOption(options, "flags", costModel.flags)
+
+		forest = Forest.Forest()
+		forest.fromJSON(check)
+
+		containsFloat = any([isinstance(t.nodes[n].split, float) for t in forest.trees for n in t.nodes])
+		featureType = "float" if containsFloat else "int"
+		dim = max([t.nodes[n].feature for t in forest.trees for n in t.nodes if t.nodes[n].prediction is None]) + 1
+		budget = float(getOption(options, "budget", float("inf")))
+
+		converter = OptimizedIFTreeConverter(dim, "check", featureType, target, "path", budget, costModel)
+		results = CostModel.checkKernelSizes(converter, forest, compiler, flags, nm)
+
+		print("tree,predictedKernel,predicted,actual,error")
+		for treeID, kernelSize, predicted, actual in results:
+			print("%d,%.0f,%.0f,%d,%.2f%%" % (treeID, kernelSize, predicted, actual, 100.0 * (predicted - actual) / max(actual, 1)))
+
+		predicted = np.array([r[2] for r in results])
+		actual = np.array([r[3] for r in results])
+		print("Total predicted: %.0f bytes, actual: %d bytes, mean absolute error: %.2f%%" % (
+			sum(predicted), sum(actual), 100.0 * np.mean(np.abs(predicted - actual) / np.maximum(actual, 1))
+		))
+
+if __name__ == "__main__":
+	main(sys.argv[1:])
@@ -0,0 +1,51 @@
+#!/usr/bin/env python3
+
+import sys
+import json
+import os.path
+
+def readResults(filename):
+	# "path,filename,depth,mean,variance,min,max,size"
+	results = {}
+	f = open(filename, 'r')
+	for row in f:
+		entries = row.replace("\n","").split(",")
+		if len(entries) < 8 or entries[0] == "path":
+			continue
+
+		results[entries[0]] = entries
+
+	return results
+
+def main(argv):
+	if len(argv) < 1:
+		print("Please provide a results file (e.g. results_intel.csv) produced by run_all.sh")
+		return
+	else:
+		filename = argv[0]
+
+	results = readResults(filename)
+
+	print("model,classifier,nodes,nodesCollapsed,size,sizeCollapsed,mean,meanCollapsed,speedup")
+	for path in sorted(results):
+		model = os.path.basename(os.path.dirname(path))
+		if not model.endswith("_collapsed"):
+			continue
+
+		basePath = path.replace(model, model[:-len("_collapsed")])
+		if basePath not in results:
+			print("No un-collapsed result found for", path)
+			continue
+
+		with open(os.path.dirname(path) + "/collapse.json") as statsFile:
+			stats = json.load(statsFile)
+
+		entries = results[path]
+		baseEntries = results[basePath]
+		mean = float(entries[3])
+		baseMean = float(baseEntries[3])
+
+		print(",".join([basePath, entries[1].replace("test",""), str(stats["nodes"]), str(stats["nodesCollapsed"]), baseEntries[7], entries[7], str(baseMean), str(mean), str(baseMean / mean if mean > 0 else 0)]))
+
+if __name__ == "__main__":
+   main(sys.argv[1:])
@@ -16,6 +16,6 @@ cd $1/cpp/$2
 
 for d in ./*/; do
 	cd $d
-	make
+	make -j$(nproc)
 	cd ..
 done
\ No newline at end of file
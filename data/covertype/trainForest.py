@@ -1,32 +1,23 @@
 #!/usr/bin/env python3
 
-import csv,operator,sys,os
+import sys
 import numpy as np
 
 sys.path.append('../')
 from fitModels import fitModels
+from datasetLoader import readCSV, loadCached
 
 def readFile(path):
-	f = open(path, 'r')
-	header = next(f)
-	X = []
-	Y = []
-
-	for row in f:
-		entries = row.replace("\n","").split(",")
-
-		X.append([float(e) for e in entries[:-1]])
-		Y.append(int(entries[-1]))
+	data = readCSV(path, skipHeader = 1)
 
 	# NOTE: It seems, that SKLEarn produces an internal mapping from 0-(|Y| - 1) for classification
 	# 		For some reason I was not able to extract this mapping from SKLearn ?!?!
-	Y = np.array(Y)
-	X = np.array(X)
+	Y = data[:,-1].astype(np.int64)
 	Y = Y-min(Y)
-	return np.array(X).astype(dtype=np.int32), np.array(Y)
+	return data[:,:-1].astype(dtype=np.int32), Y
 
 def main(argv):
-	X,Y = readFile("covtype.data")
+	X,Y = loadCached("prepared.npz", ["covtype.data"], lambda : readFile("covtype.data"))
 
 	fitModels(True,X,Y)
 
@@ -0,0 +1,109 @@
+import os
+import sys
+import warnings
+
+import numpy as np
+from numpy.lib.recfunctions import structured_to_unstructured
+
+def readCSV(path, delimiter = ",", skipHeader = 0, dtype = np.float64, usecols = None):
+	""" Read a CSV file into a 2D array in a single (vectorized) pass
+
+	Args:
+		path (str): The CSV file
+		delimiter (str, optional): The delimiter of the columns
+		skipHeader (int, optional): The number of header lines to skip
+		dtype (optional): The type of the entries. For str, all spaces are removed from the entries
+		usecols (list, optional): The columns to read (default: all)
+
+	Returns:
+		numpy.ndarray: The entries with shape (rows, columns). Empty lines are skipped
+	"""
+	with warnings.catch_warnings():
+		# Newer numpy versions warn about the empty lines at the end of some raw files
+		warnings.simplefilter("ignore", UserWarning)
+		data = np.loadtxt(path, delimiter = delimiter, skiprows = skipHeader, dtype = dtype, usecols = usecols, ndmin = 2, comments = None)
+	if dtype is str:
+		data = np.char.replace(data, " ", "")
+
+	return data
+
+def readColumns(path, names, delimiter = ","):
+	""" Read the columns with the given names from a CSV file with a header line. Missing entries are NaN
+
+	Returns:
+		numpy.ndarray: The entries (float64) with shape (rows, columns) in the order of the file
+	"""
+	data = np.genfromtxt(path, delimiter = delimiter, usecols = names, names = True)
+	return structured_to_unstructured(data, dtype = np.float64)
+
+def mapValues(column, function, dtype = np.int64):
+	""" Apply the given function to every entry of the column. The function is only called once per
+		distinct value, which is much faster than a python loop over all entries for categorical data
+
+	Returns:
+		numpy.ndarray: The mapped column
+	"""
+	values, inverse = np.unique(column, return_inverse = True)
+	return np.array([function(v) for v in values], dtype = dtype)[inverse.reshape(-1)]
+
+def oneHot(column, categories, size = None, default = None):
+	""" One-hot encode a column of categorical values
+
+	Args:
+		column (numpy.ndarray): The values
+		categories (dict or list): The index of each value. A list maps its i-th entry to i
+		size (int, optional): The number of indices (default: the largest index + 1)
+		default (int, optional): The index of all values which are not in categories. If None, these
+								 values are encoded as all zeros
+
+	Returns:
+		numpy.ndarray: The encoding (int32) with shape (len(column), size)
+	"""
+	if not isinstance(categories, dict):
+		categories = {c : i for i, c in enumerate(categories)}
+
+	if size is None:
+		size = max(list(categories.values()) + ([default] if default is not None else [])) + 1
+
+	codes = mapValues(column, lambda v : categories.get(v, -1 if default is None else default))
+	encoded = np.zeros((len(codes), size), dtype = np.int32)
+	rows = np.nonzero(codes >= 0)[0]
+	encoded[rows, codes[rows]] = 1
+
+	return encoded
+
+def filterFinite(X, *arrays):
+	""" Remove all rows of X (and the corresponding entries of the other arrays) which contain NaN or inf
+
+	Returns:
+		tuple: The filtered X, the filtered arrays and the number of dropped rows
+	"""
+	mask = np.all(np.isfinite(X), axis = 1)
+	return (X[mask],) + tuple([a[mask] for a in arrays]) + (int(len(mask) - np.sum(mask)),)
+
+def loadCached(cacheFile, sourceFiles, prepare):
+	""" Return the arrays computed by prepare(). They are cached in cacheFile (an uncompressed .npz
+		archive of .npy files), which is used as long as it is newer than all sourceFiles, the calling
+		script and this module. Thus, repeated training runs do not parse the raw data again
+
+	Args:
+		cacheFile (str): The cache file (e.g. prepared.npz)
+		sourceFiles (list): The raw data files
+		prepare (function): Reads the raw data and returns a tuple of arrays
+
+	Returns:
+		tuple: The arrays
+	"""
+	sources = sourceFiles + [os.path.abspath(sys.argv[0]), os.path.abspath(__file__)]
+	if os.path.exists(cacheFile) and all([os.path.getmtime(f) <= os.path.getmtime(cacheFile) for f in sources if os.path.exists(f)]):
+		with np.load(cacheFile) as data:
+			return tuple([data["arr_" + str(i)] for i in range(len(data.files))])
+
+	arrays = prepare()
+	# Write to a temporary file first, so that an interrupted run does not leave a broken cache
+	tmpFile = cacheFile + "." + str(os.getpid()) + ".tmp"
+	with open(tmpFile, 'wb') as f:
+		np.savez(f, *arrays)
+	os.replace(tmpFile, cacheFile)
+
+	return arrays
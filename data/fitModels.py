@@ -1,9 +1,10 @@
 import sys
-import csv
 import numpy as np
-import os.path
+import os
 import json
 import timeit
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from multiprocessing import shared_memory
 
 from sklearn.tree import DecisionTreeClassifier
 from sklearn.ensemble import RandomForestClassifier
@@ -17,91 +18,137 @@ sys.path.append('../../code/')
 import Forest
 import Tree
 
+# The models trained by fitModels as (name, class, parameters). n_jobs is set by fitModels
+MODELS = [
+	("DT_1", RandomForestClassifier, {"n_estimators" : 1, "max_depth" : 1}),
+	("DT_5", RandomForestClassifier, {"n_estimators" : 1, "max_depth" : 5}),
+	("DT_10", RandomForestClassifier, {"n_estimators" : 1, "max_depth" : 10}),
+	("DT_15", RandomForestClassifier, {"n_estimators" : 1, "max_depth" : 15}),
+	("DT_20", RandomForestClassifier, {"n_estimators" : 1, "max_depth" : 20}),
+	("ET_1", ExtraTreesClassifier, {"n_estimators" : 25, "max_depth" : 1}),
+	("ET_5", ExtraTreesClassifier, {"n_estimators" : 25, "max_depth" : 5}),
+	("ET_10", ExtraTreesClassifier, {"n_estimators" : 25, "max_depth" : 10}),
+	("ET_15", ExtraTreesClassifier, {"n_estimators" : 25, "max_depth" : 15}),
+	("ET_20", ExtraTreesClassifier, {"n_estimators" : 25, "max_depth" : 20}),
+	("RF_1", RandomForestClassifier, {"n_estimators" : 25, "max_depth" : 1}),
+	("RF_5", RandomForestClassifier, {"n_estimators" : 25, "max_depth" : 5}),
+	("RF_10", RandomForestClassifier, {"n_estimators" : 25, "max_depth" : 10}),
+	("RF_15", RandomForestClassifier, {"n_estimators" : 25, "max_depth" : 15}),
+	("RF_20", RandomForestClassifier, {"n_estimators" : 25, "max_depth" : 20})
+	#("AB_1", AdaBoostClassifier, {"n_estimators" : 50, "base_estimator" : DecisionTreeClassifier(max_depth=1)})
+]
+
 def testModel(roundSplit,XTrain,YTrain,XTest,YTest,model,name):
-	print("Fitting", name)
+	""" Fit the model and store it in text/name.json and text/name.pkl. The model is exported directly
+		from the arrays of sklearn (see Forest.getSKLearnDicts), it is not predicted again in python
+
+	Returns:
+		str: The report of this model
+	"""
+	report = []
+	start = timeit.default_timer()
 	model.fit(XTrain,YTrain)
+	end = timeit.default_timer()
+	report.append("Fitted " + name + " in " + str(end - start) + " s")
 
-	print("Testing ", name)
 	start = timeit.default_timer()
 	YPredicted = model.predict(XTest)
 	end = timeit.default_timer()
 
-	print("Total time: " + str(end - start) + " ms")
-	print("Throughput: " + str(len(XTest) / (float(end - start)*1000)) + " #elem/ms")
+	report.append("Total time: " + str(end - start) + " ms")
+	report.append("Throughput: " + str(len(XTest) / (float(end - start)*1000)) + " #elem/ms")
 
-	print("Saving model")
 	if (issubclass(type(model), DecisionTreeClassifier)):
-		mymodel = Tree.Tree()
+		data = Tree.getSKLearnDict(model, roundSplit)
+		avgDepth = Tree.getSKLearnAvgDepth(model)
 	else:
-		mymodel = Forest.Forest()
-
-	mymodel.fromSKLearn(model,roundSplit)
-
-	if not os.path.exists("text"):
-		os.makedirs("text")
+		data = Forest.getSKLearnDicts(model, roundSplit)
+		avgDepth = sum([Tree.getSKLearnAvgDepth(e) for e in model.estimators_]) / len(model.estimators_)
 
 	with open("text/"+name+".json",'w') as outFile:
-		outFile.write(mymodel.str())
+		outFile.write(json.dumps(data, separators = (",", ":")))
 
-	SKPred = model.predict(XTest)
-	MYPred = mymodel.predict_batch(XTest)
-	accuracy = accuracy_score(YTest, SKPred)
-	print("Accuracy:", accuracy)
+	accuracy = accuracy_score(YTest, YPredicted)
+	report.append("Accuracy: " + str(accuracy))
 
-	# This can now happen because of classical majority vote
-	# for (skpred, mypred) in zip(SKPred,MYPred):
-	# 	if (skpred != mypred):
-	# 		print("Prediction mismatch!!!")
-	# 		print(skpred, " vs ", mypred)
-
-	print("Saving model to PKL on disk")
 	joblib.dump(model, "text/"+name+".pkl")
 
-	print("*** Summary ***")
-	print("#Examples\t #Features\t Accuracy\t Avg.Tree Height")
-	print(str(len(XTest)) + "\t" + str(len(XTest[0])) + "\t" + str(accuracy) + "\t" + str(mymodel.getAvgDepth()))
-	print()
+	report.append("*** Summary ***")
+	report.append("#Examples\t #Features\t Accuracy\t Avg.Tree Height")
+	report.append(str(len(XTest)) + "\t" + str(len(XTest[0])) + "\t" + str(accuracy) + "\t" + str(avgDepth))
+	return "\n".join(report) + "\n"
+
+def shareArray(array):
+	""" Copy the array into a new shared memory block, so that the workers map it instead of receiving a pickled copy
+
+	Returns:
+		tuple: The SharedMemory and its descriptor (name, shape, dtype) for the workers
+	"""
+	array = np.ascontiguousarray(array)
+	shm = shared_memory.SharedMemory(create = True, size = max(1, array.nbytes))
+	np.ndarray(array.shape, dtype = array.dtype, buffer = shm.buf)[...] = array
+	return shm, (shm.name, array.shape, array.dtype.str)
+
+def trainModel(roundSplit, descriptors, model, name):
+	""" Run testModel in a worker on the shared XTrain, YTrain, XTest, YTest """
+	shms = [shared_memory.SharedMemory(name = d[0]) for d in descriptors]
+	try:
+		return testModel(roundSplit, *[np.ndarray(d[1], dtype = np.dtype(d[2]), buffer = s.buf) for d, s in zip(descriptors, shms)], model, name)
+	finally:
+		for s in shms:
+			s.close()
+
+def writeTestCSV(fileName, X, Y):
+	""" Write the test data as label,features per line. Floats are written with enough digits to read them back exactly """
+	X = np.asarray(X)
+	if np.issubdtype(X.dtype, np.integer):
+		fmt = "%d"
+	elif X.dtype == np.float32:
+		fmt = "%.9g"
+	else:
+		fmt = "%.17g"
+
+	np.savetxt(fileName, np.column_stack([np.asarray(Y), X]), fmt = ["%d"] + [fmt] * X.shape[1], delimiter = ",")
+
+def fitModels(roundSplit,XTrain,YTrain,XTest = None,YTest = None,createTest = False,cores = None):
+	""" Train and export all MODELS. The models are trained concurrently by a pool of processes, which
+		share the training and test data via shared memory. Each of the workers gets cores / workers
+		cores (n_jobs), so that at most the given number of cores is used at any time
 
-def fitModels(roundSplit,XTrain,YTrain,XTest = None,YTest = None,createTest = False):
+	Args:
+		cores (int, optional): The core budget (default: the environment variable FIT_CORES or all cores)
+	"""
 	if XTest is None or YTest is None:
 		XTrain,XTest,YTrain,YTest = train_test_split(XTrain, YTrain, test_size=0.25)
 		createTest = True
 
 	if createTest:
-		with open("test.csv", 'w') as outFile:
-			for x,y in zip(XTest, YTest):
-				line = str(y)
-				for xi in x:
-					line += "," + str(xi)
-
-				outFile.write(line + "\n")
-
-	# testModel(XTrain,YTrain,XTest,YTest,DecisionTreeClassifier(max_depth=1),"DT_1")
-	# testModel(XTrain,YTrain,XTest,YTest,DecisionTreeClassifier(max_depth=5),"DT_5")
-	# testModel(XTrain,YTrain,XTest,YTest,DecisionTreeClassifier(max_depth=15),"DT_15")
-	# testModel(XTrain,YTrain,XTest,YTest,DecisionTreeClassifier(max_depth=None),"DT_unlimited")
-
-	testModel(roundSplit,XTrain,YTrain,XTest,YTest,RandomForestClassifier(n_estimators=1,n_jobs=8,max_depth=1),"DT_1")
-	testModel(roundSplit,XTrain,YTrain,XTest,YTest,RandomForestClassifier(n_estimators=1,n_jobs=8,max_depth=5),"DT_5")
-	testModel(roundSplit,XTrain,YTrain,XTest,YTest,RandomForestClassifier(n_estimators=1,n_jobs=8,max_depth=10),"DT_10")
-	testModel(roundSplit,XTrain,YTrain,XTest,YTest,RandomForestClassifier(n_estimators=1,n_jobs=8,max_depth=15),"DT_15")
-	testModel(roundSplit,XTrain,YTrain,XTest,YTest,RandomForestClassifier(n_estimators=1,n_jobs=8,max_depth=20),"DT_20")
-	#testModel(XTrain,YTrain,XTest,YTest,RandomForestClassifier(n_estimators=1,n_jobs=4,max_depth=None),"DT_unlimited")
-
-	testModel(roundSplit,XTrain,YTrain,XTest,YTest,ExtraTreesClassifier(n_estimators=25,n_jobs=8,max_depth=1),"ET_1")
-	testModel(roundSplit,XTrain,YTrain,XTest,YTest,ExtraTreesClassifier(n_estimators=25,n_jobs=8,max_depth=5),"ET_5")
-	testModel(roundSplit,XTrain,YTrain,XTest,YTest,ExtraTreesClassifier(n_estimators=25,n_jobs=8,max_depth=10),"ET_10")
-	testModel(roundSplit,XTrain,YTrain,XTest,YTest,ExtraTreesClassifier(n_estimators=25,n_jobs=8,max_depth=15),"ET_15")
-	testModel(roundSplit,XTrain,YTrain,XTest,YTest,ExtraTreesClassifier(n_estimators=25,n_jobs=8,max_depth=20),"ET_20")
-	#testModel(XTrain,YTrain,XTest,YTest,ExtraTreesClassifier(n_estimators=25,n_jobs=4,max_depth=None),"ET_unlimited")
-
-	testModel(roundSplit,XTrain,YTrain,XTest,YTest,RandomForestClassifier(n_estimators=25,n_jobs=8,max_depth=1),"RF_1")
-	testModel(roundSplit,XTrain,YTrain,XTest,YTest,RandomForestClassifier(n_estimators=25,n_jobs=8,max_depth=5),"RF_5")
-	testModel(roundSplit,XTrain,YTrain,XTest,YTest,RandomForestClassifier(n_estimators=25,n_jobs=8,max_depth=10),"RF_10")
-	testModel(roundSplit,XTrain,YTrain,XTest,YTest,RandomForestClassifier(n_estimators=25,n_jobs=8,max_depth=15),"RF_15")
-	testModel(roundSplit,XTrain,YTrain,XTest,YTest,RandomForestClassifier(n_estimators=25,n_jobs=8,max_depth=20),"RF_20")
-	#testModel(XTrain,YTrain,XTest,YTest,RandomForestClassifier(n_estimators=25,n_jobs=4,max_depth=None),"RF_unlimited")
-
-	#testModel(XTrain,YTrain,XTest,YTest,AdaBoostClassifier(n_estimators=50,base_estimator=DecisionTreeClassifier(max_depth=1)),"AB_1")
-	#testModel(XTrain,YTrain,XTest,YTest,AdaBoostClassifier(n_estimators=50,base_estimator=DecisionTreeClassifier(max_depth=3)),"AB_3")
-	#testModel(XTrain,YTrain,XTest,YTest,AdaBoostClassifier(n_estimators=50,base_estimator=DecisionTreeClassifier(max_depth=5)),"AB_5")
+		writeTestCSV("test.csv", XTest, YTest)
+
+	if not os.path.exists("text"):
+		os.makedirs("text")
+
+	if cores is None:
+		cores = int(os.environ.get("FIT_CORES", os.cpu_count()))
+	workers = max(1, min(cores, len(MODELS)))
+	jobs = max(1, cores // workers)
+
+	# The most expensive models first, so that the small ones fill the gaps at the end
+	models = sorted(MODELS, key = lambda m : -m[2]["n_estimators"] * m[2]["max_depth"])
+	models = [(name, modelClass(n_jobs = jobs, **parameters)) for name, modelClass, parameters in models]
+
+	if workers == 1:
+		for name, model in models:
+			print(testModel(roundSplit,XTrain,YTrain,XTest,YTest,model,name))
+		return
+
+	shared = [shareArray(a) for a in [XTrain, YTrain, XTest, YTest]]
+	try:
+		with ProcessPoolExecutor(max_workers = workers) as pool:
+			tasks = [pool.submit(trainModel, roundSplit, [d for _, d in shared], model, name) for name, model in models]
+			for task in as_completed(tasks):
+				print(task.result())
+	finally:
+		for shm, _ in shared:
+			shm.close()
+			shm.unlink()
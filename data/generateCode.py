@@ -1,13 +1,12 @@
 #!/usr/bin/env python3
 
 import csv,operator,sys
+import re
 import numpy as np
 import os.path
 import pickle
 import sklearn
 import json
-import gc
-#import objgraph
 
 from sklearn.tree import DecisionTreeClassifier
 from sklearn.ensemble import RandomForestClassifier
@@ -26,10 +25,30 @@ sys.setrecursionlimit(20000)
 sys.path.append('../code/')
 
 import Forest
+import Profiler
 from ForestConverter import *
 from NativeTreeConverter import *
 from IfTreeConverter import *
 from MixConverter import *
+from LUTTreeConverter import *
+from CostModel import CostModel
+from HostProfile import HostProfile, getLocalProfile
+
+# Identifies the binary test data (see writeTestData), "FCTB" in little endian byte order
+TEST_DATA_MAGIC = 0x42544346
+
+# The compiler of each target architecture
+COMPILERS = {
+	"intel" : "g++",
+	"ppc" : "powerpc-fsl-linux-g++ -m32 -mhard-float -mcpu=e6500 --sysroot=/opt/fsl-qoriq/2.0/sysroots/ppce6500-fsl-linux --static",
+	"arm" : "arm-linux-gnueabihf-g++"
+}
+
+# The default compiler flags of the generated Makefile
+FLAGS = "-std=c++11 -Wall -O3 -funroll-loops -ftree-vectorize"
+
+# The compiler flags built by --sweep (separated by ;)
+SWEEP_FLAGS = "-std=c++11 -O2;-std=c++11 -O3;-std=c++11 -O3 -funroll-loops -ftree-vectorize;-std=c++11 -Os"
 
 # A template to test the generated code
 testCodeTemplate = """#include <iostream>
@@ -40,12 +59,63 @@ testCodeTemplate = """#include <iostream>
 #include <cassert>
 #include <tuple>
 #include <chrono>
+#include <string>
+#include <fcntl.h>
+#include <sys/mman.h>
+#include <sys/stat.h>
+#include <unistd.h>
 
 {headers}
 
-void readCSV({feature_t} * XTest, unsigned int * YTest) {
+// The binary test data written by generateCode.py: This header is followed by the labels (unsigned int)
+// and, starting at featureOffset, the features ({feature_t}). Both are stored in the byte order of the target
+struct TestDataHeader {
+	unsigned int magic;
+	unsigned int version;
+	unsigned int n;
+	unsigned int dim;
+	unsigned int featureSize;
+	unsigned int featureOffset;
+	unsigned int reserved[2];
+};
+
+bool mapTestData(char const * fileName, {feature_t} const ** XTest, unsigned int const ** YTest) {
+	int fd = open(fileName, O_RDONLY);
+	if (fd < 0) {
+		std :: cerr << "Could not open " << fileName << std :: endl;
+		return false;
+	}
+
+	struct stat st;
+	if (fstat(fd, &st) != 0 || (size_t) st.st_size < sizeof(TestDataHeader)) {
+		std :: cerr << "Could not read " << fileName << std :: endl;
+		close(fd);
+		return false;
+	}
+
+	void * data = mmap(NULL, st.st_size, PROT_READ, MAP_PRIVATE | MAP_POPULATE, fd, 0);
+	close(fd);
+	if (data == MAP_FAILED) {
+		std :: cerr << "Could not map " << fileName << std :: endl;
+		return false;
+	}
+
+	TestDataHeader const * header = (TestDataHeader const *) data;
+	if (header->magic != {magic} || header->version != 1 || header->featureSize != sizeof({feature_t}) || header->dim != {DIM} || header->n < {N}
+		|| header->featureOffset + (size_t) header->n * header->dim * header->featureSize > (size_t) st.st_size) {
+		std :: cerr << fileName << " does not match this classifier (or the byte order of the target)" << std :: endl;
+		munmap(data, st.st_size);
+		return false;
+	}
+
+	*YTest = (unsigned int const *) ((char const *) data + sizeof(TestDataHeader));
+	*XTest = ({feature_t} const *) ((char const *) data + header->featureOffset);
+	return true;
+}
+
+void readCSV(char const * fileName, {feature_t} * XTest, unsigned int * YTest) {
 	std::string line;
-	std::ifstream file("{test_file}");
+	std::ifstream file(fileName);
 	unsigned int xCnt = 0;
 	unsigned int yCnt = 0;
 	unsigned int lineCnt = 0;
@@ -69,7 +139,7 @@ void readCSV({feature_t} * XTest, unsigned int * YTest) {
 					}
 				}
 				lineCnt++;
-				if( lineCnt > {N} ) {
+				if( lineCnt >= {N} ) {
 					break;
 				}
 			}
@@ -88,13 +158,29 @@ int main(int argc, char const *argv[]) {
 	//std :: cout << "Loading testing data..." << std :: endl;
 
 
-	{allocMemory}
-	readCSV(XTest,YTest);
+	// Another data file (e.g. samples for profile-guided optimization) can be given as first argument.
+	// Binary test data is mapped into memory, CSV files are parsed
+	std::string fileName = argc > 1 ? argv[1] : "{test_file}";
+	{feature_t} const * XTest;
+	unsigned int const * YTest;
+	{feature_t} * XBuffer = nullptr;
+	unsigned int * YBuffer = nullptr;
+
+	if (fileName.size() >= 4 && fileName.compare(fileName.size() - 4, 4, ".csv") == 0) {
+		XBuffer = new {feature_t}[{DIM}*{N}]();
+		YBuffer = new unsigned int[{N}]();
+		readCSV(fileName.c_str(), XBuffer, YBuffer);
+		XTest = XBuffer;
+		YTest = YBuffer;
+	} else if (!mapTestData(fileName.c_str(), &XTest, &YTest)) {
+		return 1;
+	}
 
 	{measurmentCode}
-	{freeMemory}
+	delete[] XBuffer;
+	delete[] YBuffer;
 
-	return 1;
+	return 0;
 }
 """
 
@@ -163,8 +249,272 @@ measurmentCodeTemplate = """
 
 	//std :: cout << "Runtime per element (ns): " << avg << " ( " << var / (cnt - 1) << " )" <<std :: endl;
 	std :: cout << avg << "," << var / (cnt - 1) << "," << min << "," << max << std :: endl;
+	// The accuracy is written to stderr, so that the output of run.sh is not changed (see autotune.py)
+	std :: cerr << "accuracy," << accuracies.back() << std :: endl;
 """
 
+# Helper functions of the benchmark harness (see benchCodeTemplate)
+benchHelperTemplate = """#include <vector>
+#include <algorithm>
+#include <cstring>
+#include <ctime>
+#include <linux/perf_event.h>
+#include <sys/ioctl.h>
+#include <sys/syscall.h>
+#include <unistd.h>
+
+// The size of the buffer which is written between two samples in cold mode to evict the caches
+#ifndef FLUSH_SIZE
+#define FLUSH_SIZE (32*1024*1024)
+#endif
+
+// The size of a cache line, one byte per line of the buffer is written
+#ifndef LINE_SIZE
+#define LINE_SIZE 64
+#endif
+
+// The number of samples measured in cold mode
+#ifndef COLD_SAMPLES
+#define COLD_SAMPLES 1000
+#endif
+
+#define CACHE_READ_MISS(cache) ((cache) | (PERF_COUNT_HW_CACHE_OP_READ << 8) | (PERF_COUNT_HW_CACHE_RESULT_MISS << 16))
+
+struct Counter {
+	char const * name;
+	unsigned int type;
+	unsigned long long config;
+	int fd;
+};
+
+// Counters which cannot be opened (e.g. due to /proc/sys/kernel/perf_event_paranoid or inside
+// virtual machines) are reported as null
+Counter counters[] = {
+	{"instructions", PERF_TYPE_HARDWARE, PERF_COUNT_HW_INSTRUCTIONS, -1},
+	{"branch_misses", PERF_TYPE_HARDWARE, PERF_COUNT_HW_BRANCH_MISSES, -1},
+	{"l1i_misses", PERF_TYPE_HW_CACHE, CACHE_READ_MISS(PERF_COUNT_HW_CACHE_L1I), -1},
+	{"l1d_misses", PERF_TYPE_HW_CACHE, CACHE_READ_MISS(PERF_COUNT_HW_CACHE_L1D), -1},
+	{"llc_misses", PERF_TYPE_HW_CACHE, CACHE_READ_MISS(PERF_COUNT_HW_CACHE_LL), -1}
+};
+const unsigned int numCounters = sizeof(counters) / sizeof(Counter);
+
+void openCounters() {
+	for (unsigned int i = 0; i < numCounters; ++i) {
+		struct perf_event_attr attr;
+		memset(&attr, 0, sizeof(attr));
+		attr.size = sizeof(attr);
+		attr.type = counters[i].type;
+		attr.config = counters[i].config;
+		attr.disabled = 1;
+		attr.exclude_kernel = 1;
+		attr.exclude_hv = 1;
+		counters[i].fd = syscall(__NR_perf_event_open, &attr, 0, -1, -1, 0);
+	}
+}
+
+void controlCounters(unsigned long request) {
+	for (unsigned int i = 0; i < numCounters; ++i) {
+		if (counters[i].fd >= 0) {
+			ioctl(counters[i].fd, request, 0);
+		}
+	}
+}
+
+long long readCounter(unsigned int i) {
+	long long value;
+	if (counters[i].fd < 0 || read(counters[i].fd, &value, sizeof(value)) != sizeof(value)) {
+		return -1;
+	}
+	return value;
+}
+
+inline long long now() {
+	struct timespec t;
+	clock_gettime(CLOCK_MONOTONIC, &t);
+	return t.tv_sec * 1000000000LL + t.tv_nsec;
+}
+
+volatile unsigned int sink;
+
+void flushCaches(std::vector<unsigned char> & buffer) {
+	// Writing a buffer as large as the last level cache evicts (almost all of) the code and the data of the model
+	for (size_t i = 0; i < buffer.size(); i += LINE_SIZE) {
+		buffer[i]++;
+	}
+	sink = buffer[buffer.size() / 2];
+}
+
+long long getTimerOverhead() {
+	std::vector<long long> overheads;
+	for (unsigned int i = 0; i < 1000; ++i) {
+		long long start = now();
+		long long end = now();
+		overheads.push_back(end - start);
+	}
+	std::sort(overheads.begin(), overheads.end());
+	return overheads[overheads.size() / 2];
+}
+
+double getPercentile(std::vector<long long> const & sorted, double q) {
+	size_t i = (size_t) std::ceil(q * sorted.size());
+	return (double) sorted[i > 0 ? i - 1 : 0];
+}
+
+void runMode(char const * mode, {feature_t} const * XTest, unsigned int const * YTest, std::vector<unsigned int> const & order, bool cold, long long overhead, bool last) {
+	std::vector<unsigned char> buffer(cold ? FLUSH_SIZE : 0);
+	std::vector<long long> latencies;
+	latencies.reserve(order.size());
+	unsigned int acc = 0;
+
+	for (auto j : order) {
+		if (cold) {
+			flushCaches(buffer);
+		}
+		long long start = now();
+		asm volatile("" : : : "memory");
+		unsigned int pred = {namespace}_predict(&XTest[{DIM}*j]);
+		asm volatile("" : : "r"(pred) : "memory");
+		long long end = now();
+		acc += (pred == YTest[j]);
+		latencies.push_back(std::max(0LL, end - start - overhead));
+	}
+
+	// The counters are read in a second pass, so that the timer does not show up in the counters.
+	// In cold mode they are only enabled around each prediction to exclude flushing the caches
+	controlCounters(PERF_EVENT_IOC_RESET);
+	if (!cold) {
+		controlCounters(PERF_EVENT_IOC_ENABLE);
+	}
+	for (auto j : order) {
+		if (cold) {
+			flushCaches(buffer);
+			controlCounters(PERF_EVENT_IOC_ENABLE);
+		}
+		sink += {namespace}_predict(&XTest[{DIM}*j]);
+		if (cold) {
+			controlCounters(PERF_EVENT_IOC_DISABLE);
+		}
+	}
+	if (!cold) {
+		controlCounters(PERF_EVENT_IOC_DISABLE);
+	}
+
+	std::sort(latencies.begin(), latencies.end());
+	double mean = 0;
+	for (auto l : latencies) {
+		mean += l;
+	}
+	mean /= latencies.size();
+
+	std::cout << "\\t\\t\\"" << mode << "\\" : {" << std::endl;
+	std::cout << "\\t\\t\\t\\"samples\\" : " << order.size() << "," << std::endl;
+	std::cout << "\\t\\t\\t\\"accuracy\\" : " << (double) acc / order.size() << "," << std::endl;
+	std::cout << "\\t\\t\\t\\"mean\\" : " << mean << "," << std::endl;
+	std::cout << "\\t\\t\\t\\"p50\\" : " << getPercentile(latencies, 0.5) << "," << std::endl;
+	std::cout << "\\t\\t\\t\\"p90\\" : " << getPercentile(latencies, 0.9) << "," << std::endl;
+	std::cout << "\\t\\t\\t\\"p99\\" : " << getPercentile(latencies, 0.99) << "," << std::endl;
+	std::cout << "\\t\\t\\t\\"p999\\" : " << getPercentile(latencies, 0.999) << "," << std::endl;
+	std::cout << "\\t\\t\\t\\"max\\" : " << latencies.back();
+	for (unsigned int i = 0; i < numCounters; ++i) {
+		long long value = readCounter(i);
+		std::cout << "," << std::endl << "\\t\\t\\t\\"" << counters[i].name << "\\" : ";
+		if (value < 0) {
+			std::cout << "null";
+		} else {
+			std::cout << (double) value / order.size();
+		}
+	}
+	std::cout << std::endl << "\\t\\t}" << (last ? "" : ",") << std::endl;
+}
+"""
+
+# A template to benchmark the latency distribution of the generated code. Latencies are given in ns per
+# sample, hardware counters per sample. The result is written as JSON to stdout
+benchCodeTemplate = """
+	openCounters();
+	long long overhead = getTimerOverhead();
+
+	// Warm: All samples in order, after a burn-in phase
+	std::vector<unsigned int> order;
+	for (unsigned int j = 0; j < {N}; ++j) {
+		sink += {namespace}_predict(&XTest[{DIM}*j]);
+	}
+	for (unsigned int i = 0; i < {num_repetitions}; ++i) {
+		for (unsigned int j = 0; j < {N}; ++j) {
+			order.push_back(j);
+		}
+	}
+
+	std::cout << "{" << std::endl;
+	std::cout << "\\t\\"namespace\\" : \\"{namespace}\\"," << std::endl;
+	std::cout << "\\t\\"timer_overhead\\" : " << overhead << "," << std::endl;
+	std::cout << "\\t\\"modes\\" : {" << std::endl;
+	runMode("warm", XTest, YTest, order, false, overhead, false);
+
+	// Shuffled: Each repetition visits the samples in another random order
+	std::mt19937 rng(42);
+	for (unsigned int i = 0; i < {num_repetitions}; ++i) {
+		std::shuffle(order.begin() + i*{N}, order.begin() + (i+1)*{N}, rng);
+	}
+	runMode("shuffled", XTest, YTest, order, false, overhead, false);
+
+	// Cold: The caches are flushed before every sample
+	order.clear();
+	for (unsigned int j = 0; j < {N} && j < COLD_SAMPLES; ++j) {
+		order.push_back(j);
+	}
+	runMode("cold", XTest, YTest, order, true, overhead, true);
+
+	std::cout << "\\t}" << std::endl;
+	std::cout << "}" << std::endl;
+"""
+
+def getNumpyType(featureType):
+	""" Returns the numpy data type corresponding to the given C++ feature type """
+	types = {
+		"float" : np.float32,
+		"double" : np.float64,
+		"char" : np.int8,
+		"signed char" : np.int8,
+		"unsigned char" : np.uint8,
+		"short" : np.int16,
+		"unsigned short" : np.uint16,
+		"int" : np.int32,
+		"unsigned int" : np.uint32
+	}
+	return types[featureType.strip()]
+
+def writeTestData(fileName, X, Y, featureType, target):
+	""" Write the test data as binary file, which is mapped into memory by the test programs (see mapTestData
+		in testCodeTemplate). The file consists of a header with 8 unsigned ints (magic, version, n, dim, size of
+		a feature, offset of the features), the labels as unsigned int and the features as featureType, all in
+		the byte order of the target
+
+	Args:
+		fileName (str): The file to write
+		X (numpy.ndarray): The features
+		Y (numpy.ndarray): The labels
+		featureType (str): The C++ type of the features (see getFeatureType)
+		target (str): The target architecture (arm, intel or ppc)
+	"""
+	byteOrder = ">" if target == "ppc" else "<"
+	labelType = np.dtype(np.uint32).newbyteorder(byteOrder)
+	featureType = np.dtype(getNumpyType(featureType)).newbyteorder(byteOrder)
+
+	n, dim = X.shape
+	headerSize = 8 * labelType.itemsize
+	# The features start at a multiple of 8 bytes, so that they are aligned for all types
+	featureOffset = (headerSize + n * labelType.itemsize + 7) // 8 * 8
+
+	header = np.array([TEST_DATA_MAGIC, 1, n, dim, featureType.itemsize, featureOffset, 0, 0], dtype = labelType)
+	tmpFile = fileName + "." + str(os.getpid()) + ".tmp"
+	with open(tmpFile, 'wb') as outFile:
+		outFile.write(header.tobytes())
+		outFile.write(Y.astype(labelType).tobytes())
+		outFile.write(bytes(featureOffset - headerSize - n * labelType.itemsize))
+		outFile.write(X.astype(featureType).tobytes())
+	os.replace(tmpFile, fileName)
+
 def writeFiles(basepath, basename, header, cpp):
 	if header is not None:
 		with open(basepath + basename + ".h",'w') as code_file:
@@ -175,76 +525,259 @@ def writeFiles(basepath, basename, header, cpp):
 			code_file.write(cpp)
 
 def writeTestFiles(outPath, namespace, header, dim, N, featureType, testFile, targetAcc, reps):
-	allocMemory = "{feature_t} * XTest = new {feature_t}[{DIM}*{N}];\n \tunsigned int * YTest = new unsigned int[{N}];"
-	freeMemory = "delete[] XTest;\n \tdelete[] YTest;"
-
 	measurmentCode = measurmentCodeTemplate.replace("{namespace}", namespace).replace("{target_acc}", str(targetAcc)).replace("{num_repetitions}", str(reps))
 
 	testCode = testCodeTemplate.replace("{headers}", "#include \"" + header + "\"") \
-							   .replace("{allocMemory}", allocMemory) \
-							   .replace("{freeMemory}", freeMemory) \
 							   .replace("{measurmentCode}",measurmentCode) \
 							   .replace("{feature_t}", str(featureType)) \
 							   .replace("{N}", str(N)) \
 							   .replace("{DIM}", str(dim)) \
-							   .replace("{test_file}", testFile)
+							   .replace("{test_file}", testFile) \
+							   .replace("{magic}", str(TEST_DATA_MAGIC))
 
 	with open(outPath + namespace + ".cpp",'w') as code_file:
 		code_file.write(testCode)
 
-def generateClassifier(outPath, targetAcc, DIM, N,converter, namespace, featureType, forest, testFile, reps):
-	#print("GETTING THE CODE")
-	headerCode, cppCode = converter.getCode(forest)
-	cppCode = "#include \"" + namespace + ".h\"\n" + cppCode
-	writeFiles(outPath, namespace, headerCode, cppCode)
-	writeTestFiles(outPath+"test", namespace, namespace + ".h", DIM, N, featureType, testFile, targetAcc, reps)
+def writeBenchFiles(outPath, namespace, header, dim, N, featureType, testFile, reps):
+	headers = "#include \"" + header + "\"\n" + benchHelperTemplate.replace("{namespace}", namespace)
+	benchCode = benchCodeTemplate.replace("{namespace}", namespace).replace("{num_repetitions}", str(reps))
+
+	testCode = testCodeTemplate.replace("{headers}", headers) \
+							   .replace("{measurmentCode}", benchCode) \
+							   .replace("{feature_t}", str(featureType)) \
+							   .replace("{N}", str(N)) \
+							   .replace("{DIM}", str(dim)) \
+							   .replace("{test_file}", testFile) \
+							   .replace("{magic}", str(TEST_DATA_MAGIC))
+
+	with open(outPath + namespace + ".cpp",'w') as code_file:
+		code_file.write(testCode)
+
+def generateClassifier(outPath, targetAcc, DIM, N,converter, namespace, featureType, forest, testFile, reps, split = False, byteOrder = None):
+	""" Generate the code of the given forest and its test program. The phases are recorded in the scope
+		of the namespace by the active profiler (if any)
+
+	Args:
+		split (bool, optional): If True, every tree is written into its own translation unit {namespace}_tree{i}.cpp,
+								so that the trees can be compiled in parallel. Otherwise all trees are part of {namespace}.cpp
+		byteOrder (str, optional): If given (< or >), the node tables of the native converters are written in this byte order
+								   into binary files {namespace}_{table}.bin, which are embedded via .incbin (see getBinaryTables)
+
+	Returns:
+		list: The names of all translation units (without .cpp) of the classifier. The test program is written to
+			  test{namespace}.cpp and the benchmark harness to bench{namespace}.cpp
+	"""
+	with Profiler.inScope(namespace):
+		units = [namespace]
+		if split:
+			with Profiler.phase("emission"):
+				headerCode, cppCode, treeCodes = converter.getCodeUnits(forest)
+				headerCode = stripInline(headerCode, namespace)
+				treeCodes = [stripInline(tCode, namespace) for tCode in treeCodes]
+		else:
+			treeCodes = []
+			with Profiler.phase("emission"):
+				headerCode, cppCode = converter.getCode(forest)
+
+		tables = {}
+		if byteOrder is not None:
+			with Profiler.phase("emission"):
+				cppCode, tables = getBinaryTables(cppCode, headerCode, namespace, byteOrder)
+				for i, tCode in enumerate(treeCodes):
+					treeCodes[i], treeTables = getBinaryTables(tCode, headerCode, namespace, byteOrder)
+					tables.update(treeTables)
+			Profiler.count("table bytes", sum([len(t) for t in tables.values()]))
+
+		cppCode = "#include \"" + namespace + ".h\"\n" + cppCode
+		Profiler.count("code bytes", len(headerCode) + len(cppCode) + sum([len(tCode) for tCode in treeCodes]))
+
+		with Profiler.phase("write"):
+			for i, tCode in enumerate(treeCodes):
+				unit = namespace + "_tree" + str(i)
+				writeFiles(outPath, unit, None, "#include \"" + namespace + ".h\"\n" + tCode)
+				units.append(unit)
+
+			for fileName, table in tables.items():
+				with open(outPath + fileName, 'wb') as outFile:
+					outFile.write(table)
+
+			writeFiles(outPath, namespace, headerCode, cppCode)
+			writeTestFiles(outPath+"test", namespace, namespace + ".h", DIM, N, featureType, testFile, targetAcc, reps)
+			writeBenchFiles(outPath+"bench", namespace, namespace + ".h", DIM, N, featureType, testFile, reps)
+
+	return units
+
+def getFlagsSuffix(flags):
+	""" Returns a suffix for the name of a binary compiled with the given flags, e.g. _O3_march_native for -O3 -march=native """
+	return "_" + re.sub(r"[^A-Za-z0-9]+", "_", flags.replace("-std=c++11", "")).strip("_")
+
+def getMakeTargets(namespace, units, sweepFlags = [], pgo = False):
+	""" Returns the Makefile rules which link the test program of the given namespace from the object files
+		of its translation units. Every object file is rebuilt if the header of the namespace changes.
+		Additionally, a test program is built for every entry of sweepFlags (test{namespace}_O2 for -O2 etc.).
+		If pgo is True, each of these programs is also built with profile-guided optimization (test{namespace}_pgo):
+		The instrumented program is run once on $(PGO_DATA) and then rebuilt with the recorded profile
+
+	Args:
+		namespace (str): The namespace of the generated code
+		units (list): The translation units as returned by generateClassifier
+		sweepFlags (list, optional): Further compiler flags to build the test program with
+		pgo (bool, optional): If True, the profile-guided test programs are built, too
+
+	Returns:
+		Tuple: A tuple (rules, targets) with the Makefile rules (=string) and the names of all test programs
+	"""
+	rules = namespace + "_OBJECTS = " + " ".join([u + ".o" for u in units]) + "\n"
+	rules += "test" + namespace + ": $(" + namespace + "_OBJECTS) test" + namespace + ".o\n"
+	rules += "\t$(COMPILER) $(FLAGS) $(LTO) $^ -o $@\n"
+	rules += "$(" + namespace + "_OBJECTS) test" + namespace + ".o: " + namespace + ".h\n"
+	targets = ["test" + namespace]
+
+	# The benchmark harness is only built by make bench
+	rules += "bench" + namespace + ": $(" + namespace + "_OBJECTS) bench" + namespace + ".o\n"
+	rules += "\t$(COMPILER) $(FLAGS) $(LTO) $^ -o $@\n"
+	rules += "bench" + namespace + ".o: bench" + namespace + ".cpp " + namespace + ".h\n"
+	rules += "\t$(COMPILER) $(FLAGS) $(LTO) -DFLUSH_SIZE=$(FLUSH_SIZE) -DLINE_SIZE=$(LINE_SIZE) -DCOLD_SAMPLES=$(COLD_SAMPLES) -c $< -o $@\n"
+	rules += "BENCHES += bench" + namespace + "\n\n"
+
+	# The variants are compiled directly from the sources, because their object files differ
+	sources = " ".join([u + ".cpp" for u in units + ["test" + namespace]])
+	configs = [(getFlagsSuffix(flags), flags) for flags in sweepFlags]
+	for suffix, flags in configs:
+		target = "test" + namespace + suffix
+		rules += target + ": " + sources + " " + namespace + ".h\n"
+		rules += "\t$(COMPILER) " + flags + " " + sources + " -o $@\n\n"
+		targets.append(target)
+
+	if pgo:
+		for suffix, flags in [("", "$(FLAGS) $(LTO)")] + configs:
+			target = "test" + namespace + suffix + "_pgo"
+			rules += target + ": " + sources + " " + namespace + ".h\n"
+			rules += "\trm -rf $@.profile\n"
+			rules += "\t$(COMPILER) " + flags + " $(PGO_FLAGS) -fprofile-generate=$@.profile " + sources + " -o $@\n"
+			rules += "\t./$@ $(PGO_DATA) > /dev/null\n"
+			rules += "\t$(COMPILER) " + flags + " $(PGO_FLAGS) -fprofile-use=$@.profile -fprofile-correction " + sources + " -o $@\n\n"
+			targets.append(target)
+
+	return rules, targets
 
 def getFeatureType(X):
-	containsFloat = False
-	for x in X:
-		for xi in x:
-			if isinstance(xi, np.float32):
-				containsFloat = True
-				break
-
-	if containsFloat:
-		dataType = "float"
+	""" Returns the narrowest C++ type which can represent all features of X
+
+	Args:
+		X (numpy.ndarray): The features, either of a floating point type (see loadTestData) or of an integer type
+
+	Returns:
+		str: float for floating point features, otherwise the narrowest signed / unsigned integer type
+	"""
+	X = np.asarray(X)
+	if np.issubdtype(X.dtype, np.floating):
+		return "float"
+
+	lower = X.min() if X.size > 0 else 0
+	upper = X.max() if X.size > 0 else 0
+	if lower >= 0:
+		types = [(np.uint8, "unsigned char"), (np.uint16, "unsigned short"), (np.uint32, "unsigned int")]
 	else:
-		lower = np.min(X)
-		upper = np.max(X)
-		bitUsed = 0
-		if lower > 0:
-			prefix = "unsigned"
-			maxVal = upper
-		else:
-			prefix = ""
-			bitUser = 1
-			maxVal = max(-lower, upper)
+		# The signedness of char depends on the platform (e.g. unsigned on arm)
+		types = [(np.int8, "signed char"), (np.int16, "short"), (np.int32, "int")]
 
-		bit = int(np.log2(maxVal) + 1 if maxVal != 0 else 1)
+	for numpyType, dataType in types:
+		if np.iinfo(numpyType).min <= lower and upper <= np.iinfo(numpyType).max:
+			return dataType
 
-		if bit <= (8-bitUsed):
-			dataType = prefix + " char"
-		elif bit <= (16-bitUsed):
-			dataType = prefix + " short"
-		else:
-			dataType = prefix + " int"
+	return types[-1][1]
 
-	return dataType
+def loadTestData(csvFile):
+	""" Load the test data (label in the first column, followed by the features). The parsed array is cached
+		as .npy file next to the CSV file, so that later runs do not parse the CSV file again
 
-def debug_gc():
-	gc.collect()
-	# objects = gc.get_objects()
-	# objects_id = {}
-	# for o in objects:
-	# 	objects_id[id(o)] = True
+	Args:
+		csvFile (str): The CSV file
 
-	# verbose = 2
+	Returns:
+		Tuple: A tuple (X, Y), where X has type np.int32 if all features are integers and np.float32 otherwise
+	"""
+	npyFile = os.path.splitext(csvFile)[0] + ".npy"
+	if os.path.exists(npyFile) and os.path.getmtime(npyFile) >= os.path.getmtime(csvFile):
+		data = np.load(npyFile)
+	else:
+		data = np.loadtxt(csvFile, delimiter = ",", ndmin = 2)
+		# Write to a temporary file first, so that concurrent runs (see pipeline.py) never read a partial cache
+		tmpFile = npyFile + "." + str(os.getpid()) + ".tmp"
+		with open(tmpFile, 'wb') as outFile:
+			np.save(outFile, data)
+		os.replace(tmpFile, npyFile)
+
+	X = data[:,1:]
+	Y = data[:,0]
+	if np.array_equal(X, np.trunc(X)):
+		X = X.astype(dtype=np.int32)
+	else:
+		X = X.astype(dtype=np.float32)
 
-	# for o in gc.get_objects():
-	# 	print(o)
+	return X, Y
+
+def getOption(options, name, default = None):
+	""" Returns the value of an optional flag given as --name=value (or True if only --name is given) """
+	for o in options:
+		if o == "--" + name:
+			return True
+		elif o.startswith("--" + name + "="):
+			return o.split("=", 1)[1]
+
+	return default
 
 def main(argv):
+	# Optional flags are given as --name or --name=value after the positional arguments, e.g.
+	#	--collapse		collapse same-class subtrees before generating the code
+	#	--collapse=0.05	collapse subtrees whose leaf probabilities differ by at most 0.05 (soft voting)
+	#	--costmodel=costmodel_intel.json	use a calibrated code size model (see calibrateCostModel.py) for the kernel budgets
+	#	--hostprofile=arm.json	derive budgets and set sizes from the caches given in this file (see HostProfile.py) instead of the local machine
+	#	--amalgamate	generate all trees of a forest into a single translation unit, so that the compiler can inline them into {namespace}_predict
+	#	--models=RF_10,ET_10	only generate the code for the given models
+	#	--lto	link with -flto, so that the trees are inlined across translation units (and still compiled in parallel)
+	#	--pgo	additionally build every test program with profile-guided optimization (test{namespace}_pgo), trained on the test data
+	#	--pgo=samples.csv	train the profile-guided builds on the given file (same format as test.csv)
+	#	--native	compile the profile-guided builds with -march=native
+	#	--sweep	additionally build every test program with each of the flags in SWEEP_FLAGS (e.g. test{namespace}_O2)
+	#	--sweep="-std=c++11 -O2;-std=c++11 -Os"	use the given flags (separated by ;) instead
+	#	--tracemalloc	additionally record the peak memory of each phase in profile.json (slows down the conversion)
+	#	--cprofile	additionally profile all calls with cProfile, the top functions are part of profile.json and the raw data is written to profile.prof
+	# The time of each phase (load, probabilities, kernel selection, emission, write) and the node counts are written to profile.json of every model
+	#	--bintables	write the node tables of the native converters into binary files which are embedded via .incbin instead of C initializers (see getBinaryTables)
+	#	--softvote	additionally generate soft voting classifiers (SoftVote{converter}_8 and _16 for StandardIfTree, StandardNativeTree, SharedIfTree and MixTree), which sum up quantized leaf probabilities instead of counting the classes (see SoftVoteForestConverter)
+	#	--softvote=8	only generate the soft voting classifiers with the given numbers of bits (8 and / or 16)
+	#	--flushsize=8388608	the number of bytes written by the benchmark harness to evict the caches before each sample in cold mode (default: size of the last level cache)
+	#	--coldsamples=1000	the number of samples measured by the benchmark harness in cold mode
+	#	--lutpredicates=16	the maximum number of distinct predicates of a tree converted into a lookup table (see LUTTreeConverter)
+	#	--verify	build every classifier as shared library and compare its predictions with the python model on the test data (see verifyCode.py)
+	options = [a for a in argv if a.startswith("--")]
+	argv = [a for a in argv if not a.startswith("--")]
+
+	collapse = getOption(options, "collapse")
+	tolerance = None if collapse is None or collapse is True else float(collapse)
+	costModelFile = getOption(options, "costmodel")
+	hostProfileFile = getOption(options, "hostprofile")
+	split = getOption(options, "amalgamate") is None
+	lto = "-flto" if getOption(options, "lto") is not None else ""
+	models = getOption(options, "models")
+	models = None if models is None else models.split(",")
+	pgo = getOption(options, "pgo")
+	pgoData = "../test.bin" if pgo is None or pgo is True else os.path.abspath(pgo)
+	pgoFlags = "-march=native" if getOption(options, "native") is not None else ""
+	sweep = getOption(options, "sweep")
+	sweepFlags = [] if sweep is None else (SWEEP_FLAGS if sweep is True else sweep).split(";")
+	pgo = pgo is not None
+	traceMemory = getOption(options, "tracemalloc") is not None
+	profileCalls = getOption(options, "cprofile") is not None
+	verify = getOption(options, "verify") is not None
+	binTables = getOption(options, "bintables") is not None
+	softVote = getOption(options, "softvote")
+	softVoteBits = [] if softVote is None else [int(b) for b in ("8,16" if softVote is True else softVote).split(",")]
+	coldSamples = int(getOption(options, "coldsamples", 1000))
+	lutPredicates = int(getOption(options, "lutpredicates", 16))
+
 	if len(argv)<1:
 		print("Please give a sub-folder / dataset to be used")
 		return
@@ -262,6 +795,15 @@ def main(argv):
 			print("Please use arm or intel or ppc")
 			return
 
+	# The binary node tables are written in the byte order of the target
+	byteOrder = None
+	if binTables:
+		byteOrder = ">" if target == "ppc" else "<"
+
+	costModel = CostModel(target)
+	if costModelFile is not None:
+		costModel.fromJSON(costModelFile)
+
 	#if len(argv) < 3:
 	if target == "intel":
 		setSizes = [25]
@@ -276,8 +818,38 @@ def main(argv):
 		# budgetSizes = [32*1000, 64*1000]
 			#setSize = 8 # 5,8,20,40
 			#budgetSize = 32*1000 # 16*1000, 32*1000, 64*1000
-	# else:
-	# 	setSize = int(argv[2])
+
+	# Derive budgets and set sizes from the caches of the deployment machine if known. This is the
+	# local machine for intel, whereas cross targets need a profile file created on the target
+	if hostProfileFile is not None:
+		hostProfile = HostProfile()
+		hostProfile.fromJSON(hostProfileFile)
+	elif target == "intel":
+		hostProfile = getLocalProfile()
+	else:
+		hostProfile = None
+
+	# The benchmark harness evicts the caches by writing a buffer of the size of the largest cache, one byte per cache line
+	flushSize = 32*1024*1024
+	if hostProfile is not None and (hostProfile.l3 is not None or hostProfile.l2 is not None):
+		flushSize = max(hostProfile.l3 or 0, hostProfile.l2 or 0)
+	if getOption(options, "flushsize") is not None:
+		flushSize = int(getOption(options, "flushsize"))
+	lineSize = 64
+	if hostProfile is not None and hostProfile.lineSize is not None:
+		lineSize = hostProfile.lineSize
+
+	if hostProfile is not None:
+		if len(hostProfile.getBudgetSizes()) > 0:
+			budgetSizes = hostProfile.getBudgetSizes()
+		if len(hostProfile.getSetSizes()) > 0:
+			setSizes = hostProfile.getSetSizes()
+		print("Using budget sizes", budgetSizes, "and set sizes", setSizes, "from the host profile")
+
+	# An explicit set size (e.g. from detect_setsize.sh) overrides all defaults
+	if len(argv) >= 3:
+		setSizes = [int(argv[2])]
+
 	reps = 50 # 20
 
 	# if len(argv) < 4:
@@ -295,9 +867,12 @@ def main(argv):
 	Y = None
 
 	for f in sorted(os.listdir(basepath + "/text/")):
-		if f.endswith(".json"):
+		if f.endswith(".json") and (models is None or f[:-len(".json")] in models):
 			name = f.replace(".json","")
 			cppPath = basepath + "/cpp/" + target + "/" + name
+			if collapse is not None:
+				# Collapsed models are stored next to the original ones, so that run.sh measures both
+				cppPath += "_collapsed"
 			print("Generating", cppPath)
 
 			if not os.path.exists(cppPath):
@@ -305,11 +880,22 @@ def main(argv):
 
 			forestPath = basepath + "/text/" + f
 
+			profiler = Profiler.Profiler(name, traceMemory, profileCalls)
+			Profiler.activate(profiler)
+			profiler.start()
+
 			print("\tLoading forest")
 
 			loadedForest = Forest.Forest()
 			loadedForest.fromJSON(forestPath)
 
+			if collapse is not None:
+				numNodes = loadedForest.getTotalNumNodes()
+				removed = loadedForest.collapse(tolerance)
+				print("\tCollapsed subtrees: removed %s of %s nodes" % (removed, numNodes))
+
+				with open(cppPath + "/collapse.json", 'w') as outFile:
+					json.dump({"tolerance":tolerance, "nodes":numNodes, "nodesCollapsed":numNodes - removed}, outFile)
 
 			if X is None:
 				print("\tReading CSV file to compute test accuracy")
@@ -325,33 +911,32 @@ def main(argv):
 				# X = np.array(X)
 				# Y = np.array(Y)
 
-				data = np.loadtxt(basepath + "/test.csv", delimiter = ",")
-
-				X = data[:,1:]
-				Y = data[:,0]
+				with Profiler.phase("load"):
+					X, Y = loadTestData(basepath + "/test.csv")
 
 				if target == "arm" or target == "ppc":
 					numTest = min(len(X),10000)
 				else:
 					numTest = len(X)
 
-				if all([x.is_integer() for X in data for x in X]):
-					X = X[0:numTest,:].astype(dtype=np.int32)
-				else:
-					X = X[0:numTest,:].astype(dtype=np.float32)
-
+				X = X[0:numTest,:]
 				Y = Y[0:numTest]
 
-			clf = joblib.load(basepath + "/text/" + name + ".pkl")
+				print("\tWriting binary test data")
+				with Profiler.phase("write"):
+					writeTestData(basepath + "/cpp/" + target + "/test.bin", X, Y, getFeatureType(X), target)
+
 			print("\tComputing target accuracy")
-			YPredicted_ = loadedForest.predict_batch(X)
-			YPredictedSK = clf.predict(X)
-			# print(clf.classes_)
-			# print(YPredictedSK)
+			with Profiler.phase("accuracy"):
+				YPredicted_ = loadedForest.predict_batch(X)
 
 			targetAcc = sum(YPredicted_ == Y)
 			#print("\tAccuracy MY:%s" % accuracy_score(Y, YPredicted_))
-			print("\tWeighted Majority Vote: %s" % sum(YPredictedSK == Y))
+			# Synthetic forests (see generateSynthetic.py) have no sklearn model
+			if os.path.exists(basepath + "/text/" + name + ".pkl"):
+				clf = joblib.load(basepath + "/text/" + name + ".pkl")
+				YPredictedSK = clf.predict(X)
+				print("\tWeighted Majority Vote: %s" % sum(YPredictedSK == Y))
 			print("\tStandard Majority Vote: %s" % sum(YPredicted_ == Y))
 			#print("\tAccuracy SK:%s" % accuracy_score(Y, YPredictedSK))
 			#print("\ttargetAcc SK: %s" % sum(YPredictedSK == Y))
@@ -359,68 +944,224 @@ def main(argv):
 			featureType = getFeatureType(X)
 			dim = len(X[0])
 
-			Makefile = """COMPILER = {compiler}
-FLAGS = -std=c++11 -Wall -O3 -funroll-loops -ftree-vectorize
-
-all:
-"""
+			Makefile = ""
+			targets = []
 			print("\tGenerating If-Trees")
 			converter = ForestConverter(StandardIFTreeConverter(dim, "StandardIfTree", featureType))
-			generateClassifier(cppPath + "/", targetAcc, dim, numTest, converter, "StandardIfTree", featureType, loadedForest, "../../../test.csv", reps)
-			Makefile += "\t$(COMPILER) $(FLAGS) StandardIfTree.h StandardIfTree.cpp testStandardIfTree.cpp -o testStandardIfTree" + "\n"
+			units = generateClassifier(cppPath + "/", targetAcc, dim, numTest, converter, "StandardIfTree", featureType, loadedForest, "../test.bin", reps, split, byteOrder)
+			makeRules, makeTargets = getMakeTargets("StandardIfTree", units, sweepFlags, pgo)
+			Makefile += makeRules
+			targets += makeTargets
 
 			for s in budgetSizes:
 				print("\tIf-Tree for budget", s)
 
-				converter = ForestConverter(OptimizedIFTreeConverter(dim, "OptimizedPathIfTree_" + str(s), featureType, target, "path", s))
-				generateClassifier(cppPath + "/", targetAcc, dim, numTest, converter, "OptimizedPathIfTree_"+ str(s), featureType, loadedForest, "../../../test.csv", reps)
-				Makefile += "\t$(COMPILER) $(FLAGS) OptimizedPathIfTree_" + str(s)+".h" + " OptimizedPathIfTree_" + str(s)+".cpp testOptimizedPathIfTree_" + str(s)+".cpp -o testOptimizedPathIfTree_" + str(s) + "\n"
+				converter = ForestConverter(OptimizedIFTreeConverter(dim, "OptimizedPathIfTree_" + str(s), featureType, target, "path", s, costModel))
+				units = generateClassifier(cppPath + "/", targetAcc, dim, numTest, converter, "OptimizedPathIfTree_"+ str(s), featureType, loadedForest, "../test.bin", reps, split, byteOrder)
+				makeRules, makeTargets = getMakeTargets("OptimizedPathIfTree_"+ str(s), units, sweepFlags, pgo)
+				Makefile += makeRules
+				targets += makeTargets
 
 				# converter = ForestConverter(OptimizedIFTreeConverter(dim, "OptimizedNodeIfTree_" + str(s), featureType, target, "node", s))
-				# generateClassifier(cppPath + "/", targetAcc, dim, numTest, converter, "OptimizedNodeIfTree_" + str(s), featureType, loadedForest, "../../../test.csv", reps)
+				# generateClassifier(cppPath + "/", targetAcc, dim, numTest, converter, "OptimizedNodeIfTree_" + str(s), featureType, loadedForest, "../test.bin", reps)
 				# Makefile += "\t$(COMPILER) $(FLAGS) OptimizedNodeIfTree_" + str(s)+".h" + " OptimizedNodeIfTree_" + str(s)+".cpp testOptimizedNodeIfTree_" + str(s)+".cpp -o testOptimizedNodeIfTree_" + str(s) + "\n"
 
 				# converter = ForestConverter(OptimizedIFTreeConverter(dim, "OptimizedSwapIfTree_" + str(s), featureType, target, "swap", s))
-				# generateClassifier(cppPath + "/", targetAcc, dim, numTest, converter, "OptimizedSwapIfTree_" + str(s), featureType, loadedForest, "../../../test.csv", reps)
+				# generateClassifier(cppPath + "/", targetAcc, dim, numTest, converter, "OptimizedSwapIfTree_" + str(s), featureType, loadedForest, "../test.bin", reps)
 				# Makefile += "\t$(COMPILER) $(FLAGS) OptimizedSwapIfTree_" + str(s)+".h" + " OptimizedSwapIfTree_" + str(s)+".cpp testOptimizedSwapIfTree_" + str(s)+".cpp -o testOptimizedSwapIfTree_" + str(s) + "\n"
 
 			print("\tGenerating NativeTrees")
 
 			converter = ForestConverter(NaiveNativeTreeConverter(dim, "NaiveNativeTree", featureType))
-			generateClassifier(cppPath + "/", targetAcc, dim, numTest, converter, "NaiveNativeTree", featureType, loadedForest, "../../../test.csv", reps)
-			Makefile += "\t$(COMPILER) $(FLAGS) NaiveNativeTree.h NaiveNativeTree.cpp testNaiveNativeTree.cpp -o testNaiveNativeTree\n"
+			units = generateClassifier(cppPath + "/", targetAcc, dim, numTest, converter, "NaiveNativeTree", featureType, loadedForest, "../test.bin", reps, split, byteOrder)
+			makeRules, makeTargets = getMakeTargets("NaiveNativeTree", units, sweepFlags, pgo)
+			Makefile += makeRules
+			targets += makeTargets
 
 			converter = ForestConverter(StandardNativeTreeConverter(dim, "StandardNativeTree", featureType))
-			generateClassifier(cppPath + "/", targetAcc, dim, numTest, converter, "StandardNativeTree", featureType, loadedForest, "../../../test.csv", reps)
-			Makefile += "\t$(COMPILER) $(FLAGS) StandardNativeTree.h StandardNativeTree.cpp testStandardNativeTree.cpp -o testStandardNativeTree\n"
+			units = generateClassifier(cppPath + "/", targetAcc, dim, numTest, converter, "StandardNativeTree", featureType, loadedForest, "../test.bin", reps, split, byteOrder)
+			makeRules, makeTargets = getMakeTargets("StandardNativeTree", units, sweepFlags, pgo)
+			Makefile += makeRules
+			targets += makeTargets
+
+			print("\tGenerating SwitchNativeTrees")
+			converter = ForestConverter(SwitchNativeTreeConverter(dim, "SwitchNativeTree", featureType))
+			units = generateClassifier(cppPath + "/", targetAcc, dim, numTest, converter, "SwitchNativeTree", featureType, loadedForest, "../test.bin", reps, split, byteOrder)
+			makeRules, makeTargets = getMakeTargets("SwitchNativeTree", units, sweepFlags, pgo)
+			Makefile += makeRules
+			targets += makeTargets
+
+			converter = ForestConverter(SwitchNativeTreeConverter(dim, "SwitchCaseNativeTree", featureType, computedGoto = False))
+			units = generateClassifier(cppPath + "/", targetAcc, dim, numTest, converter, "SwitchCaseNativeTree", featureType, loadedForest, "../test.bin", reps, split, byteOrder)
+			makeRules, makeTargets = getMakeTargets("SwitchCaseNativeTree", units, sweepFlags, pgo)
+			Makefile += makeRules
+			targets += makeTargets
 
 			for s in setSizes:
 				print("\tNative for set-size", s)
 
 				converter = ForestConverter(OptimizedNativeTreeConverter(dim, "OptimizedNativeTree_" + str(s), featureType, s))
-				generateClassifier(cppPath + "/", targetAcc, dim, numTest, converter, "OptimizedNativeTree_" + str(s), featureType, loadedForest, "../../../test.csv", reps)
-				Makefile += "\t$(COMPILER) $(FLAGS) OptimizedNativeTree_" + str(s)+".h" + " OptimizedNativeTree_" + str(s)+".cpp testOptimizedNativeTree_" + str(s)+".cpp -o testOptimizedNativeTree_" + str(s) + "\n"
+				units = generateClassifier(cppPath + "/", targetAcc, dim, numTest, converter, "OptimizedNativeTree_" + str(s), featureType, loadedForest, "../test.bin", reps, split, byteOrder)
+				makeRules, makeTargets = getMakeTargets("OptimizedNativeTree_" + str(s), units, sweepFlags, pgo)
+				Makefile += makeRules
+				targets += makeTargets
 
 				# print("\tOptimizedNativeForest for set-size", s)
 
 				# converter = OptimizedNativeForestConverter(OptimizedNativeTreeConverterForest(dim, "OptimizedNativeForest_" + str(s), featureType, s))
-				# generateClassifier(cppPath + "/", targetAcc, dim, numTest, converter, "OptimizedNativeForest_" + str(s), featureType, loadedForest, "../../../test.csv", reps)
+				# generateClassifier(cppPath + "/", targetAcc, dim, numTest, converter, "OptimizedNativeForest_" + str(s), featureType, loadedForest, "../test.bin", reps)
 				# Makefile += "\t$(COMPILER) $(FLAGS) OptimizedNativeForest_" + str(s)+".h" + " OptimizedNativeForest_" + str(s)+".cpp testOptimizedNativeForest_" + str(s)+".cpp -o testOptimizedNativeForest_" + str(s) + "\n"
-			# print("\tGenerating MixTrees")
-			#converter = ForestConverter(MixConverter(dim, "MixTree", featureType, target))
-			#generateClassifier(cppPath + "/", targetAcc, X,Y, converter, "MixTree", featureType, loadedForest, "../../../test.csv", reps)
-
-			if target == "intel":
-				compiler = "g++"
-			elif target == "ppc":
-								compiler = "powerpc-fsl-linux-g++ -m32 -mhard-float -mcpu=e6500 --sysroot=/opt/fsl-qoriq/2.0/sysroots/ppce6500-fsl-linux --static"
+
+			print("\tGenerating PredicateTrees")
+			# Every distinct predicate is evaluated once per sample, whereas a traversal only evaluates
+			# the predicates along its paths. Thus, the comparisons saved per sample are usually negative
+			numPredicates = len(loadedForest.getPredicates())
+			numComparisons = loadedForest.getExpectedNumComparisons()
+			print("\tComparisons per sample: %.2f during traversal, %s unique predicates (%.2f saved)" % (numComparisons, numPredicates, numComparisons - numPredicates))
+
+			converter = PredicateForestConverter(PredicateIFTreeConverter(dim, "PredicateIfTree", featureType))
+			units = generateClassifier(cppPath + "/", targetAcc, dim, numTest, converter, "PredicateIfTree", featureType, loadedForest, "../test.bin", reps, split, byteOrder)
+			makeRules, makeTargets = getMakeTargets("PredicateIfTree", units, sweepFlags, pgo)
+			Makefile += makeRules
+			targets += makeTargets
+
+			converter = PredicateForestConverter(PredicateNativeTreeConverter(dim, "PredicateNativeTree", featureType))
+			units = generateClassifier(cppPath + "/", targetAcc, dim, numTest, converter, "PredicateNativeTree", featureType, loadedForest, "../test.bin", reps, split, byteOrder)
+			makeRules, makeTargets = getMakeTargets("PredicateNativeTree", units, sweepFlags, pgo)
+			Makefile += makeRules
+			targets += makeTargets
+
+			print("\tGenerating SharedTrees")
+			counts = loadedForest.hashConsSubtrees()
+			print("\tDistinct subtrees: %s of %s nodes" % (len(counts), loadedForest.getTotalNumNodes()))
+
+			converter = ForestConverter(SharedIFTreeConverter(dim, "SharedIfTree", featureType))
+			units = generateClassifier(cppPath + "/", targetAcc, dim, numTest, converter, "SharedIfTree", featureType, loadedForest, "../test.bin", reps, split, byteOrder)
+			makeRules, makeTargets = getMakeTargets("SharedIfTree", units, sweepFlags, pgo)
+			Makefile += makeRules
+			targets += makeTargets
+
+			# The shared array of all trees needs wider child indices than the arrays per tree, so the DAG is only
+			# generated if the shared nodes make up for that
+			dagConverter = DAGNativeTreeConverter(dim, "DAGNativeTree", featureType)
+			numShared, dagBytes, treeBytes = dagConverter.getTableSizes(loadedForest)
+			print("\tShared split nodes: %s, DAG: %s bytes, arrays per tree: %s bytes" % (numShared, dagBytes, treeBytes))
+			if dagBytes < treeBytes:
+				converter = OptimizedNativeForestConverter(dagConverter)
+				units = generateClassifier(cppPath + "/", targetAcc, dim, numTest, converter, "DAGNativeTree", featureType, loadedForest, "../test.bin", reps, split, byteOrder)
+				makeRules, makeTargets = getMakeTargets("DAGNativeTree", units, sweepFlags, pgo)
+				Makefile += makeRules
+				targets += makeTargets
 			else:
-				compiler = "arm-linux-gnueabihf-g++"
+				print("\tSkipping DAGNativeTree, since it is not smaller than the arrays per tree")
+
+			print("\tGenerating CompactTrees")
+			print("\tFeatures used: %s of %s" % (len(loadedForest.getFeatureMapping()), dim))
+
+			converter = CompactForestConverter(StandardIFTreeConverter(dim, "CompactStandardIfTree", featureType))
+			units = generateClassifier(cppPath + "/", targetAcc, dim, numTest, converter, "CompactStandardIfTree", featureType, loadedForest, "../test.bin", reps, split, byteOrder)
+			makeRules, makeTargets = getMakeTargets("CompactStandardIfTree", units, sweepFlags, pgo)
+			Makefile += makeRules
+			targets += makeTargets
+
+			converter = CompactForestConverter(StandardNativeTreeConverter(dim, "CompactStandardNativeTree", featureType))
+			units = generateClassifier(cppPath + "/", targetAcc, dim, numTest, converter, "CompactStandardNativeTree", featureType, loadedForest, "../test.bin", reps, split, byteOrder)
+			makeRules, makeTargets = getMakeTargets("CompactStandardNativeTree", units, sweepFlags, pgo)
+			Makefile += makeRules
+			targets += makeTargets
+
+			print("\tGenerating LUTTrees")
+			lutConverter = LUTTreeConverter(dim, "LUTTree", featureType, lutPredicates)
+			numLUTTrees = sum([lutConverter.accepts(t) for t in loadedForest.trees])
+			print("\tTrees with lookup table: %s of %s (at most %s predicates)" % (numLUTTrees, len(loadedForest.trees), lutPredicates))
+
+			# Without any lookup table, the classifier would be the same as StandardIfTree
+			if numLUTTrees > 0:
+				converter = ForestConverter(lutConverter, StandardIFTreeConverter(dim, "LUTTree", featureType))
+				units = generateClassifier(cppPath + "/", targetAcc, dim, numTest, converter, "LUTTree", featureType, loadedForest, "../test.bin", reps, split, byteOrder)
+				makeRules, makeTargets = getMakeTargets("LUTTree", units, sweepFlags, pgo)
+				Makefile += makeRules
+				targets += makeTargets
+			else:
+				print("\tSkipping LUTTree, since no tree has a lookup table")
 
-			Makefile = Makefile.replace("{compiler}", compiler)
+			print("\tGenerating MixTrees")
+			for s in budgetSizes:
+				print("\tMix-Tree for budget", s)
+
+				converter = ForestConverter(MixConverter(dim, "MixTree_" + str(s), featureType, target, s, costModel = costModel))
+				units = generateClassifier(cppPath + "/", targetAcc, dim, numTest, converter, "MixTree_" + str(s), featureType, loadedForest, "../test.bin", reps, split, byteOrder)
+				makeRules, makeTargets = getMakeTargets("MixTree_" + str(s), units, sweepFlags, pgo)
+				Makefile += makeRules
+				targets += makeTargets
+
+			if len(softVoteBits) > 0:
+				# The accuracies of hard and soft voting are stored next to the code for softVoteReport.py
+				voting = {"samples" : int(numTest), "hard" : int(targetAcc), "soft" : int(sum(loadedForest.predict_batch_soft(X) == Y)), "quantized" : {}}
+			for bits in softVoteBits:
+				print("\tGenerating soft voting trees with", bits, "bit probabilities")
+				softAcc = sum(loadedForest.predict_batch_soft(X, bits) == Y)
+				voting["quantized"][str(bits)] = int(softAcc)
+				print("\tSoft Majority Vote (%s bit): %s" % (bits, softAcc))
+
+				softConverters = [
+					("SoftVoteStandardIfTree_", lambda namespace : StandardIFTreeConverter(dim, namespace, featureType)),
+					("SoftVoteStandardNativeTree_", lambda namespace : StandardNativeTreeConverter(dim, namespace, featureType)),
+					("SoftVoteSharedIfTree_", lambda namespace : SharedIFTreeConverter(dim, namespace, featureType)),
+					("SoftVoteMixTree_", lambda namespace : MixConverter(dim, namespace, featureType, target, budgetSizes[0], costModel = costModel))
+				]
+				for prefix, treeConverter in softConverters:
+					namespace = prefix + str(bits)
+					converter = SoftVoteForestConverter(treeConverter(namespace), bits)
+					units = generateClassifier(cppPath + "/", softAcc, dim, numTest, converter, namespace, featureType, loadedForest, "../test.bin", reps, split, byteOrder)
+					makeRules, makeTargets = getMakeTargets(namespace, units, sweepFlags, pgo)
+					Makefile += makeRules
+					targets += makeTargets
+
+			if len(softVoteBits) > 0:
+				with open(cppPath + "/voting.json", 'w') as outFile:
+					json.dump(voting, outFile)
 
-			with open(cppPath + "/" + "Makefile",'w') as code_file:
-				code_file.write(Makefile)
+			Makefile = """COMPILER = {compiler}
+FLAGS = {flags}
+LTO = {lto}
+FLUSH_SIZE = {flush_size}
+LINE_SIZE = {line_size}
+COLD_SAMPLES = {cold_samples}
+PGO_FLAGS = {pgo_flags}
+PGO_DATA = {pgo_data}
+
+all: {targets}
+
+%.o: %.cpp
+	$(COMPILER) $(FLAGS) $(LTO) -c $< -o $@
+
+""".replace("{targets}", " ".join(targets)) + Makefile + """bench: $(BENCHES)
+
+clean:
+	rm -rf *.o *.profile {targets} $(BENCHES)
+
+.PHONY: all bench clean
+""".replace("{targets}", " ".join(targets))
+			Makefile = Makefile.replace("{compiler}", COMPILERS[target]).replace("{flags}", FLAGS).replace("{lto}", lto).replace("{flush_size}", str(flushSize)).replace("{line_size}", str(lineSize)).replace("{cold_samples}", str(coldSamples)).replace("{pgo_flags}", pgoFlags).replace("{pgo_data}", pgoData)
+
+			with Profiler.phase("write"):
+				with open(cppPath + "/" + "Makefile",'w') as code_file:
+					code_file.write(Makefile)
+
+			if verify:
+				# verifyCode imports this module, so it is only imported if needed
+				from verifyCode import verifyModel, printReport
+				print("\tVerifying the generated code")
+				with Profiler.phase("verify"):
+					printReport(verifyModel(cppPath, loadedForest, X))
+
+			profiler.stop()
+			Profiler.activate(None)
+			profiler.toJSON(cppPath + "/profile.json")
+			if profileCalls:
+				profiler.dumpProfile(cppPath + "/profile.prof")
+			print("\tProfile: " + ", ".join(["%s %.2f s" % (p, t) for p, t in profiler.getTotals().items()]) + " (see profile.json)")
 
 		print("")
 
@@ -6,8 +6,6 @@ import os.path
 import pickle
 import sklearn
 import json
-import gc
-#import objgraph
 
 from sklearn.tree import DecisionTreeClassifier
 from sklearn.ensemble import RandomForestClassifier
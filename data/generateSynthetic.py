@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+
+import sys
+import os
+import json
+import timeit
+
+sys.setrecursionlimit(20000)
+sys.path.append('../code/')
+
+import SyntheticForest
+from generateCode import getOption
+from fitModels import writeTestCSV
+
+def main(argv):
+	# Generate a synthetic forest (without training) and its test data as a dataset for generateCode.py:
+	#	./generateSynthetic.py synthetic [--trees=25] [--depth=15] [--dim=20] [--classes=2] [--type=int] [--skew=0.5]
+	#						   [--leafprob=0.0] [--range=1000] [--samples=10000] [--seed=0] [--name=RF_T25_D15]
+	# The forest is stored in synthetic/text/name.json, the test data in synthetic/test.csv. Since all models of
+	# a dataset share the test data, models with a different --dim or --type should go to a different folder
+	options = [a for a in argv if a.startswith("--")]
+	argv = [a for a in argv if not a.startswith("--")]
+
+	if len(argv) < 1:
+		print("Please give a sub-folder / dataset to be used")
+		return 1
+	else:
+		basepath = argv[0].strip("/")
+
+	numTrees = int(getOption(options, "trees", 25))
+	depth = int(getOption(options, "depth", 15))
+	dim = int(getOption(options, "dim", 20))
+	numClasses = int(getOption(options, "classes", 2))
+	splitDataType = getOption(options, "type", "int")
+	skew = float(getOption(options, "skew", 0.5))
+	leafProb = float(getOption(options, "leafprob", 0.0))
+	featureRange = int(getOption(options, "range", 1000))
+	numSamples = int(getOption(options, "samples", 10000))
+	seed = int(getOption(options, "seed", 0))
+	name = getOption(options, "name", "RF_T" + str(numTrees) + "_D" + str(depth))
+
+	if splitDataType != "int" and splitDataType != "float":
+		print("Please use int or float as --type")
+		return 1
+
+	start = timeit.default_timer()
+	trees = SyntheticForest.getSyntheticTrees(numTrees, depth, dim, numClasses, splitDataType, skew, leafProb, featureRange, seed)
+	X, Y = SyntheticForest.getSyntheticData(trees, numSamples, dim, splitDataType, featureRange, seed)
+	print("Generated", sum([t.getNumNodes() for t in trees]), "nodes in", timeit.default_timer() - start, "s")
+
+	if not os.path.exists(basepath + "/text"):
+		os.makedirs(basepath + "/text")
+
+	with open(basepath + "/text/" + name + ".json", 'w') as outFile:
+		# json.dumps encodes in C, json.dump to a file does not
+		outFile.write(json.dumps(SyntheticForest.toDicts(trees), separators = (",", ":")))
+	writeTestCSV(basepath + "/test.csv", X, Y)
+	print("Written to", basepath + "/text/" + name + ".json", "and", basepath + "/test.csv")
+
+	return 0
+
+if __name__ == "__main__":
+	sys.exit(main(sys.argv[1:]))
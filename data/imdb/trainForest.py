@@ -1,28 +1,19 @@
 #!/usr/bin/env python3
 
-import csv,operator,sys,os
+import sys
 import numpy as np
 
 sys.path.append('../')
 from fitModels import fitModels
+from datasetLoader import readCSV, loadCached
 
 def readFile(path):
-	f = open(path, 'r')
-	X = []
-	Y = []
-	for row in f:
-		entries = row.replace("\n","").split(",")
-		x = [float(e) for e in entries[1:]]
-		y = int(entries[0])
+	data = readCSV(path)
 
-		X.append(x)
-		Y.append(y)
-
-	return np.array(X).astype(dtype=np.float32), np.array(Y)
+	return data[:,1:].astype(dtype=np.float32), data[:,0].astype(np.int64)
 
 def main(argv):
-	XTrain,YTrain = readFile("train.csv")
-	XTest,YTest = readFile("test.csv")
+	XTrain,YTrain,XTest,YTest = loadCached("prepared.npz", ["train.csv", "test.csv"], lambda : readFile("train.csv") + readFile("test.csv"))
 
 	fitModels(False,XTrain,YTrain,XTest,YTest)
 
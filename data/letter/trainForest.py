@@ -1,30 +1,23 @@
 #!/usr/bin/env python3
 
-import csv,operator,sys,os
+import sys
 import numpy as np
 
 sys.path.append('../')
 from fitModels import fitModels
+from datasetLoader import readCSV, mapValues, loadCached
 
 def readFile(path):
-	f = open(path, 'r')
-	X = []
-	Y = []
-	for row in f:
-		entries = row.strip().split(",")
-		x = [int(e) for e in entries[1:]]
-		# Labels are capital letter has. 'A' starts in ASCII code with 65
-		# We map it to '0' here, since SKLearn internally starts with mapping = 0 
-		# and I have no idea how it produces correct outputs in the first place
-		y = ord(entries[0]) - 65
-		
-		X.append(x)
-		Y.append(y)
+	data = readCSV(path, dtype = str)
+	# Labels are capital letter has. 'A' starts in ASCII code with 65
+	# We map it to '0' here, since SKLearn internally starts with mapping = 0 
+	# and I have no idea how it produces correct outputs in the first place
+	Y = mapValues(data[:,0], lambda e : ord(e) - 65)
 
-	return np.array(X).astype(dtype=np.int32), np.array(Y)
+	return data[:,1:].astype(dtype=np.int32), Y
 
 def main(argv):
-	X,Y = readFile("letter-recognition.data")
+	X,Y = loadCached("prepared.npz", ["letter-recognition.data"], lambda : readFile("letter-recognition.data"))
 
 	fitModels(True,X,Y)
 
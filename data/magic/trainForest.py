@@ -1,27 +1,21 @@
 #!/usr/bin/env python3
 
-import csv,operator,sys,os
+import sys
 import numpy as np
 
 sys.path.append('../')
 from fitModels import fitModels
+from datasetLoader import readCSV, loadCached
 
 def readFile(path):
-	f = open(path, 'r')
-	X = []
-	Y = []
-	for row in f:
-		entries = row.strip().split(",")
-		x = [float(e) for e in entries[0:-1]]
-		y = 0 if entries[-1] == 'g' else 1
-		X.append(x)
-		Y.append(y)
+	data = readCSV(path, dtype = str)
+	Y = np.where(data[:,-1] == 'g', 0, 1)
 
-	return np.array(X).astype(dtype=np.int32), np.array(Y)
+	return data[:,0:-1].astype(np.float64).astype(dtype=np.int32), Y
 
 
 def main(argv):
-	X,Y = readFile("magic04.data")
+	X,Y = loadCached("prepared.npz", ["magic04.data"], lambda : readFile("magic04.data"))
 
 	fitModels(True,X,Y)
 
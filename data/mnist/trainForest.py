@@ -1,29 +1,20 @@
 #!/usr/bin/env python3
 
-import csv,operator,sys,os
+import sys
 import numpy as np
 
 sys.path.append('../')
 from fitModels import fitModels
+from datasetLoader import readCSV, loadCached
 def readFile(path):
-	X = []
-	Y = []
+	data = readCSV(path, dtype = np.int64)
 
-	f = open(path,'r')
-
-	for row in f:
-		entries = row.strip("\n").split(",")
-		
-		Y.append(int(entries[0])-1)
-		x = [int(e) for e in entries[1:]]
-		X.append(x)
-
-	Y = np.array(Y)-min(Y)
-	return np.array(X).astype(dtype=np.int32), Y
+	Y = data[:,0]-1
+	Y = Y-min(Y)
+	return data[:,1:].astype(dtype=np.int32), Y
 
 def main(argv):
-	XTrain,YTrain = readFile("train.csv")
-	XTest,YTest = readFile("test.csv")
+	XTrain,YTrain,XTest,YTest = loadCached("prepared.npz", ["train.csv", "test.csv"], lambda : readFile("train.csv") + readFile("test.csv"))
 
 	fitModels(True,XTrain,YTrain,XTest,YTest)
 
@@ -0,0 +1,306 @@
+#!/usr/bin/env python3
+
+import sys
+import os
+import json
+import hashlib
+import subprocess
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+from generateCode import getOption
+
+# The stages of the pipeline in the order of their dependencies
+STAGES = ["init", "train", "convert", "compile", "benchmark"]
+
+class Job:
+	""" A Job runs the command of a single stage for a dataset or a model. The command is either a shell
+		command (string) or a python function returning True on success
+	"""
+	def __init__(self, name, stage, command, cwd, inputs, outputs, deps = [], exclusive = False):
+		"""
+		Args:
+			name (str): The unique name of the job, e.g. convert:adult/RF_10
+			stage (str): The stage of the job (see STAGES)
+			command (str or function): The command to run
+			cwd (str): The working directory of the command
+			inputs (function): Returns the list of input files. The inputs are hashed when all dependencies are done,
+							   because they may be written by these dependencies
+			outputs (function): Returns the list of files which have to exist after the job ran
+			deps (list, optional): The jobs which have to be done before this job
+			exclusive (bool, optional): If True, no other job runs concurrently (e.g. to time the benchmarks)
+		"""
+		self.name = name
+		self.stage = stage
+		self.command = command
+		self.cwd = cwd
+		self.inputs = inputs
+		self.outputs = outputs
+		self.deps = deps
+		self.exclusive = exclusive
+		# Called after the job is done, e.g. to add the jobs for each model a training job produced
+		self.onDone = None
+
+class Pipeline:
+	""" A Pipeline runs a DAG of jobs with a pool of workers. Each job is skipped if the content hash of its
+		inputs (and its command) did not change since its last successful run and its outputs exist. The
+		hashes are stored in a state file, together with a cache of the file hashes (by size and mtime)
+	"""
+	def __init__(self, stateFile, workers = 1, force = False, dryRun = False):
+		self.stateFile = stateFile
+		self.workers = workers
+		self.force = force
+		self.dryRun = dryRun
+		self.jobs = []
+
+		if os.path.exists(stateFile):
+			with open(stateFile) as f:
+				self.state = json.load(f)
+		else:
+			self.state = {"jobs" : {}, "files" : {}}
+
+		self.logPath = os.path.join(os.path.dirname(stateFile), "logs")
+		if not os.path.exists(self.logPath):
+			os.makedirs(self.logPath)
+
+	def add(self, job):
+		self.jobs.append(job)
+		return job
+
+	def saveState(self):
+		with open(self.stateFile + ".tmp", 'w') as f:
+			json.dump(self.state, f)
+		os.replace(self.stateFile + ".tmp", self.stateFile)
+
+	def getFileHash(self, path):
+		st = os.stat(path)
+		entry = self.state["files"].get(path)
+		if entry is not None and entry[0] == st.st_size and entry[1] == st.st_mtime:
+			return entry[2]
+
+		h = hashlib.sha1()
+		with open(path, 'rb') as f:
+			for chunk in iter(lambda : f.read(1 << 20), b""):
+				h.update(chunk)
+		self.state["files"][path] = [st.st_size, st.st_mtime, h.hexdigest()]
+
+		return h.hexdigest()
+
+	def getKey(self, job):
+		h = hashlib.sha1()
+		h.update(job.stage.encode())
+		h.update(str(job.command if isinstance(job.command, str) else job.command.__name__).encode())
+		for path in sorted(set(job.inputs())):
+			if os.path.isfile(path):
+				h.update(path.encode())
+				h.update(self.getFileHash(path).encode())
+
+		return h.hexdigest()
+
+	def isUpToDate(self, job, key):
+		if self.force or self.state["jobs"].get(job.name) != key:
+			return False
+
+		return all([os.path.exists(path) for path in job.outputs()])
+
+	def execute(self, job):
+		logFile = os.path.join(self.logPath, job.name.replace("/", "_").replace(":", "_") + ".log")
+		with open(logFile, 'w') as log:
+			if isinstance(job.command, str):
+				return subprocess.run(job.command, shell = True, cwd = job.cwd, stdout = log, stderr = subprocess.STDOUT).returncode == 0
+			else:
+				return job.command()
+
+	def finish(self, job, done):
+		done.add(job)
+		if job.onDone is not None:
+			job.onDone()
+
+	def run(self):
+		""" Run all jobs
+
+		Returns:
+			int: The number of failed jobs
+		"""
+		done = set()
+		failed = set()
+		running = {}
+
+		with ThreadPoolExecutor(max_workers = self.workers) as pool:
+			while True:
+				progress = False
+				for job in list(self.jobs):
+					if any([d in failed for d in job.deps]):
+						print("Skipping", job.name, "(a dependency failed)")
+						self.jobs.remove(job)
+						failed.add(job)
+						progress = True
+						continue
+
+					if not all([d in done for d in job.deps]):
+						continue
+
+					# Exclusive jobs wait until no other job is running and block all others while they run
+					if any([j.exclusive for j, _ in running.values()]) or len(running) >= self.workers:
+						break
+					if job.exclusive and len(running) > 0:
+						continue
+
+					self.jobs.remove(job)
+					progress = True
+					key = self.getKey(job)
+					if self.isUpToDate(job, key):
+						print("Skipping", job.name, "(unchanged)")
+						self.finish(job, done)
+					elif self.dryRun:
+						print("Would run", job.name)
+						self.finish(job, done)
+					else:
+						print("Running", job.name)
+						running[pool.submit(self.execute, job)] = (job, key)
+
+				if len(running) > 0:
+					completed, _ = wait(list(running.keys()), return_when = FIRST_COMPLETED)
+					for future in completed:
+						job, key = running.pop(future)
+						if future.result():
+							self.state["jobs"][job.name] = key
+							self.saveState()
+							self.finish(job, done)
+						else:
+							print("Failed", job.name, "see", os.path.join(self.logPath, job.name.replace("/", "_").replace(":", "_") + ".log"))
+							failed.add(job)
+				elif not progress:
+					break
+
+		return len(failed)
+
+def getFiles(path, suffix = "", prefix = ""):
+	if not os.path.isdir(path):
+		return []
+
+	return sorted([os.path.join(path, f) for f in os.listdir(path) if f.endswith(suffix) and f.startswith(prefix) and os.path.isfile(os.path.join(path, f))])
+
+def getCodeFiles():
+	return getFiles("../code", ".py") + ["generateCode.py"]
+
+def getBinaries(path):
+	return [f for f in getFiles(path, prefix = "test") if os.access(f, os.X_OK)]
+
+def getTargets(modelPath):
+	""" Returns the test programs built by the Makefile of the given model """
+	with open(os.path.join(modelPath, "Makefile")) as f:
+		for line in f:
+			if line.startswith("all:"):
+				return [os.path.join(modelPath, t) for t in line[len("all:"):].split()]
+
+	return []
+
+def getBenchmark(modelPath):
+	""" Returns a function which runs all test programs of the given model and writes their results to
+		modelPath/results.csv in the format of run.sh
+	"""
+	def benchmark():
+		lines = []
+		for binary in getBinaries(modelPath):
+			output = subprocess.run("./" + os.path.basename(binary), shell = True, cwd = modelPath, stdout = subprocess.PIPE, universal_newlines = True)
+			measurement = output.stdout.strip().split("\n")[-1]
+			lines.append(",".join(["./" + binary, os.path.basename(binary), os.path.basename(modelPath), measurement, str(os.path.getsize(binary))]))
+
+		with open(os.path.join(modelPath, "results.csv"), 'w') as f:
+			f.write("\n".join(lines) + "\n")
+		return True
+
+	return benchmark
+
+def addModelJobs(pipeline, dataset, target, stages, options, deps):
+	""" Add the convert, compile and benchmark jobs for every model of the dataset """
+	for model in [os.path.basename(f)[:-len(".json")] for f in getFiles(os.path.join(dataset, "text"), ".json")]:
+		modelPath = os.path.join(dataset, "cpp", target, model)
+		modelDeps = deps
+
+		if "convert" in stages:
+			command = "./generateCode.py " + dataset + " " + target + " --models=" + model + " " + options
+			# The command (and thus the options) is part of the hash, too
+			modelDeps = [pipeline.add(Job("convert:" + dataset + "/" + model, "convert", command, ".",
+				lambda dataset = dataset, model = model : [os.path.join(dataset, "text", model + ".json"), os.path.join(dataset, "test.csv")] + getCodeFiles(),
+				lambda modelPath = modelPath : [os.path.join(modelPath, "Makefile")], modelDeps))]
+
+		if "compile" in stages:
+			modelDeps = [pipeline.add(Job("compile:" + dataset + "/" + model, "compile", "make", modelPath,
+				lambda modelPath = modelPath : getFiles(modelPath, ".cpp") + getFiles(modelPath, ".h") + [os.path.join(modelPath, "Makefile")],
+				lambda modelPath = modelPath : getTargets(modelPath), modelDeps))]
+
+		if "benchmark" in stages:
+			pipeline.add(Job("benchmark:" + dataset + "/" + model, "benchmark", getBenchmark(modelPath), modelPath,
+				lambda modelPath = modelPath : getBinaries(modelPath) + [os.path.join(dataset, "cpp", target, "test.bin")],
+				lambda modelPath = modelPath : [os.path.join(modelPath, "results.csv")], modelDeps, exclusive = True))
+
+def main(argv):
+	# Run (parts of) the experiments for all datasets. Unchanged jobs are skipped:
+	#	./pipeline.py intel [--datasets=adult,letter] [--stages=train,convert,compile,benchmark] [--workers=4]
+	#				  [--options="--lto --pgo"] [--force] [--dry-run]
+	# --options are passed to generateCode.py. The results of all benchmarks are collected in results_intel.csv
+	options = [a for a in argv if a.startswith("--")]
+	argv = [a for a in argv if not a.startswith("--")]
+
+	if len(argv) < 1:
+		print("Please give a target architecture (arm or intel or ppc)")
+		return 1
+	else:
+		target = argv[0]
+
+	stages = getOption(options, "stages", "train,convert,compile,benchmark").split(",")
+	for stage in stages:
+		if stage not in STAGES:
+			print("Did not recognize stage", stage, "- please use", ",".join(STAGES))
+			return 1
+
+	if target != "intel" and "benchmark" in stages:
+		print("Benchmarks can only be run on the local machine, please use --stages and scpRemote.sh for", target)
+		return 1
+
+	if getOption(options, "datasets") is not None:
+		datasets = getOption(options, "datasets").split(",")
+	else:
+		datasets = sorted([d for d in os.listdir(".") if os.path.isfile(os.path.join(d, "trainForest.py")) or os.path.isdir(os.path.join(d, "text"))])
+
+	pipeline = Pipeline(".pipeline/" + target + ".json", int(getOption(options, "workers", os.cpu_count())), \
+		getOption(options, "force") is not None, getOption(options, "dry-run") is not None)
+	generateOptions = getOption(options, "options", "")
+
+	for dataset in datasets:
+		deps = []
+		if "init" in stages:
+			deps = [pipeline.add(Job("init:" + dataset, "init", "./init.sh", dataset,
+				lambda dataset = dataset : [os.path.join(dataset, "init.sh")], lambda : []))]
+
+		if "train" in stages:
+			# The raw data of a dataset are all files which are not produced by the later stages
+			train = pipeline.add(Job("train:" + dataset, "train", "./trainForest.py > train.txt", dataset,
+				lambda dataset = dataset : ["fitModels.py", "datasetLoader.py"] + [f for f in getFiles(dataset) if os.path.basename(f) not in ["test.csv", "test.npy", "train.txt", "prepared.npz"]],
+				lambda dataset = dataset : [os.path.join(dataset, "test.csv")], deps))
+			# The models are only known after training
+			train.onDone = lambda dataset = dataset, train = train : addModelJobs(pipeline, dataset, target, stages, generateOptions, [train])
+		else:
+			addModelJobs(pipeline, dataset, target, stages, generateOptions, deps)
+
+	failed = pipeline.run()
+
+	if "benchmark" in stages and not pipeline.dryRun:
+		with open("results_" + target + ".csv", 'w') as f:
+			f.write("path,filename,depth,mean,variance,min,max,size\n")
+			for dataset in datasets:
+				for model in sorted(os.listdir(os.path.join(dataset, "cpp", target)) if os.path.isdir(os.path.join(dataset, "cpp", target)) else []):
+					resultFile = os.path.join(dataset, "cpp", target, model, "results.csv")
+					if os.path.isfile(resultFile):
+						with open(resultFile) as r:
+							f.write(r.read())
+
+	if failed > 0:
+		print(failed, "jobs failed")
+		return 1
+
+	return 0
+
+if __name__ == "__main__":
+	sys.exit(main(sys.argv[1:]))
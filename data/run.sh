@@ -14,7 +14,7 @@ fi
 
 #echo "path,filename,treedepth,mean,variance,min,max,size"
 
-for d in $(find ./$1/cpp/$2/*/ -executable -type f); do
+for d in $(find ./$1/cpp/$2/*/ -executable -type f -name "test*"); do
 	# echo $d
 	cd $(dirname $d)
 	bname=$(basename $d)
@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+
+import sys
+import os
+import timeit
+
+import numpy as np
+
+sys.setrecursionlimit(20000)
+sys.path.append('../code/')
+
+import Forest
+import ForestEngine
+from generateCode import getOption, loadTestData
+
+def main(argv):
+	# Pack every model of a dataset into node blobs and run them with the precompiled engine (see ForestEngine.py):
+	#	./runEngine.py dataset [--models=RF_10,ET_10] [--layouts=standard,optimized] [--setsize=8] [--reps=5]
+	# The blobs are written to dataset/blob/model_layout.blob. Replacing such a file (e.g. with a retrained model)
+	# and calling ForestEngine.reload() deploys the new model without compiling anything. The script reports the
+	# accuracy and the throughput of each blob and fails if any prediction differs from the python model
+	options = [a for a in argv if a.startswith("--")]
+	argv = [a for a in argv if not a.startswith("--")]
+
+	if len(argv) < 1:
+		print("Please give a sub-folder / dataset to be used")
+		return 1
+
+	basepath = argv[0].strip("/")
+	models = getOption(options, "models")
+	layouts = getOption(options, "layouts", ",".join(ForestEngine.LAYOUTS)).split(",")
+	setSize = int(getOption(options, "setsize", 8))
+	reps = int(getOption(options, "reps", 5))
+
+	X, Y = loadTestData(basepath + "/test.csv")
+	splitType = "int" if np.issubdtype(X.dtype, np.integer) else "float"
+	lib = ForestEngine.getLibrary()
+
+	if not os.path.exists(basepath + "/blob"):
+		os.makedirs(basepath + "/blob")
+
+	failed = 0
+	for f in sorted(os.listdir(basepath + "/text/")):
+		name = f[:-len(".json")]
+		if not f.endswith(".json") or (models is not None and name not in models.split(",")):
+			continue
+
+		forest = Forest.Forest()
+		forest.fromJSON(basepath + "/text/" + f)
+		YPython = forest.predict_batch(X)
+
+		for layout in layouts:
+			blobFile = basepath + "/blob/" + name + "_" + layout + ".blob"
+			start = timeit.default_timer()
+			ForestEngine.writeBlob(forest, blobFile, X.shape[1], splitType, layout, setSize)
+			packTime = timeit.default_timer() - start
+
+			engine = ForestEngine.ForestEngine(blobFile, lib)
+			times = []
+			for r in range(reps):
+				start = timeit.default_timer()
+				YEngine = engine.predict_batch(X)
+				times.append(timeit.default_timer() - start)
+			engine.close()
+
+			mismatches = int(np.sum(YEngine != YPython))
+			failed += mismatches > 0
+			print("%-25s %-10s %9s nodes %8.2f MB  pack %6.2f s  accuracy %.4f  %10.1f #elem/ms  %s" % (name, layout, engine.header["numNodes"], os.path.getsize(blobFile) / 1024.0**2, \
+				packTime, np.mean(YEngine == Y), len(X) / (np.median(times) * 1000), "OK" if mismatches == 0 else str(mismatches) + " samples differ from python"))
+
+	return 1 if failed > 0 else 0
+
+if __name__ == "__main__":
+	sys.exit(main(sys.argv[1:]))
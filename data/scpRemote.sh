@@ -13,6 +13,7 @@ fi
 
 mkdir tmp
 find . -type f | grep "test.csv" | tar -T - -c | tar -xpC tmp
+find . -type f -name "test.bin" | grep $1 | tar -T - -c | tar -xpC tmp
 find . -perm -111 -type f | grep $1 | tar -T - -c | tar -xpC tmp
 cp run.sh tmp/.
 cp run_all.sh tmp/.
@@ -0,0 +1,45 @@
+#!/usr/bin/env python3
+
+import sys
+import re
+import json
+import os.path
+
+from collapseReport import readResults
+
+def main(argv):
+	if len(argv) < 1:
+		print("Please provide a results file (e.g. results_intel.csv) produced by run_all.sh for code generated with generateCode.py --softvote")
+		return
+	else:
+		filename = argv[0]
+
+	results = readResults(filename)
+
+	print("model,classifier,bits,samples,accuracy,accuracySoft,accuracyQuantized,size,sizeSoft,mean,meanSoft,slowdown")
+	for path in sorted(results):
+		name = os.path.basename(path)
+		softVote = re.fullmatch(r"testSoftVote(\w+?)_(8|16)((_\w+)?)", name)
+		if softVote is None:
+			continue
+
+		classifier, bits, suffix = softVote.group(1), softVote.group(2), softVote.group(3)
+		basePath = os.path.join(os.path.dirname(path), "test" + classifier + suffix)
+		if basePath not in results:
+			print("No hard voting result found for", path)
+			continue
+
+		with open(os.path.dirname(path) + "/voting.json") as statsFile:
+			stats = json.load(statsFile)
+
+		entries = results[path]
+		baseEntries = results[basePath]
+		mean = float(entries[3])
+		baseMean = float(baseEntries[3])
+		samples = stats["samples"]
+
+		print(",".join([basePath, classifier + suffix, bits, str(samples), str(stats["hard"] / samples), str(stats["soft"] / samples), str(stats["quantized"][bits] / samples), \
+			baseEntries[7], entries[7], str(baseMean), str(mean), str(mean / baseMean if baseMean > 0 else 0)]))
+
+if __name__ == "__main__":
+   main(sys.argv[1:])
@@ -1,27 +1,19 @@
 #!/usr/bin/env python3
 
-import csv,operator,sys,os
+import sys
 import numpy as np
 
 sys.path.append('../')
 from fitModels import fitModels
+from datasetLoader import readCSV, loadCached
 
 def readFile(path):
-	f = open(path, 'r')
-	X = []
-	Y = []
-	for row in f:
-		entries = row.strip().split(",")
-		x = [int(float(e)*100) for e in entries[0:-1]]
-		
-		y = int(entries[-1])
-		X.append(x)
-		Y.append(y)
+	data = readCSV(path)
 
-	return np.array(X).astype(dtype=np.int32), np.array(Y)
+	return (data[:,0:-1]*100).astype(dtype=np.int32), data[:,-1].astype(np.int64)
 
 def main(argv):
-	X,Y = readFile("spambase.data")
+	X,Y = loadCached("prepared.npz", ["spambase.data"], lambda : readFile("spambase.data"))
 
 	fitModels(True,X,Y)
 
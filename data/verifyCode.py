@@ -0,0 +1,367 @@
+#!/usr/bin/env python3
+
+import sys
+import os
+import re
+import json
+import ctypes
+import shutil
+import subprocess
+import tempfile
+import timeit
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+sys.setrecursionlimit(20000)
+sys.path.append('../code/')
+
+import Forest
+from generateCode import getOption, loadTestData, getFeatureType, getNumpyType
+
+# The wrapper is compiled together with {namespace}.cpp, so that the (inline) functions of amalgamated trees are visible
+wrapperCodeTemplate = """#include "{namespace}.cpp"
+
+extern "C" void {namespace}_verify({feature_t} const * pX, unsigned int n, unsigned int * pForest, unsigned int * pTrees) {
+	for (unsigned int i = 0; i < n; ++i) {
+		{feature_t} const * x = pX + (unsigned long)i * {dim};
+		pForest[i] = {namespace}_predict(x);
+{tree_code}
+	}
+}
+"""
+
+def getTreeCode(namespace, header, numTrees, featureType):
+	""" Returns the code which stores the prediction of every single tree of the given classifier in
+		pTrees. The trees are called with the predicate bits ({namespace}_predicates) if their argument is
+		pB, with the packed features if the header declares {namespace}_pack and with the features otherwise
+
+	Returns:
+		str: The code, or None if the trees are not callable separately (e.g. DAGNativeTree)
+	"""
+	declarations = re.findall(r"unsigned int " + re.escape(namespace) + r"_predict(\d+)\(\s*[\w ]+?\s+const\s+(\w+)\[(\d+)\]\s*\)", header)
+	arguments = {int(t) : (name, size) for t, name, size in declarations}
+	if sorted(arguments.keys()) != list(range(numTrees)):
+		return None
+
+	names = set([name for name, _ in arguments.values()])
+	if len(names) != 1:
+		return None
+	name = names.pop()
+	size = list(arguments.values())[0][1]
+
+	if name == "pB":
+		code = "\t\tunsigned int pB[{size}];\n\t\t{namespace}_predicates(x, pB);\n"
+		argument = "pB"
+	elif name == "pX" and re.search(r"void " + re.escape(namespace) + r"_pack\(", header) is not None:
+		code = "\t\t{feature_t} pC[{size}];\n\t\t{namespace}_pack(x, pC);\n"
+		argument = "pC"
+	elif name == "pX":
+		code = ""
+		argument = "x"
+	else:
+		return None
+
+	for t in range(numTrees):
+		code += "\t\tpTrees[(unsigned long)i * {num_trees} + " + str(t) + "] = {namespace}_predict" + str(t) + "(" + argument + ");\n"
+
+	return code.replace("{feature_t}", featureType).replace("{size}", size).replace("{namespace}", namespace).replace("{num_trees}", str(numTrees))
+
+def buildLibrary(modelPath, namespace, numTrees, dim, featureType, tmpDir, compiler = "g++", flags = "-std=c++11 -O0"):
+	""" Compile the classifier with the given namespace (and all its tree units) into a shared library, which
+		exports {namespace}_verify
+
+	Returns:
+		Tuple: A tuple (library, perTree, error), where library is the path of the shared library (None if the
+		compilation failed), perTree is True if the trees are called separately and error contains the compiler output
+	"""
+	with open(os.path.join(modelPath, namespace + ".h")) as f:
+		header = f.read()
+
+	treeCode = getTreeCode(namespace, header, numTrees, featureType)
+	wrapperCode = wrapperCodeTemplate.replace("{tree_code}", treeCode if treeCode is not None else "") \
+									 .replace("{namespace}", namespace) \
+									 .replace("{feature_t}", featureType) \
+									 .replace("{dim}", str(dim))
+
+	wrapperFile = os.path.join(tmpDir, namespace + "_verify.cpp")
+	with open(wrapperFile, 'w') as f:
+		f.write(wrapperCode)
+
+	# The compiler runs in the model folder, since .incbin resolves the binary node tables (see generateCode.py --bintables) from there
+	modelPath = os.path.abspath(modelPath)
+	units = sorted([os.path.join(modelPath, f) for f in os.listdir(modelPath) if re.fullmatch(re.escape(namespace) + r"_tree\d+\.cpp", f)])
+	library = os.path.abspath(os.path.join(tmpDir, "lib" + namespace + ".so"))
+	command = compiler.split() + flags.split() + ["-shared", "-fPIC", "-I", modelPath, os.path.abspath(wrapperFile)] + units + ["-o", library]
+	output = subprocess.run(command, stdout = subprocess.PIPE, stderr = subprocess.STDOUT, universal_newlines = True, cwd = modelPath)
+	if output.returncode != 0:
+		return None, False, output.stdout
+
+	return library, treeCode is not None, None
+
+def runLibrary(library, namespace, X, numTrees):
+	""" Returns the predictions of the forest and of every tree (numTrees columns) for all rows of X """
+	lib = ctypes.CDLL(library)
+	verify = getattr(lib, namespace + "_verify")
+	verify.restype = None
+	verify.argtypes = [ctypes.c_void_p, ctypes.c_uint, ctypes.c_void_p, ctypes.c_void_p]
+
+	X = np.ascontiguousarray(X)
+	YForest = np.zeros(len(X), dtype = np.uint32)
+	YTrees = np.zeros((len(X), numTrees), dtype = np.uint32)
+	verify(X.ctypes.data, len(X), YForest.ctypes.data, YTrees.ctypes.data)
+
+	return YForest.astype(np.int64), YTrees.astype(np.int64)
+
+def getLeaf(x, arrays, curNode = 0):
+	""" Returns the index of the leaf reached by x from the given node (see Tree.getArrays) """
+	_, left, right, feature, split, _ = arrays
+	while left[curNode] >= 0:
+		curNode = left[curNode] if x[feature[curNode]] <= split[curNode] else right[curNode]
+
+	return curNode
+
+def getCandidates(x, arrays, generated):
+	""" Returns the nodes on the path of x at which taking the other branch (and following the python model
+		below) leads to the class predicted by the generated code, e.g. because of swapped children or a rounded split
+	"""
+	_, left, right, feature, split, label = arrays
+	candidates = []
+	curNode = 0
+	while left[curNode] >= 0:
+		goLeft = x[feature[curNode]] <= split[curNode]
+		if label[getLeaf(x, arrays, right[curNode] if goLeft else left[curNode])] == generated:
+			candidates.append(curNode)
+		curNode = left[curNode] if goLeft else right[curNode]
+
+	return candidates
+
+def getDivergence(t, X, YTrees, CTrees, arrays, maxSamples = 1000):
+	""" Locate the node of tree t at which the generated code diverges from the python model. Every node at
+		which a differing sample could have branched differently (see getCandidates) gets a vote, the node
+		which explains most of the (first maxSamples) differing samples is reported
+
+	Returns:
+		dict: The node (id, feature, split) and the number of differing samples it explains
+	"""
+	nodes, _, _, feature, split, _ = arrays
+	samples = np.nonzero(YTrees[:, t] != CTrees[:, t])[0][:maxSamples]
+	votes = {}
+	for i in samples:
+		for n in getCandidates(X[i], arrays, CTrees[i, t]):
+			votes[n] = votes.get(n, 0) + 1
+
+	if len(votes) == 0:
+		return {"node" : None, "explained" : 0, "checked" : len(samples)}
+
+	# Ties are broken towards the node closest to the root (smallest pre-order index)
+	n = min(votes, key = lambda n : (-votes[n], n))
+	return {"node" : nodes[n].id, "feature" : int(feature[n]), "split" : nodes[n].split, "explained" : votes[n], "checked" : len(samples)}
+
+def compare(forest, X, YForest, YTrees, CForest, CTrees, perTree, maxReports, arrays):
+	""" Compare the predictions of the python model with the ones of the generated code
+
+	Returns:
+		dict: The number of differing samples (of the forest and per tree), the diverging node of every tree and
+		the details of the first maxReports samples
+	"""
+	forestMismatches = np.nonzero(YForest != CForest)[0]
+	report = {"mismatches" : int(len(forestMismatches)), "perTree" : perTree, "trees" : {}}
+	if perTree:
+		treeMismatches = YTrees != CTrees
+		for t in np.nonzero(treeMismatches.any(axis = 0))[0]:
+			report["trees"][str(t)] = {"mismatches" : int(treeMismatches[:, t].sum())}
+			report["trees"][str(t)].update(getDivergence(t, X, YTrees, CTrees, arrays[t]))
+		samples = np.nonzero(treeMismatches.any(axis = 1) | (YForest != CForest))[0]
+	else:
+		samples = forestMismatches
+
+	details = []
+	for i in samples[:maxReports]:
+		sample = {"sample" : int(i), "python" : int(YForest[i]), "generated" : int(CForest[i]), "trees" : []}
+		if perTree:
+			for t in np.nonzero(YTrees[i] != CTrees[i])[0]:
+				nodes = arrays[t][0]
+				sample["trees"].append({
+					"tree" : int(t),
+					"python" : int(YTrees[i, t]),
+					"generated" : int(CTrees[i, t]),
+					"leaf" : nodes[getLeaf(X[i], arrays[t])].id,
+					"candidates" : [nodes[n].id for n in getCandidates(X[i], arrays[t], CTrees[i, t])]
+				})
+		details.append(sample)
+	report["samples"] = details
+
+	return report
+
+def getSoftVoteBits(modelPath, namespace):
+	""" Returns the number of bits of the leaf probabilities if the classifier uses soft voting (see SoftVoteForestConverter), otherwise None """
+	with open(os.path.join(modelPath, namespace + ".h")) as f:
+		header = f.read()
+
+	leaves = re.search(r"extern (unsigned char|unsigned short) const " + re.escape(namespace) + r"_leaves\[", header)
+	if leaves is None:
+		return None
+	return 8 if leaves.group(1) == "unsigned char" else 16
+
+def getSoftVoteReference(forest, X, arrays, bits):
+	""" Returns the python predictions for a soft voting classifier, whose trees return the index of the reached leaf
+		instead of its class (see Tree.getLeafIndices)
+
+	Returns:
+		Tuple: A tuple (YForest, YTrees, arrays), where the labels of the arrays are replaced by the leaf indices
+	"""
+	offsets, table = forest.getLeafTable(bits)
+	softArrays = []
+	YTrees = np.zeros((len(X), len(arrays)), dtype = np.int64)
+	for t, a in enumerate(arrays):
+		leafIndices = forest.trees[t].getLeafIndices(a)
+		softArrays.append(a[:5] + (leafIndices,))
+		YTrees[:, t] = leafIndices[forest.trees[t].predict_leaves(X, a)]
+
+	return forest.vote_soft(YTrees + offsets, table), YTrees, softArrays
+
+def getNamespaces(modelPath):
+	""" Returns the namespaces of all classifiers generated into the given folder """
+	return sorted([f[:-len(".h")] for f in os.listdir(modelPath) if f.endswith(".h") and os.path.isfile(os.path.join(modelPath, f[:-len(".h")] + ".cpp"))])
+
+def verifyModel(modelPath, forest, X, namespaces = None, compiler = "g++", flags = "-std=c++11 -O0", workers = None, maxReports = 10):
+	""" Build every classifier in modelPath as shared library and compare its predictions (of the forest and of
+		every single tree) with the python model for all rows of X. The report is written to modelPath/verify.json
+
+	Args:
+		modelPath (str): The folder of the generated code
+		forest (Forest): The python model the code was generated from
+		X (numpy.ndarray): The samples
+		namespaces (list, optional): The classifiers to verify (default: all)
+		compiler (str, optional): The compiler. The generated code is verified on the local machine for all targets
+		flags (str, optional): The compiler flags. -O0 keeps the compilation of large forests fast
+		workers (int, optional): The number of concurrent compilations (default: all cores)
+		maxReports (int, optional): The maximum number of reported samples per classifier
+
+	Returns:
+		dict: The report
+	"""
+	if namespaces is None:
+		namespaces = getNamespaces(modelPath)
+	numTrees = len(forest.trees)
+	featureType = getFeatureType(X)
+	dim = X.shape[1]
+	X = np.ascontiguousarray(X, dtype = getNumpyType(featureType))
+
+	start = timeit.default_timer()
+	arrays = [t.getArrays() for t in forest.trees]
+	YTrees = np.zeros((len(X), numTrees), dtype = np.int64)
+	for t in range(numTrees):
+		YTrees[:, t] = arrays[t][5][forest.trees[t].predict_leaves(X, arrays[t])]
+	YForest = forest.vote(YTrees)
+	# The predictions of the soft voting classifiers depend on the number of bits and are computed on demand
+	references = {None : (YForest, YTrees, arrays)}
+	report = {"samples" : len(X), "trees" : numTrees, "pythonTime" : timeit.default_timer() - start, "namespaces" : {}}
+
+	tmpDir = tempfile.mkdtemp()
+	try:
+		start = timeit.default_timer()
+		with ThreadPoolExecutor(max_workers = workers if workers is not None else os.cpu_count()) as pool:
+			libraries = list(pool.map(lambda n : buildLibrary(modelPath, n, numTrees, dim, featureType, tmpDir, compiler, flags), namespaces))
+		report["compileTime"] = timeit.default_timer() - start
+
+		start = timeit.default_timer()
+		for namespace, (library, perTree, error) in zip(namespaces, libraries):
+			if library is None:
+				report["namespaces"][namespace] = {"error" : error}
+				continue
+
+			bits = getSoftVoteBits(modelPath, namespace)
+			if bits not in references:
+				references[bits] = getSoftVoteReference(forest, X, arrays, bits)
+
+			YForestRef, YTreesRef, arraysRef = references[bits]
+			CForest, CTrees = runLibrary(library, namespace, X, numTrees)
+			report["namespaces"][namespace] = compare(forest, X, YForestRef, YTreesRef, CForest, CTrees, perTree, maxReports, arraysRef)
+			if bits is not None:
+				report["namespaces"][namespace]["softVote"] = bits
+		report["runTime"] = timeit.default_timer() - start
+	finally:
+		shutil.rmtree(tmpDir)
+
+	with open(os.path.join(modelPath, "verify.json"), 'w') as outFile:
+		json.dump(report, outFile, indent = 4)
+
+	return report
+
+def printReport(report):
+	""" Print one line per classifier and the diverging node of every tree which differs from the python model
+
+	Returns:
+		int: The number of classifiers which failed to compile or differ from the python model
+	"""
+	failed = 0
+	for namespace, r in report["namespaces"].items():
+		if "error" in r:
+			print("\t%-35s compilation failed" % namespace)
+			print("\t\t" + r["error"].strip().split("\n")[0])
+			failed += 1
+		elif r["mismatches"] > 0 or len(r["trees"]) > 0:
+			print("\t%-35s %s of %s samples differ" % (namespace, r["mismatches"], report["samples"]))
+			for t, d in r["trees"].items():
+				if d["node"] is None:
+					print("\t\ttree %s: %s samples differ, no single branch explains them" % (t, d["mismatches"]))
+				else:
+					print("\t\ttree %s: %s samples differ, diverges at node %s (x[%s] <= %s) for %s of %s" % (t, d["mismatches"], d["node"], d["feature"], d["split"], d["explained"], d["checked"]))
+			failed += 1
+		else:
+			print("\t%-35s OK%s%s" % (namespace, "" if r["perTree"] else " (forest only)", " (soft voting, %s bit)" % r["softVote"] if "softVote" in r else ""))
+
+	print("\tPython %.2f s, compile %.2f s, run %.2f s" % (report["pythonTime"], report["compileTime"], report["runTime"]))
+	return failed
+
+def main(argv):
+	# Verify that the generated code predicts the same classes as the python model on every test sample:
+	#	./verifyCode.py dataset target [--models=RF_10,ET_10] [--namespaces=StandardIfTree,MixTree_32768]
+	#					[--compiler=g++] [--flags="-std=c++11 -O0"] [--samples=10000] [--reports=10] [--workers=4]
+	# The report of every model (including the tree and node where each reported sample diverges) is written
+	# to dataset/cpp/target/model/verify.json. The script fails if any classifier differs from the python model
+	options = [a for a in argv if a.startswith("--")]
+	argv = [a for a in argv if not a.startswith("--")]
+
+	if len(argv) < 2:
+		print("Please give a dataset and a target architecture (arm or intel or ppc)")
+		return 1
+
+	basepath = argv[0].strip("/")
+	target = argv[1]
+	models = getOption(options, "models")
+	namespaces = getOption(options, "namespaces")
+	compiler = getOption(options, "compiler", "g++")
+	flags = getOption(options, "flags", "-std=c++11 -O0")
+	maxReports = int(getOption(options, "reports", 10))
+	workers = getOption(options, "workers")
+
+	X, _ = loadTestData(basepath + "/test.csv")
+	if getOption(options, "samples") is not None:
+		X = X[:int(getOption(options, "samples"))]
+
+	failed = 0
+	for model in sorted(os.listdir(basepath + "/cpp/" + target)):
+		modelPath = basepath + "/cpp/" + target + "/" + model
+		name = model[:-len("_collapsed")] if model.endswith("_collapsed") else model
+		if not os.path.isdir(modelPath) or (models is not None and model not in models.split(",")):
+			continue
+		if not os.path.exists(basepath + "/text/" + name + ".json"):
+			continue
+
+		print("Verifying", modelPath)
+		forest = Forest.Forest()
+		forest.fromJSON(basepath + "/text/" + name + ".json")
+		if model.endswith("_collapsed"):
+			with open(modelPath + "/collapse.json") as f:
+				forest.collapse(json.load(f)["tolerance"])
+
+		report = verifyModel(modelPath, forest, X, None if namespaces is None else namespaces.split(","), compiler, flags, None if workers is None else int(workers), maxReports)
+		failed += printReport(report)
+
+	return 1 if failed > 0 else 0
+
+if __name__ == "__main__":
+	sys.exit(main(sys.argv[1:]))
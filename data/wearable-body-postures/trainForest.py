@@ -1,50 +1,41 @@
 #!/usr/bin/env python3
 
-import csv,operator,sys,os
+import sys
 import numpy as np
 
 sys.path.append('../')
 from fitModels import fitModels
+from datasetLoader import readCSV, mapValues, loadCached
+
+CLASSES = {"sitting" : 0, "standing" : 1, "standingup" : 2, "walking" : 3, "sittingdown" : 4}
+
+def getClass(name):
+	if name not in CLASSES:
+		raise ValueError("ERROR READING CLASSES: " + name)
+
+	return CLASSES[name]
+
+def getValue(entry):
+	# The numbers use a decimal comma
+	return int(float(entry.replace(",","."))*100)
 
 def readFile(path):
-	f = open(path, 'r')
-	header = next(f)
-	X = []
-	Y = []
-
-	for row in f:
-		entries = row.replace("\n","").split(";")
-
-		if entries[-1] == 'sitting':
-			y = 0
-		elif entries[-1] == 'standing':
-			y = 1
-		elif entries[-1] == 'standingup':
-			y = 2
-		elif entries[-1] == 'walking':
-			y = 3
-		elif entries[-1] == 'sittingdown':
-			y = 4
-		else:
-			print("ERROR READING CLASSES:", entries[-1])
-		
-		x = []
-		if entries[1] == 'Man':
-			x.append(0)
-		else:
-			x.append(1)
-			
-		for e in entries[2:-1]:
-			x.append(int(float(e.replace(",","."))*100))
-		X.append(x)
-		Y.append(y)
-
-	return np.array(X).astype(dtype=np.int32), np.array(Y)
+	data = readCSV(path, delimiter = ";", skipHeader = 1, dtype = str)
+
+	# The user name (column 0) is not used. The sensor values only take a few hundred distinct values
+	# per column, so they are converted once per value
+	X = np.column_stack(
+		[np.where(data[:,1] == "Man", 0, 1)] +
+		[mapValues(data[:,c], getValue) for c in range(2, data.shape[1] - 1)]
+	).astype(dtype=np.int32)
+	Y = mapValues(data[:,-1], getClass)
+
+	return X, Y
 
 def main(argv):
-	X,Y = readFile("dataset-har-PUC-Rio-ugulino.csv")
+	X,Y = loadCached("prepared.npz", ["dataset-har-PUC-Rio-ugulino.csv"], lambda : readFile("dataset-har-PUC-Rio-ugulino.csv"))
 
 	fitModels(True,X,Y)
 
 if __name__ == "__main__":
-   main(sys.argv[1:])
\ No newline at end of file
+   main(sys.argv[1:])